@@ -13,6 +13,9 @@ from paginas.pagina_dub import mostrar_pagina_dub
 from paginas.pagina_fies import mostrar_pagina_fies
 from paginas.pagina_demografia import mostrar_pagina_demografia
 from paginas.mapa import mostrar_mapa
+from paginas.datasets import iniciar_actualizacion_datasets, obtener_dataset, dataset_listo
+from paginas.filtros import mostrar_barra_filtros
+from google_connection import refrescar_datos, estadisticas_cache
 
 # Estilos personalizados para fondo blanco
 st.markdown("""
@@ -44,15 +47,35 @@ st.markdown("""
 def main():
     st.title("Dashboard de Visualización de Datos DUB")
     
+    # Los conjuntos de datos registrados se actualizan en segundo plano (un solo hilo por proceso)
+    iniciar_actualizacion_datasets()
+    
+    # Control manual de actualización de la caché compartida
+    st.sidebar.header("Datos")
+    if st.sidebar.button("Actualizar datos ahora"):
+        refrescar_datos()
+        st.rerun()
+    
+    stats = estadisticas_cache()
+    st.sidebar.caption(
+        f"Caché compartida: {stats['aciertos']} aciertos, {stats['fallos']} fallos, "
+        f"{stats['hojas']} hojas en memoria (TTL {stats['ttl']} s). "
+        f"API: {stats['peticiones']} peticiones, {stats['reintentos']} reintentos"
+    )
+    # Fallas de la actualización en segundo plano (los datos mostrados pueden estar desactualizados)
+    for error in stats["errores"]:
+        st.sidebar.warning(f"Falló la actualización de {error['origen']} ({error['momento']}): {error['mensaje']}")
+    
+    # Los filtros globales se dibujan en la barra lateral y aplican a todas las pestañas
+    contenedor_filtros = st.sidebar.container()
+    
     # Crear pestañas para la navegación (ahora con 5 pestañas)
     tab1, tab2, tab3, tab4, tab5 = st.tabs(["INFORDUB", "DUB", "MAPA", "FIES", "DEMOGRAFÍA"])
     
     # Contenido para cada pestaña
     with tab1:
         # La nueva pestaña INFORDUB
-        df = mostrar_pagina_infordub()
-        if df is not None and 'df' not in st.session_state:
-            st.session_state.df = df
+        mostrar_pagina_infordub()
     
     with tab2:
         # Esta pestaña ahora solo mostrará el contenido demográfico
@@ -70,6 +93,10 @@ def main():
         # DEMOGRAFÍA
         mostrar_pagina_demografia()
     
+    # Las opciones de los filtros salen de los datos completos, ya cargados por las pestañas
+    if dataset_listo("DUB"):
+        mostrar_barra_filtros(obtener_dataset("DUB"), contenedor_filtros)
+    
     # Agregar pie de página
     st.markdown("---")
     st.caption("Desarrollado con Streamlit • Datos actualizados desde Google Sheets")
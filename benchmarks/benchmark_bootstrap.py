@@ -0,0 +1,98 @@
+"""
+Mide cómo escala el bootstrap de utils/bootstrap.py con el número de procesos.
+
+Genera respuestas sintéticas de la FIES (modelo de Rasch) y de frecuencia de
+consumo, y calcula los intervalos de confianza de las prevalencias FIES (reajustando
+el modelo en cada réplica) y de los porcentajes de consumo con 1, 2, 4, ... procesos.
+El grupo de procesos se inicia antes de medir, así que los tiempos no incluyen el
+arranque de los procesos. También verifica que los intervalos no cambian con el
+número de procesos. La columna "Usados" indica los procesos que realmente se usan
+(nunca más que los núcleos, y uno solo con poco trabajo; ver procesos_a_usar).
+
+Uso:
+    python -m benchmarks.benchmark_bootstrap [--filas 20000] [--replicas 1000]
+                                             [--procesos 1 2 4]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.bootstrap import intervalos_proporciones, procesos_a_usar
+from utils.fies import analizar_fies, intervalos_prevalencia_fies
+
+ITEMS = [f"FIES_{i}" for i in range(8)]
+SEVERIDADES = np.array([-1.2, -0.8, -1.1, 0.35, -0.3, 0.5, 0.8, 1.75])
+CONSUMO = ["TODOS LOS DÍAS", "DE 2 A 3 VECES A LA SEMANA", "1 VEZ EN LA SEMANA", "NO CONSUMI ESTE ALIMENTO"]
+
+
+def generar_respuestas(total, semilla=0):
+    """
+    Genera respuestas FIES con el modelo de Rasch y seis columnas de consumo.
+    """
+    generador = np.random.default_rng(semilla)
+    theta = generador.normal(-0.5, 1.5, total)
+    probabilidad = 1 / (1 + np.exp(-(theta[:, np.newaxis] - (SEVERIDADES - SEVERIDADES.mean()))))
+    respuestas = generador.random((total, len(ITEMS))) < probabilidad
+
+    df = pd.DataFrame({
+        item: pd.Categorical(np.where(respuestas[:, j], "SI", "NO")) for j, item in enumerate(ITEMS)
+    })
+    for k in range(6):
+        df[f"Consumo_{k}"] = pd.Categorical(generador.choice(CONSUMO, total))
+    return df
+
+
+def medir(df, replicas, procesos):
+    """
+    Calcula los dos juegos de intervalos y devuelve (segundos, intervalos).
+    """
+    # Versión propia en cada medición: los intervalos FIES se guardan por versión
+    df = df.copy(deep=False)
+    df.attrs = {"version": ("benchmark", replicas, procesos, time.perf_counter()), "filas": len(df)}
+    analizar_fies(df, ITEMS)
+    columnas = {f"Consumo_{k}": f"Consumo_{k}" for k in range(6)}
+
+    inicio = time.perf_counter()
+    fies = intervalos_prevalencia_fies(df, ITEMS, replicas=replicas, procesos=procesos)
+    consumo = intervalos_proporciones(df, columnas, replicas=replicas, procesos=procesos)
+    duracion = time.perf_counter() - inicio
+    intervalos = np.concatenate([fies[["IC inferior", "IC superior"]].to_numpy().ravel(),
+                                 consumo[["IC inferior", "IC superior"]].to_numpy().ravel()])
+    return duracion, intervalos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=20000, help="Encuestados sintéticos")
+    parser.add_argument("--replicas", type=int, default=1000, help="Réplicas bootstrap")
+    parser.add_argument("--procesos", type=int, nargs="+", help="Números de procesos a comparar")
+    args = parser.parse_args()
+
+    nucleos = os.cpu_count() or 1
+    procesos = args.procesos or [p for p in (1, 2, 4, 8, 16, 32) if p <= nucleos]
+    df = generar_respuestas(args.filas)
+
+    print(f"{args.filas:,} encuestados, {args.replicas:,} réplicas, {nucleos} núcleos disponibles")
+    print(f"{'Procesos':>9} {'Usados':>7} {'Tiempo (s)':>11} {'Aceleración':>12} {'Eficiencia':>11}")
+    base = referencia = None
+    for cantidad in procesos:
+        if cantidad > 1:
+            # Iniciar el grupo de procesos fuera de la medición
+            medir(df, 16, cantidad)
+        duracion, intervalos = medir(df, args.replicas, cantidad)
+        if base is None:
+            base, referencia = duracion, intervalos
+        aceleracion = base / duracion
+        usados = procesos_a_usar(cantidad, args.replicas, args.filas)
+        print(f"{cantidad:>9} {usados:>7} {duracion:>11.2f} {aceleracion:>11.2f}x {aceleracion / usados:>10.0%}")
+        if not np.allclose(intervalos, referencia, equal_nan=True):
+            print("    Los intervalos difieren de los calculados con un proceso")
+    if max(procesos) > nucleos:
+        print(f"Aviso: se pidieron más procesos que núcleos ({nucleos}); no se espera aceleración.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compara la limpieza de filas de load_data (bucle original por fila) con la
+versión vectorizada de google_connection._filas_a_dataframe.
+
+Uso:
+    python -m benchmarks.benchmark_limpieza [--columnas 40] [--filas 15000 150000 1000000]
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from google_connection import _filas_a_dataframe
+
+
+def limpieza_original(headers, filas):
+    """
+    Implementación anterior: rellena y revisa cada fila en un bucle de Python.
+    """
+    data_rows = []
+    for row in filas:
+        extended_row = row + [''] * (len(headers) - len(row))
+        if any(cell.strip() for cell in extended_row):
+            data_rows.append(extended_row)
+    return pd.DataFrame(data_rows, columns=headers)
+
+
+def generar_filas(total, ancho, semilla=0):
+    """
+    Genera filas rectangulares como las de worksheet.get_values(), con un 2% de
+    filas vacías y celdas vacías dispersas.
+    """
+    aleatorio = random.Random(semilla)
+    categorias = ["SI", "NO", "MASCULINO", "FEMENINO", "1", "2", "3", "COMUNA 13", ""]
+    filas = []
+    for i in range(total):
+        if i % 50 == 0:
+            filas.append([''] * ancho)
+        else:
+            filas.append([aleatorio.choice(categorias) for _ in range(ancho)])
+    return filas
+
+
+def medir(funcion, *args, repeticiones=3):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--columnas", type=int, default=40,
+                        help="Ancho de la hoja (40 ≈ columnas proyectadas de DUB)")
+    parser.add_argument("--filas", type=int, nargs="+", default=[15000, 150000, 1000000])
+    args = parser.parse_args()
+
+    headers = [f"col_{i}" for i in range(args.columnas)]
+    print(f"{'Filas':>10} {'Original (s)':>14} {'Vectorizada (s)':>16} {'Aceleración':>12}")
+    for total in args.filas:
+        filas = generar_filas(total, args.columnas)
+        repeticiones = 3 if total <= 150000 else 1
+        t_original, df_original = medir(limpieza_original, headers, filas, repeticiones=repeticiones)
+        t_vectorizada, df_vectorizada = medir(_filas_a_dataframe, headers, filas, repeticiones=repeticiones)
+        assert df_original.equals(df_vectorizada), "Los resultados no coinciden"
+        print(f"{total:>10,} {t_original:>14.3f} {t_vectorizada:>16.3f} {t_original / t_vectorizada:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
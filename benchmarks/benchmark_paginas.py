@@ -0,0 +1,128 @@
+"""
+Mide la latencia de extremo a extremo de la aplicación usando el backend local
+(utils/backend_local.py) en lugar de Google Sheets, con latencia y errores de
+cuota simulados.
+
+Ejecuta app.py con streamlit.testing dos veces en el mismo proceso: la primera
+con la caché vacía (descarga de todas las hojas) y la segunda con la caché llena.
+
+Uso:
+    python -m benchmarks.benchmark_paginas [--filas 3000] [--latencia 0.3] [--errores 0]
+                                           [--fixtures DIRECTORIO]
+
+Si no se indica --fixtures, se generan hojas sintéticas en un directorio temporal.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from utils.backend_local import guardar_fixture
+
+
+def generar_dub(total, semilla=0):
+    """
+    Genera una hoja DUB sintética de 110 columnas con respuestas en las posiciones
+    que leen las páginas.
+    """
+    from paginas.columnas import ESQUEMA_DUB
+
+    aleatorio = random.Random(semilla)
+    encabezados = [f"P{i}" for i in range(110)]
+    encabezados[3] = "FECHA"
+    encabezados[4] = "ID DUB"
+    for nombre, (posicion, _) in ESQUEMA_DUB.items():
+        if posicion is not None:
+            encabezados[posicion] = nombre
+
+    opciones = {
+        20: ["URBANA", "RURAL"],
+        21: [f"COMUNA {i}" for i in range(1, 23)],
+        27: ["1", "2", "3", "4", "NO SABE", ""],
+        33: ["MASCULINO", "FEMENINO", "INTERSEXUAL"],
+        34: ["HOMBRE", "MUJER", "NO BINARIO"],
+        35: ["HETEROSEXUAL", "GAY", "LESBIANA", "BISEXUAL"]
+    }
+    for i in range(36, 49):
+        opciones[i] = [f"OPCION {k}" for k in range(5)]
+    for i in range(50, 58):
+        opciones[i] = ["SI", "NO"]
+    for i in range(70, 76):
+        opciones[i] = ["TODOS LOS DÍAS", "DE 2 A 3 VECES A LA SEMANA",
+                       "1 VEZ EN LA SEMANA", "NO CONSUMI ESTE ALIMENTO"]
+
+    filas = [encabezados]
+    for k in range(total):
+        fila = [f"R{k}C{i}" for i in range(110)]
+        fila[3] = f"{aleatorio.randint(1, 28):02d}/{aleatorio.randint(1, 6):02d}/2025"
+        fila[4] = str(aleatorio.randint(1, int(total * 0.9)))
+        for i, valores in opciones.items():
+            fila[i] = aleatorio.choice(valores)
+        comedor = aleatorio.randrange(30)
+        fila[100] = f"comedor {comedor}"
+        fila[105] = f"({3.4 + comedor / 100:.4f}, {-76.5 - comedor / 100:.4f})"
+        filas.append(fila)
+    return filas
+
+
+def generar_comedores(total=30):
+    """
+    Genera la pestaña COMEDORES: nombre en la columna B y cupos en la D.
+    """
+    return [["ID", "Nombre_comedor", "Direccion", "Cupos"]] + [
+        [str(k), f"Comedor {k}", "", str(50 + k)] for k in range(total)
+    ]
+
+
+def medir_ejecucion(ruta_app):
+    from streamlit.testing.v1 import AppTest
+
+    inicio = time.perf_counter()
+    app = AppTest.from_file(ruta_app, default_timeout=600)
+    app.run()
+    duracion = time.perf_counter() - inicio
+    errores = [e.value for e in app.error] + [str(e.value) for e in app.exception]
+    return duracion, errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=3000, help="Filas de la hoja DUB sintética")
+    parser.add_argument("--latencia", type=float, default=0.3, help="Segundos por petición simulada")
+    parser.add_argument("--errores", type=float, default=0.0, help="Probabilidad de error 429 por petición")
+    parser.add_argument("--fixtures", help="Directorio con archivos del backend local ya existentes")
+    args = parser.parse_args()
+
+    temporal = tempfile.mkdtemp(prefix="dub_benchmark_")
+    fixtures = args.fixtures or os.path.join(temporal, "fixtures")
+
+    # La configuración se lee al importar los módulos de la aplicación
+    os.environ["DUB_BACKEND"] = "local"
+    os.environ["DUB_FIXTURES_DIR"] = fixtures
+    os.environ["DUB_LATENCIA_LOCAL"] = str(args.latencia)
+    os.environ["DUB_ERRORES_CUOTA"] = str(args.errores)
+    os.environ["DUB_SNAPSHOT_DIR"] = os.path.join(temporal, "snapshots")
+
+    import google_connection
+    from paginas.datasets import DATASETS
+
+    if args.fixtures is None:
+        for nombre, filas in (("DUB", generar_dub(args.filas)), ("COMEDORES", generar_comedores())):
+            guardar_fixture(fixtures, DATASETS[nombre]["sheet_id"], DATASETS[nombre]["sheet_name"], filas)
+
+    ruta_app = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+    print(f"Backend local en {fixtures} (latencia {args.latencia}s, errores {args.errores:.0%})")
+    print(f"{'Ejecución':<14} {'Tiempo (s)':>11} {'Peticiones':>11} {'Errores':>8}")
+    for etiqueta in ("caché vacía", "caché llena"):
+        cliente = google_connection.connect_to_gsheets()
+        antes = cliente.peticiones
+        duracion, errores = medir_ejecucion(ruta_app)
+        peticiones = google_connection.connect_to_gsheets().peticiones - antes
+        print(f"{etiqueta:<14} {duracion:>11.2f} {peticiones:>11} {len(errores):>8}")
+        for error in errores:
+            print(f"    {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,114 @@
+import hashlib
+import itertools
 import json
+import logging
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import gspread
 from google.oauth2.service_account import Credentials
+from google.auth.exceptions import RefreshError
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import pandas as pd
+import numpy as np
 from dotenv import load_dotenv
+from utils.snapshots import guardar_snapshot, leer_snapshot
+from utils.backend_local import backend_local_activo, crear_cliente_local
+from utils.cuota import llamar_api, estadisticas_api
+from utils.agregados import precalcular, errores_precalculo
 
 # Cargar variables de entorno desde .env para desarrollo local
 load_dotenv()
 
-# Función para establecer conexión con Google Sheets
-def connect_to_gsheets():
+# Tiempo de vida (en segundos) de los datos en la caché compartida del proceso
+CACHE_TTL_SEGUNDOS = int(os.getenv("DUB_CACHE_TTL", "600"))
+
+# Caché compartida entre todas las sesiones del proceso: (sheet_id, hoja) -> (momento de carga, DataFrame)
+_cache_hojas = {}
+_cache_lock = threading.Lock()
+_cache_estadisticas = {"aciertos": 0, "fallos": 0}
+
+# Cada cuánto (en segundos) se descarta la carga incremental y se relee la hoja completa
+RECARGA_COMPLETA_SEGUNDOS = int(os.getenv("DUB_RECARGA_COMPLETA", "3600"))
+
+# Claves de caché invalidadas con refrescar_datos: la próxima load_data descarga la hoja completa
+_recargas_pedidas = set()
+
+# Claves de caché que se están actualizando en segundo plano
+_refrescos_en_curso = set()
+
+# Descargas en curso por clave de caché: las sesiones que piden la misma hoja
+# mientras se descarga esperan ese resultado en lugar de repetir la petición
+_descargas_en_curso = {}
+
+# Las hojas más largas que esto se descargan por bloques de filas para acotar la memoria
+FILAS_POR_BLOQUE = int(os.getenv("DUB_FILAS_POR_BLOQUE", "5000"))
+
+# Cada DataFrame publicado en la caché recibe un número de versión creciente (df.attrs["version"])
+_versiones = itertools.count(1)
+
+# Actualización periódica en segundo plano: claves programadas -> modo incremental
+INTERVALO_ACTUALIZACION_SEGUNDOS = int(os.getenv("DUB_INTERVALO_ACTUALIZACION", str(CACHE_TTL_SEGUNDOS // 2)))
+_claves_programadas = {}
+_actualizador = None
+
+logger = logging.getLogger(__name__)
+
+# Última falla de actualización de cada hoja, para mostrarla en la interfaz:
+# {clave: {"momento": hora local, "mensaje": texto}}. Se borra al actualizarla con éxito.
+_errores_actualizacion = {}
+
+# Último mensaje de error avisado en cada hilo (ver _actualizar_entrada)
+_ultimo_aviso = threading.local()
+
+def _avisar(tipo, mensaje):
+    """
+    Muestra un mensaje de Streamlit (success, info, warning, error) solo cuando hay una
+    sesión activa; en los hilos de actualización en segundo plano se omite.
+    
+    Los errores y advertencias se registran además con logging, así que las fallas de
+    los hilos en segundo plano no se pierden.
+    """
+    if tipo == "error":
+        logger.error(mensaje)
+        _ultimo_aviso.error = mensaje
+    elif tipo == "warning":
+        logger.warning(mensaje)
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        getattr(st, tipo)(mensaje)
+
+def _registrar_error(clave, mensaje):
+    """
+    Guarda la última falla de actualización de una hoja.
+    """
+    with _cache_lock:
+        _errores_actualizacion[clave] = {"momento": time.strftime("%Y-%m-%d %H:%M:%S"), "mensaje": mensaje}
+
+# Alcances requeridos para leer las hojas
+SCOPES = ['https://spreadsheets.google.com/feeds',
+          'https://www.googleapis.com/auth/drive']
+
+# Cliente autorizado compartido por todo el proceso (se autoriza una sola vez)
+_cliente_gsheets = None
+_cliente_lock = threading.Lock()
+
+# Hojas de cálculo ya abiertas con el cliente compartido: sheet_id -> Spreadsheet
+_hojas_abiertas = {}
+
+def _crear_cliente():
+    """
+    Construye un cliente autorizado de gspread a partir de las credenciales en memoria.
+    
+    Returns:
+        Cliente de gspread o None si no hay credenciales válidas
+    """
+    # 0. Backend local con archivos CSV/Parquet (desarrollo y benchmarks sin red)
+    if backend_local_activo():
+        return crear_cliente_local()
+    
     # Intentar obtener credenciales de múltiples fuentes
     
     # 1. Primero intentar desde secretos de Streamlit (para producción)
@@ -18,91 +116,1023 @@ def connect_to_gsheets():
         try:
             # Obtener credenciales directamente como diccionario
             credentials_info = dict(st.secrets["gcp_service_account"])
-            
-            # Configurar las credenciales sin necesidad de archivo temporal
-            scopes = ['https://spreadsheets.google.com/feeds',
-                     'https://www.googleapis.com/auth/drive']
-            
-            creds = Credentials.from_service_account_info(credentials_info, scopes=scopes)
-            client = gspread.authorize(creds)
-            return client
+            creds = Credentials.from_service_account_info(credentials_info, scopes=SCOPES)
+            return gspread.authorize(creds)
         except Exception as e:
-            st.error(f"Error al usar credenciales de Streamlit Secrets: {e}")
+            _avisar("error", f"Error al usar credenciales de Streamlit Secrets: {e}")
     
     # 2. Si no se encontraron en secretos, intentar desde variables de entorno
     credentials_json = os.getenv("GOOGLE_CREDENTIALS")
     
     if not credentials_json:
-        st.error("No se encontraron las credenciales en las variables de entorno ni en Streamlit Secrets")
+        _avisar("error", "No se encontraron las credenciales en las variables de entorno ni en Streamlit Secrets")
         return None
         
     # Convertir el string JSON a diccionario
     try:
         credentials_info = json.loads(credentials_json)
     except json.JSONDecodeError:
-        st.error("Error al decodificar las credenciales JSON")
+        _avisar("error", "Error al decodificar las credenciales JSON")
+        return None
+    
+    # Configurar las credenciales directamente desde el diccionario, sin archivo temporal
+    try:
+        creds = Credentials.from_service_account_info(credentials_info, scopes=SCOPES)
+        return gspread.authorize(creds)
+    except Exception as e:
+        _avisar("error", f"Error al conectar con Google Sheets: {e}")
+        return None
+
+# Función para establecer conexión con Google Sheets
+def connect_to_gsheets():
+    """
+    Devuelve el cliente de Google Sheets compartido, autorizándolo solo la primera vez.
+    
+    El cliente reutiliza su sesión HTTP y google-auth renueva el token
+    únicamente cuando vence.
+    
+    Returns:
+        Cliente de gspread o None si no se pudo autorizar
+    """
+    global _cliente_gsheets
+    with _cliente_lock:
+        if _cliente_gsheets is None:
+            _cliente_gsheets = _crear_cliente()
+        return _cliente_gsheets
+
+def reiniciar_conexion():
+    """
+    Descarta el cliente compartido para que la próxima llamada vuelva a autorizar.
+    """
+    global _cliente_gsheets
+    with _cliente_lock:
+        _cliente_gsheets = None
+        _hojas_abiertas.clear()
+
+def estadisticas_cache():
+    """
+    Devuelve los contadores de la caché compartida de hojas.
+    
+    Returns:
+        dict: Aciertos, fallos, hojas almacenadas, TTL configurado, uso de la API
+              (peticiones, reintentos y segundos de espera por cuota) y "errores": las
+              últimas fallas vigentes de la actualización de hojas y del precálculo de
+              agregados, como lista de {"origen", "momento", "mensaje"}
+    """
+    with _cache_lock:
+        estadisticas = {
+            "aciertos": _cache_estadisticas["aciertos"],
+            "fallos": _cache_estadisticas["fallos"],
+            "hojas": len(_cache_hojas),
+            "ttl": CACHE_TTL_SEGUNDOS,
+            "errores": [dict(error, origen=f"hoja {clave[1]}") for clave, error in _errores_actualizacion.items()]
+        }
+    estadisticas["errores"] += [dict(error, origen=f"agregado {nombre}")
+                                for nombre, error in errores_precalculo().items()]
+    estadisticas.update(estadisticas_api())
+    return estadisticas
+
+def refrescar_datos(sheet_id=None, sheet_name=None):
+    """
+    Invalida la caché compartida para forzar una descarga completa en la próxima llamada a load_data.
+    
+    Las entradas se conservan en memoria: las demás sesiones las siguen usando mientras
+    tanto y, si la descarga falla, se muestran como últimos datos guardados. La copia en
+    disco tampoco se usa para esa llamada.
+    
+    Args:
+        sheet_id: ID de la hoja a invalidar (None invalida todas)
+        sheet_name: Nombre o índice de la pestaña a invalidar (None invalida todas las de la hoja)
+    """
+    with _cache_lock:
+        for clave in list(_cache_hojas):
+            if sheet_id is not None and clave[0] != sheet_id:
+                continue
+            if sheet_name is not None and clave[1] != sheet_name:
+                continue
+            _recargas_pedidas.add(clave)
+
+def letra_a_indice(letra):
+    """
+    Convierte una letra de columna de la hoja (A, AH, CX...) a su índice 0-indexado.
+    """
+    indice = 0
+    for caracter in letra.upper():
+        indice = indice * 26 + (ord(caracter) - ord('A') + 1)
+    return indice - 1
+
+def indice_a_letra(indice):
+    """
+    Convierte un índice de columna 0-indexado a su letra en la hoja.
+    """
+    letra = ""
+    indice += 1
+    while indice > 0:
+        indice, resto = divmod(indice - 1, 26)
+        letra = chr(ord('A') + resto) + letra
+    return letra
+
+def columna_por_posicion(df, indice):
+    """
+    Devuelve el nombre de la columna que ocupa la posición `indice` en la hoja original.
+    
+    Funciona tanto con DataFrames completos como con los descargados con proyección
+    de columnas (que guardan sus posiciones originales en df.attrs).
+    
+    Args:
+        df: DataFrame cargado con load_data
+        indice: Posición de la columna en la hoja (0-indexado)
+    
+    Returns:
+        str: Nombre de la columna o None si no está disponible
+    """
+    posiciones = df.attrs.get("posiciones")
+    if posiciones is None:
+        return df.columns[indice] if len(df.columns) > indice else None
+    posicion = posiciones.get(indice)
+    return df.columns[posicion] if posicion is not None else None
+
+def _ubicacion_por_posicion(df, indice):
+    """
+    Devuelve la ubicación (entera) en df de la columna que ocupa la posición `indice`
+    en la hoja original, o None si no está disponible. A diferencia de
+    columna_por_posicion, funciona aunque el encabezado de esa columna esté repetido.
+    """
+    posiciones = df.attrs.get("posiciones")
+    if posiciones is None:
+        return indice if len(df.columns) > indice else None
+    return posiciones.get(indice)
+
+def _ubicacion_esquema(df, posicion, asignadas=()):
+    """
+    Resuelve la posición de una entrada del esquema (índice, patrón de encabezado o
+    tupla de alternativas) a una ubicación entera en df, o None si no se encuentra.
+    """
+    if posicion is None:
+        return None
+    if isinstance(posicion, tuple):
+        for alternativa in posicion:
+            ubicacion = _ubicacion_esquema(df, alternativa, asignadas)
+            if ubicacion is not None:
+                return ubicacion
+        return None
+    if isinstance(posicion, re.Pattern):
+        for ubicacion, encabezado in enumerate(df.columns):
+            if ubicacion not in asignadas and posicion.search(str(encabezado)):
+                return ubicacion
         return None
+    return _ubicacion_por_posicion(df, posicion)
+
+def _es_rango_letras(spec):
+    """
+    Indica si spec es un rango explícito de letras de columna ("AK:AW", "AB:AB").
+    
+    Un texto sin ":" siempre es un nombre de encabezado: nombres cortos como "ID" o
+    "ED" no deben confundirse con letras de columna.
+    """
+    return re.fullmatch(r"[A-Za-z]{1,3}:[A-Za-z]{1,3}", spec) is not None
+
+def _resolver_columnas(worksheet, columnas):
+    """
+    Convierte una especificación de columnas en grupos contiguos de índices.
+    
+    Args:
+        worksheet: Pestaña de gspread
+        columnas: Lista con rangos de letras ("AK:AW", o "AH:AH" para una sola columna),
+                  índices enteros, nombres de encabezado ("FECHA") o patrones
+                  (re.compile) que se buscan en el texto de los encabezados
+    
+    Returns:
+        list: Lista ordenada de tuplas (inicio, fin) 0-indexadas e inclusivas
+    """
+    indices = set()
+    encabezados = None
+    for spec in columnas:
+        if isinstance(spec, int):
+            indices.add(spec)
+        elif isinstance(spec, str) and _es_rango_letras(spec):
+            inicio, _, fin = spec.partition(":")
+            indices.update(range(letra_a_indice(inicio), letra_a_indice(fin) + 1))
+        else:
+            # Nombre o patrón de encabezado: se necesita leer la primera fila una sola vez
+            if encabezados is None:
+                encabezados = llamar_api(worksheet.row_values, 1)
+            if isinstance(spec, re.Pattern):
+                indices.update(i for i, encabezado in enumerate(encabezados) if spec.search(str(encabezado)))
+            elif spec in encabezados:
+                indices.add(encabezados.index(spec))
+    
+    # Agrupar índices consecutivos para pedir el menor número de rangos
+    grupos = []
+    for indice in sorted(indices):
+        if grupos and grupos[-1][1] == indice - 1:
+            grupos[-1] = (grupos[-1][0], indice)
+        else:
+            grupos.append((indice, indice))
+    return grupos
+
+def _rangos_filas(grupos, inicio, fin):
+    """
+    Construye los rangos A1 para leer las filas [inicio, fin] de los grupos de columnas.
+    """
+    if grupos is None:
+        return [f"{inicio}:{fin}"]
+    return [f"{indice_a_letra(a)}{inicio}:{indice_a_letra(b)}{fin}" for a, b in grupos]
+
+def _unir_grupos(respuestas, grupos):
+    """
+    Combina las respuestas de cada grupo de columnas en filas completas.
+    
+    La API recorta las celdas y filas vacías del final de cada rango, así que
+    cada grupo se rellena a su ancho y todos se alinean por número de fila.
+    """
+    if grupos is None:
+        return [list(fila) for fila in respuestas[0]]
+    
+    anchos = [b - a + 1 for a, b in grupos]
+    total_filas = max((len(r) for r in respuestas), default=0)
+    filas = []
+    for i in range(total_filas):
+        fila = []
+        for respuesta, ancho in zip(respuestas, anchos):
+            celdas = list(respuesta[i]) if i < len(respuesta) else []
+            fila.extend(celdas[:ancho] + [''] * (ancho - len(celdas)))
+        filas.append(fila)
+    return filas
+
+def _posiciones_originales(grupos):
+    """
+    Mapea la posición original de cada columna en la hoja a su posición en el DataFrame proyectado.
+    """
+    posiciones = {}
+    for a, b in grupos:
+        for indice in range(a, b + 1):
+            posiciones[indice] = len(posiciones)
+    return posiciones
+
+def _convertir_tipo(serie, tipo):
+    """
+    Convierte una columna de texto al tipo indicado en el esquema.
+    
+    Args:
+        serie: Serie con los valores crudos de la hoja
+        tipo: "categoria", "numero" o "fecha"
+    
+    Returns:
+        Serie convertida
+    """
+    if tipo == "categoria":
+        return serie.astype("category")
+    if tipo == "numero":
+        numeros = pd.to_numeric(serie, errors="coerce")
+        validos = numeros.dropna()
+        # Enteros con valores faltantes se guardan como Int64 en lugar de float
+        if (validos == validos.round()).all():
+            return numeros.round().astype("Int64")
+        return numeros
+    if tipo == "fecha":
+        # Las fechas de la hoja vienen en formato DD/MM/YYYY
+        return pd.to_datetime(serie, format="%d/%m/%Y", errors="coerce")
+    return serie
 
-    # Guardar las credenciales temporalmente en un archivo
-    with open('temp_credentials.json', 'w') as f:
-        json.dump(credentials_info, f)
+def aplicar_esquema(df, esquema):
+    """
+    Convierte en el lugar las columnas declaradas en el esquema a su tipo y les da
+    su nombre canónico.
     
-    # Configurar las credenciales
-    scopes = ['https://spreadsheets.google.com/feeds',
-             'https://www.googleapis.com/auth/drive']
+    Cada columna se busca primero por su nombre y, si no existe (o está repetido), por su
+    posición en la hoja. La posición puede ser un índice, un patrón (re.compile) que se
+    busca en el texto de los encabezados o una tupla de alternativas que se prueban en
+    orden; un patrón toma la primera columna que coincide y que no tomó otra entrada.
+    Las que se encuentran por posición o patrón se renombran con el nombre del esquema, de modo que las páginas las usan directamente por nombre sin copiarlas. Cada
+    columna se renombra por separado: solo se omiten (con una advertencia) los nombres
+    que quedarían repetidos, y los encabezados repetidos de otras columnas no impiden
+    los demás renombres.
+    
+    Args:
+        df: DataFrame recién cargado
+        esquema: Diccionario {nombre: (posición en la hoja, patrón, tupla de ellos o
+                 None, tipo o None)}. Un tipo None solo asigna el nombre canónico.
+    
+    Returns:
+        DataFrame: El mismo DataFrame con las columnas convertidas y renombradas
+    """
+    originales = list(df.columns)
+    nombres = list(originales)
+    asignadas = set()
+    for nombre, (posicion, tipo) in esquema.items():
+        ubicacion = df.columns.get_loc(nombre) if nombre in df.columns else None
+        if not isinstance(ubicacion, int):
+            ubicacion = _ubicacion_esquema(df, posicion, asignadas)
+        if not isinstance(ubicacion, int):
+            continue
+        asignadas.add(ubicacion)
+        
+        if tipo is not None:
+            df.isetitem(ubicacion, _convertir_tipo(df.iloc[:, ubicacion], tipo))
+        nombres[ubicacion] = nombre
+    
+    # Los renombres que dejarían un nombre repetido vuelven al encabezado original
+    repetidos = {nombre for nombre in nombres if nombres.count(nombre) > 1}
+    omitidos = []
+    for ubicacion, (nombre, original) in enumerate(zip(nombres, originales)):
+        if nombre != original and nombre in repetidos:
+            nombres[ubicacion] = original
+            omitidos.append(nombre)
+    if omitidos:
+        _avisar("warning", f"No se renombraron columnas cuyo nombre quedaría repetido: {', '.join(omitidos)}")
+    
+    # Renombrar solo cambia las etiquetas: los datos de las columnas no se copian
+    df.columns = nombres
+    return df
+
+def _concatenar_bloques(bloques):
+    """
+    Concatena DataFrames con las mismas columnas conservando las columnas categóricas.
+    
+    pd.concat convierte a object las categóricas con categorías distintas, así que
+    antes se unen las categorías de todos los bloques. Se conservan los attrs del primero.
+    """
+    if len(bloques) == 1:
+        return bloques[0]
+    
+    bloques = [bloque.copy(deep=False) for bloque in bloques]
+    primero = bloques[0]
+    for i in range(primero.shape[1]):
+        if not isinstance(primero.iloc[:, i].dtype, pd.CategoricalDtype):
+            continue
+        series = [bloque.iloc[:, i].astype("category") for bloque in bloques]
+        categorias = series[0].cat.categories
+        for serie in series[1:]:
+            categorias = categorias.union(serie.cat.categories)
+        for bloque, serie in zip(bloques, series):
+            if not categorias.equals(serie.cat.categories):
+                serie = serie.cat.set_categories(categorias)
+            bloque.isetitem(i, serie)
+    
+    resultado = pd.concat(bloques, ignore_index=True)
+    resultado.attrs = dict(primero.attrs)
+    return resultado
+
+def load_data(sheet_id, sheet_name=0, ttl=None, forzar=False, incremental=True, columnas=None, esquema=None,
+              progreso=None):
+    """
+    Carga una hoja de Google Sheets usando la caché compartida del proceso.
+    
+    Una sola descarga sirve a todas las sesiones mientras no venza el TTL. Al vencer,
+    se siguen sirviendo los datos en caché mientras un hilo en segundo plano descarga
+    solo las filas nuevas (modo incremental). Solo esperan la descarga la primera carga
+    sin caché ni copia en disco y la primera tras refrescar_datos, que relee la hoja completa.
+    
+    Args:
+        sheet_id: ID de la hoja de cálculo
+        sheet_name: Nombre o índice de la pestaña
+        ttl: Tiempo de vida en segundos (por defecto CACHE_TTL_SEGUNDOS)
+        forzar: Si es True, ignora la caché y descarga la hoja completa (también tras
+                refrescar_datos)
+        incremental: Si es True, intenta agregar solo las filas nuevas al vencer el TTL
+        columnas: Lista opcional de columnas a descargar (rangos de letras "AK:AW",
+                  índices o nombres de encabezado). None descarga todas.
+        esquema: Diccionario opcional {nombre: (posición, tipo)} con los tipos a aplicar
+                 al cargar (ver aplicar_esquema)
+        progreso: Función opcional progreso(filas_leidas, filas_totales) que se llama
+                  tras cada bloque cuando la hoja se descarga completa
+    
+    Returns:
+        DataFrame: Los datos de la hoja o None si hay un error
+    """
+    ttl = CACHE_TTL_SEGUNDOS if ttl is None else ttl
+    clave = _clave_cache(sheet_id, sheet_name, columnas, esquema)
+    
+    with _cache_lock:
+        # Tras refrescar_datos la primera llamada descarga la hoja completa
+        if clave in _recargas_pedidas:
+            _recargas_pedidas.discard(clave)
+            forzar = True
+        entrada = _cache_hojas.get(clave)
+        if not forzar and entrada is not None and time.monotonic() - entrada["momento"] < ttl:
+            _cache_estadisticas["aciertos"] += 1
+            # Copia superficial: las páginas pueden agregar columnas sin alterar la caché
+            return entrada["df"].copy(deep=False)
+        _cache_estadisticas["fallos"] += 1
+    
+    if entrada is not None and not forzar:
+        # Datos vencidos: se sirven mientras se actualizan en segundo plano
+        _refrescar_en_segundo_plano(clave, incremental)
+        return entrada["df"].copy(deep=False)
+    
+    if entrada is None and not forzar:
+        # Arranque en frío: servir la última copia en disco y actualizar en segundo plano
+        entrada = _entrada_desde_disco(clave)
+        if entrada is not None:
+            with _cache_lock:
+                _cache_hojas.setdefault(clave, entrada)
+            _refrescar_en_segundo_plano(clave, incremental)
+            return entrada["df"].copy(deep=False)
+    
+    nueva_entrada = _actualizar_una_vez(clave, entrada, forzar, incremental, progreso)
+    if nueva_entrada is not None:
+        return nueva_entrada["df"].copy(deep=False)
+    
+    # Sin conexión o sin cuota: usar la última copia válida en memoria o en disco
+    if entrada is None:
+        entrada = _entrada_desde_disco(clave)
+    if entrada is not None:
+        with _cache_lock:
+            # Reintentar recién al vencer de nuevo el TTL
+            entrada["momento"] = time.monotonic()
+            _cache_hojas.setdefault(clave, entrada)
+        _avisar("warning", "No se pudo actualizar desde Google Sheets. Se muestran los últimos datos guardados.")
+        return entrada["df"].copy(deep=False)
+    return None
+
+def _clave_cache(sheet_id, sheet_name=0, columnas=None, esquema=None):
+    """
+    Construye la clave de la caché compartida a partir de los argumentos de load_data.
+    """
+    return (
+        sheet_id,
+        sheet_name,
+        tuple(columnas) if columnas is not None else None,
+        tuple((nombre,) + tuple(spec) for nombre, spec in esquema.items()) if esquema is not None else None
+    )
+
+def datos_listos(sheet_id, sheet_name=0, columnas=None, esquema=None):
+    """
+    Devuelve la última versión publicada de una hoja sin descargar nada.
+    
+    Returns:
+        DataFrame: Copia superficial de los datos en caché o None si aún no se cargaron
+    """
+    with _cache_lock:
+        entrada = _cache_hojas.get(_clave_cache(sheet_id, sheet_name, columnas, esquema))
+    return entrada["df"].copy(deep=False) if entrada is not None else None
+
+def iniciar_actualizador(solicitudes, intervalo=None):
+    """
+    Programa la actualización periódica de varias hojas en un hilo del proceso.
+    
+    El hilo descarga las filas nuevas de cada hoja cada cierto intervalo y publica la
+    nueva versión en la caché con un solo reemplazo, de modo que las sesiones siempre
+    leen datos completos y ninguna espera la descarga. Llamarla de nuevo solo agrega
+    hojas a la programación; el hilo se crea una sola vez por proceso.
+    
+    Args:
+        solicitudes: Lista de diccionarios con argumentos de load_data
+                     (sheet_id, sheet_name, columnas, esquema, incremental)
+        intervalo: Segundos entre actualizaciones (por defecto INTERVALO_ACTUALIZACION_SEGUNDOS)
+    """
+    global _actualizador
+    intervalo = INTERVALO_ACTUALIZACION_SEGUNDOS if intervalo is None else intervalo
+    if intervalo <= 0:
+        return
+    
+    with _cache_lock:
+        for argumentos in solicitudes:
+            clave = _clave_cache(
+                argumentos["sheet_id"], argumentos.get("sheet_name", 0),
+                argumentos.get("columnas"), argumentos.get("esquema")
+            )
+            _claves_programadas[clave] = argumentos.get("incremental", True)
+        if _actualizador is not None and _actualizador.is_alive():
+            return
+        _actualizador = threading.Thread(
+            target=_bucle_actualizador, args=(intervalo,), name="actualizador-hojas", daemon=True
+        )
+    _actualizador.start()
+
+def _bucle_actualizador(intervalo):
+    """
+    Actualiza las hojas programadas cada `intervalo` segundos.
+    """
+    while True:
+        time.sleep(intervalo)
+        with _cache_lock:
+            programadas = list(_claves_programadas.items())
+        for clave, incremental in programadas:
+            try:
+                with _cache_lock:
+                    entrada = _cache_hojas.get(clave)
+                _actualizar_una_vez(clave, entrada, incremental=incremental)
+            except Exception as e:
+                # Un fallo en una hoja no detiene la actualización de las demás
+                logger.exception("Falló la actualización programada de la hoja %s", clave[1])
+                _registrar_error(clave, f"{type(e).__name__}: {e}")
+
+def cargar_hojas(solicitudes, max_hilos=4):
+    """
+    Carga varias pestañas en paralelo, cada una con load_data (y su caché).
+    
+    El tiempo total es el de la descarga más lenta en lugar de la suma de todas.
+    
+    Args:
+        solicitudes: Diccionario {nombre: argumentos de load_data}, por ejemplo
+                     {"COMEDORES": {"sheet_id": "...", "sheet_name": "COMEDORES"}}
+        max_hilos: Número máximo de descargas simultáneas
+    
+    Returns:
+        dict: {nombre: DataFrame o None}
+    """
+    if not solicitudes:
+        return {}
+    
+    # Los hilos comparten el contexto de la sesión para poder mostrar mensajes
+    contexto = get_script_run_ctx()
+    
+    def cargar(argumentos):
+        if contexto is not None:
+            add_script_run_ctx(threading.current_thread(), contexto)
+        return load_data(**argumentos)
+    
+    with ThreadPoolExecutor(max_workers=min(max_hilos, len(solicitudes))) as executor:
+        futuros = {nombre: executor.submit(cargar, argumentos) for nombre, argumentos in solicitudes.items()}
+        return {nombre: futuro.result() for nombre, futuro in futuros.items()}
+
+def _esquema_de_clave(clave):
+    """
+    Reconstruye el diccionario de esquema a partir de la clave de caché.
+    """
+    if clave[3] is None:
+        return None
+    return {nombre: (posicion, tipo) for nombre, posicion, tipo in clave[3]}
+
+def _actualizar_entrada(clave, entrada, forzar=False, incremental=True, progreso=None):
+    """
+    Descarga la hoja (solo filas nuevas si es posible), actualiza la caché y guarda la copia en disco.
+    
+    Antes de publicar una versión nueva se calculan sus agregados registrados
+    (ver utils.agregados.precalcular). Si la descarga falla, el motivo queda como última
+    falla de la hoja (ver estadisticas_cache).
+    
+    Args:
+        clave: Clave de caché (sheet_id, hoja, columnas, esquema)
+        entrada: Entrada de caché vigente o None
+        forzar: Si es True, descarga la hoja completa
+        incremental: Si es True, intenta descargar solo las filas nuevas
+        progreso: Función opcional de avance de la descarga completa
+    
+    Returns:
+        dict: Nueva entrada de caché o None si la descarga falló
+    """
+    sheet_id, sheet_name, columnas = clave[0], clave[1], clave[2]
+    esquema = _esquema_de_clave(clave)
+    
+    nueva_entrada = None
+    anterior = None
+    _ultimo_aviso.error = None
+    if (incremental and not forzar and entrada is not None
+            and time.monotonic() - entrada["momento_completo"] < RECARGA_COMPLETA_SEGUNDOS):
+        nueva_entrada = _descargar_filas_nuevas(sheet_id, sheet_name, entrada, esquema)
+        if nueva_entrada is not None:
+            # Las filas nuevas quedan al final: los agregados se actualizan solo con ellas
+            anterior = (entrada["df"].attrs.get("version"), len(entrada["df"]))
+    
+    if nueva_entrada is None:
+        nueva_entrada = _descargar_hoja(sheet_id, sheet_name, columnas, esquema, progreso)
+    
+    if nueva_entrada is not None:
+        cambio = entrada is None or nueva_entrada["df"] is not entrada["df"]
+        if cambio:
+            _marcar_version(nueva_entrada["df"], anterior)
+            # Los agregados registrados se calculan antes de publicar: las sesiones siguen
+            # usando la versión anterior mientras tanto
+            precalcular(nueva_entrada["df"])
+        # La nueva versión se publica con un solo reemplazo de la referencia
+        with _cache_lock:
+            _cache_hojas[clave] = nueva_entrada
+        # Solo se reescribe el archivo si los datos cambiaron
+        if cambio:
+            guardar_snapshot(clave, nueva_entrada)
+        with _cache_lock:
+            _errores_actualizacion.pop(clave, None)
+    else:
+        # El motivo es el último error avisado por la descarga en este hilo
+        _registrar_error(clave, getattr(_ultimo_aviso, "error", None) or "No se pudo descargar la hoja.")
+    return nueva_entrada
+
+def _actualizar_una_vez(clave, entrada, forzar=False, incremental=True, progreso=None):
+    """
+    Actualiza la entrada de caché asegurando una sola descarga simultánea por clave.
+    
+    La primera sesión que encuentra la caché vencida descarga la hoja; las que llegan
+    mientras tanto esperan y reciben el mismo resultado.
+    
+    Returns:
+        dict: Nueva entrada de caché o None si la descarga falló
+    """
+    with _cache_lock:
+        descarga = _descargas_en_curso.get(clave)
+        lider = descarga is None
+        if lider:
+            descarga = {"lista": threading.Event(), "entrada": None}
+            _descargas_en_curso[clave] = descarga
+    
+    if not lider:
+        descarga["lista"].wait()
+        return descarga["entrada"]
     
     try:
-        creds = Credentials.from_service_account_file('temp_credentials.json', scopes=scopes)
-        client = gspread.authorize(creds)
-        # Eliminar el archivo temporal
-        os.remove('temp_credentials.json')
-        return client
-    except Exception as e:
-        st.error(f"Error al conectar con Google Sheets: {e}")
-        # Intentar eliminar el archivo temporal si existe
+        descarga["entrada"] = _actualizar_entrada(clave, entrada, forzar, incremental, progreso)
+    finally:
+        with _cache_lock:
+            _descargas_en_curso.pop(clave, None)
+        descarga["lista"].set()
+    return descarga["entrada"]
+
+def _marcar_version(df, anterior=None):
+    """
+    Asigna al DataFrame que se va a publicar su número de versión y su número de filas.
+    
+    Los DataFrames filtrados conservan los attrs, así que el número de filas permite
+    distinguir la versión completa de sus subconjuntos.
+    
+    Args:
+        df: DataFrame a publicar
+        anterior: (versión, filas) de la versión publicada de la que df solo agrega filas
+                  al final, o None si df es una descarga completa (ver utils.agregados)
+    """
+    df.attrs["version"] = next(_versiones)
+    df.attrs["filas"] = len(df)
+    if anterior is None:
+        df.attrs.pop("anterior", None)
+    else:
+        df.attrs["anterior"] = anterior
+
+def _refrescar_en_segundo_plano(clave, incremental=True):
+    """
+    Lanza un hilo que actualiza la entrada de caché sin bloquear a la sesión que la pidió.
+    """
+    with _cache_lock:
+        if clave in _refrescos_en_curso:
+            return
+        _refrescos_en_curso.add(clave)
+    
+    def tarea():
         try:
-            os.remove('temp_credentials.json')
-        except:
-            pass
+            with _cache_lock:
+                entrada = _cache_hojas.get(clave)
+            if _actualizar_una_vez(clave, entrada, incremental=incremental) is None and entrada is not None:
+                with _cache_lock:
+                    # Sin conexión o sin cuota: reintentar recién al vencer de nuevo el TTL
+                    entrada["momento"] = time.monotonic()
+        except Exception as e:
+            logger.exception("Falló la actualización en segundo plano de la hoja %s", clave[1])
+            _registrar_error(clave, f"{type(e).__name__}: {e}")
+        finally:
+            with _cache_lock:
+                _refrescos_en_curso.discard(clave)
+    
+    threading.Thread(target=tarea, name=f"refresco-{clave[1]}", daemon=True).start()
+
+def _entrada_desde_disco(clave):
+    """
+    Construye una entrada de caché a partir de la última copia guardada en disco.
+    
+    Returns:
+        dict: Entrada de caché o None si no hay copia disponible
+    """
+    leido = leer_snapshot(clave)
+    if leido is None:
         return None
+    
+    df, metadatos = leido
+    grupos = metadatos["grupos"]
+    if grupos is not None:
+        df.attrs["posiciones"] = _posiciones_originales(grupos)
+    _marcar_version(df)
+    
+    ahora = time.monotonic()
+    # La recarga completa periódica se cuenta desde la última descarga completa de la
+    # copia; sin ese dato la próxima actualización descarga la hoja completa
+    descarga_completa = metadatos.get("descarga_completa")
+    if descarga_completa is None:
+        momento_completo = ahora - RECARGA_COMPLETA_SEGUNDOS
+    else:
+        momento_completo = ahora - (time.time() - descarga_completa)
+    return {
+        "momento": ahora,
+        "momento_completo": momento_completo,
+        "df": df,
+        "encabezados": metadatos["encabezados"],
+        "grupos": grupos,
+        "filas_leidas": metadatos["filas_leidas"],
+        "ultima_fila": metadatos["ultima_fila"],
+        # Las copias sin huella obligan a una recarga completa en la próxima actualización
+        "huella": metadatos.get("huella")
+    }
 
-def load_data(sheet_id, sheet_name=0):
+def _abrir_pestana(client, sheet_id, sheet_name):
+    """
+    Abre la pestaña indicada por nombre o índice dentro de la hoja de cálculo.
+    """
+    # Abrir la hoja por ID una sola vez y reutilizarla en las siguientes cargas
+    with _cliente_lock:
+        sheet = _hojas_abiertas.get(sheet_id)
+    if sheet is None:
+        sheet = llamar_api(client.open_by_key, sheet_id)
+        with _cliente_lock:
+            _hojas_abiertas[sheet_id] = sheet
+    # Obtener la primera hoja o la especificada
+    if isinstance(sheet_name, int):
+        return llamar_api(sheet.get_worksheet, sheet_name)
+    return llamar_api(sheet.worksheet, sheet_name)
+
+def _recortar_fila(fila):
+    """
+    Elimina las celdas vacías al final de una fila para poder comparar filas
+    devueltas por distintos métodos de la API.
+    """
+    fila = list(fila)
+    while fila and not str(fila[-1]).strip():
+        fila.pop()
+    return fila
+
+def _huella(celdas):
+    """
+    Calcula la huella (SHA-1) de las celdas de una columna para detectar cambios.
+    
+    Las celdas vacías del final no cuentan, porque la API las recorta de sus respuestas.
+    """
+    celdas = _recortar_fila(celdas)
+    return hashlib.sha1("\x1f".join(str(celda) for celda in celdas).encode("utf-8")).hexdigest()
+
+def _primeras_celdas(filas):
+    """
+    Devuelve la primera celda de cada fila ('' si la fila llegó vacía).
+    """
+    return [fila[0] if fila else '' for fila in filas]
+
+def _filas_a_dataframe(headers, filas, grupos=None):
+    """
+    Construye un DataFrame descartando las filas vacías.
+    
+    La matriz de valores se normaliza en bloque: se iguala el ancho de las filas
+    con una sola reindexación y las filas vacías se descartan con una máscara
+    vectorizada en lugar de revisar fila por fila.
+    
+    Args:
+        headers: Lista de encabezados
+        filas: Lista de filas (listas de celdas) sin la fila de encabezados
+        grupos: Grupos de columnas descargados (None si se descargó la hoja completa)
+    
+    Returns:
+        DataFrame con las filas que tienen al menos un valor
+    """
+    ancho = len(headers)
+    
+    if filas and all(len(fila) == ancho for fila in filas):
+        # Caso habitual: get_values() ya devuelve una matriz rectangular
+        valores = np.array(filas, dtype=object)
+    else:
+        # Filas de distinto ancho: una sola reindexación rellena o recorta las columnas
+        valores = (
+            pd.DataFrame(filas, dtype=object)
+            .reindex(columns=range(ancho))
+            .fillna('')
+            .to_numpy(dtype=object)
+        )
+    
+    # Filas con al menos una celda no vacía
+    celdas_con_valor = valores != ''
+    mascara = celdas_con_valor.any(axis=1)
+    
+    # Las celdas con solo espacios cuentan como vacías; basta revisar las filas cuya
+    # primera celda no vacía es un espacio en blanco (casi nunca ocurre)
+    candidatas = np.flatnonzero(mascara)
+    primeras = valores[candidatas, celdas_con_valor[candidatas].argmax(axis=1)]
+    for fila in candidatas[[not celda.strip() for celda in primeras]]:
+        mascara[fila] = any(celda.strip() for celda in valores[fila])
+    
+    # Crear DataFrame sólo con filas no vacías
+    df = pd.DataFrame(valores[mascara], columns=headers)
+    if grupos is not None:
+        df.attrs["posiciones"] = _posiciones_originales(grupos)
+    return df
+
+def _crear_entrada(df, headers, values, grupos=None, momento_completo=None, huella=None):
+    """
+    Crea la entrada de caché con la información necesaria para la carga incremental.
+    
+    La huella es la de la primera columna descargada en las filas ya leídas (sin el
+    encabezado); la carga incremental la compara para detectar filas borradas,
+    insertadas o reordenadas (ver _descargar_filas_nuevas).
+    """
+    ahora = time.monotonic()
+    return {
+        "momento": ahora,
+        "momento_completo": ahora if momento_completo is None else momento_completo,
+        "df": df,
+        "encabezados": headers,
+        "grupos": grupos,
+        # Número de filas de la hoja (incluyendo encabezados) ya leídas
+        "filas_leidas": len(values),
+        "ultima_fila": _recortar_fila(values[-1]),
+        "huella": huella
+    }
+
+def _descargar_filas_nuevas(sheet_id, sheet_name, entrada, esquema=None):
+    """
+    Descarga solo las filas posteriores a las ya leídas y las agrega al DataFrame en caché.
+    
+    Junto con las filas nuevas se vuelven a leer el encabezado, la última fila conocida
+    y la primera columna descargada de todas las filas ya leídas (en la misma petición).
+    Si el encabezado o la última fila cambiaron, o si la huella de esa columna no
+    coincide con la guardada (filas borradas, insertadas o reordenadas, o ediciones en
+    esa columna), se devuelve None para que el llamador haga una recarga completa.
+    
+    Las ediciones de filas anteriores en las demás columnas no se detectan aquí: se
+    recogen en la recarga completa periódica (RECARGA_COMPLETA_SEGUNDOS) o al pedir
+    una actualización manual (refrescar_datos).
+    
+    Args:
+        sheet_id: ID de la hoja de cálculo
+        sheet_name: Nombre o índice de la pestaña
+        entrada: Entrada de caché vigente
+        esquema: Esquema de tipos a aplicar a las filas nuevas
+    
+    Returns:
+        dict: Nueva entrada de caché o None si se requiere recarga completa
+    """
+    try:
+        client = connect_to_gsheets()
+        if not client:
+            return None
+        worksheet = _abrir_pestana(client, sheet_id, sheet_name)
+        
+        grupos = entrada["grupos"]
+        filas_leidas = entrada["filas_leidas"]
+        bloques = [(1, 1), (filas_leidas, filas_leidas)]
+        if worksheet.row_count > filas_leidas:
+            bloques.append((filas_leidas + 1, worksheet.row_count))
+        
+        # Una sola petición para encabezado, última fila conocida, filas nuevas y la
+        # columna de la huella
+        rangos = []
+        for inicio, fin in bloques:
+            rangos.extend(_rangos_filas(grupos, inicio, fin))
+        letra = indice_a_letra(grupos[0][0] if grupos else 0)
+        if filas_leidas > 1:
+            rangos.append(f"{letra}2:{letra}{filas_leidas}")
+        respuesta = llamar_api(worksheet.batch_get, rangos)
+        
+        # La columna de la huella se rellena hasta las filas leídas (la API recorta las vacías)
+        columna = []
+        if filas_leidas > 1:
+            columna = _primeras_celdas(respuesta[-1])
+            respuesta = respuesta[:-1]
+            rangos = rangos[:-1]
+        columna += [''] * (filas_leidas - 1 - len(columna))
+        
+        por_bloque = len(rangos) // len(bloques)
+        bloques_leidos = [
+            _unir_grupos(respuesta[i * por_bloque:(i + 1) * por_bloque], grupos)
+            for i in range(len(bloques))
+        ]
+        
+        encabezados = bloques_leidos[0][0] if bloques_leidos[0] else []
+        ultima_fila = bloques_leidos[1][0] if bloques_leidos[1] else []
+        if (_recortar_fila(encabezados) != _recortar_fila(entrada["encabezados"])
+                or _recortar_fila(ultima_fila) != entrada["ultima_fila"]
+                or _huella(columna) != entrada.get("huella")):
+            return None
+        
+        nuevas = bloques_leidos[2] if len(bloques_leidos) > 2 else []
+        if not nuevas:
+            nueva_entrada = dict(entrada)
+            nueva_entrada["momento"] = time.monotonic()
+            return nueva_entrada
+        
+        headers = entrada["encabezados"]
+        df_nuevas = _filas_a_dataframe(headers, nuevas, grupos)
+        if esquema is not None:
+            aplicar_esquema(df_nuevas, esquema)
+        df = _concatenar_bloques([entrada["df"], df_nuevas])
+        
+        nueva_entrada = _crear_entrada(df, headers, nuevas, grupos, entrada["momento_completo"],
+                                       _huella(columna + _primeras_celdas(nuevas)))
+        nueva_entrada["filas_leidas"] = filas_leidas + len(nuevas)
+        
+        _avisar("info", f"Se agregaron {len(df_nuevas)} filas nuevas. Total de filas con datos: {len(df)}")
+        return nueva_entrada
+    except Exception:
+        # Ante cualquier problema se recurre a la recarga completa
+        return None
+
+def _descargar_hoja(sheet_id, sheet_name=0, columnas=None, esquema=None, progreso=None):
+    """
+    Descarga una pestaña de Google Sheets sin pasar por la caché.
+    
+    Si se indican columnas, solo se descargan esos rangos en una única petición por lotes.
+    Si se indica un esquema, las columnas se convierten a sus tipos al cargar.
+    Las hojas de más de FILAS_POR_BLOQUE filas se descargan por bloques (ver _descargar_por_bloques).
+    
+    Returns:
+        dict: Entrada de caché con el DataFrame o None si hay un error
+    """
     try:
         client = connect_to_gsheets()
         if client:
-            # Abrir la hoja por ID
-            sheet = client.open_by_key(sheet_id)
-            # Obtener la primera hoja o la especificada
-            worksheet = sheet.get_worksheet(sheet_name) if isinstance(sheet_name, int) else sheet.worksheet(sheet_name)
+            worksheet = _abrir_pestana(client, sheet_id, sheet_name)
             
-            # Obtener todos los valores como una lista de listas
-            values = worksheet.get_values()
+            grupos = None
+            if columnas is not None:
+                grupos = _resolver_columnas(worksheet, columnas)
+                if not grupos:
+                    _avisar("error", "Ninguna de las columnas solicitadas existe en la hoja.")
+                    return None
+            
+            if worksheet.row_count > FILAS_POR_BLOQUE:
+                entrada = _descargar_por_bloques(worksheet, grupos, esquema, progreso)
+                if entrada is None:
+                    _avisar("error", "No se encontraron datos en la hoja.")
+                    return None
+                _avisar("success", f"Datos cargados correctamente. Total de filas con datos: {len(entrada['df'])}")
+                return entrada
+            
+            if grupos is not None:
+                # Leer solo los rangos de columnas solicitados
+                respuesta = llamar_api(worksheet.batch_get, _rangos_filas(grupos, 1, worksheet.row_count))
+                values = _unir_grupos(respuesta, grupos)
+            else:
+                # Obtener todos los valores como una lista de listas
+                values = llamar_api(worksheet.get_values)
             
             if not values:
-                st.error("No se encontraron datos en la hoja.")
+                _avisar("error", "No se encontraron datos en la hoja.")
                 return None
                 
             # La primera fila contiene los encabezados
             headers = values[0]
+            df = _filas_a_dataframe(headers, values[1:], grupos)
+            if esquema is not None:
+                aplicar_esquema(df, esquema)
+            if progreso is not None:
+                progreso(len(values), len(values))
             
-            # Filtrar filas vacías (filas donde todos los elementos son cadenas vacías)
-            data_rows = []
-            for row in values[1:]:  # Excluir la fila de encabezados
-                # Extender la fila si es más corta que los encabezados
-                extended_row = row + [''] * (len(headers) - len(row))
-                
-                # Verificar si la fila tiene al menos un valor no vacío
-                if any(cell.strip() for cell in extended_row):
-                    data_rows.append(extended_row)
-            
-            # Crear DataFrame sólo con filas no vacías
-            df = pd.DataFrame(data_rows, columns=headers)
-            
-            st.success(f"Datos cargados correctamente. Total de filas con datos: {len(df)}")
-            return df
+            _avisar("success", f"Datos cargados correctamente. Total de filas con datos: {len(df)}")
+            return _crear_entrada(df, headers, values, grupos, huella=_huella(_primeras_celdas(values[1:])))
         else:
-            st.error("No se pudo conectar con Google Sheets")
+            _avisar("error", "No se pudo conectar con Google Sheets")
             return None
+    except RefreshError as e:
+        # Credenciales revocadas o inválidas: volver a autorizar en el próximo intento
+        reiniciar_conexion()
+        _avisar("error", f"Error de autenticación con Google Sheets: {e}")
+        return None
     except Exception as e:
-        st.error(f"Error al cargar los datos: {e}")
-        return None
\ No newline at end of file
+        _avisar("error", f"Error al cargar los datos: {e}")
+        return None
+
+def _descargar_por_bloques(worksheet, grupos, esquema=None, progreso=None):
+    """
+    Descarga una hoja grande por bloques de FILAS_POR_BLOQUE filas.
+    
+    Cada bloque se convierte a DataFrame tipado antes de pedir el siguiente, así que
+    la lista de listas de la respuesta nunca contiene más de un bloque; al final los
+    bloques tipados se concatenan una sola vez.
+    
+    Args:
+        worksheet: Pestaña abierta
+        grupos: Grupos de columnas a leer (None para la hoja completa)
+        esquema: Esquema de tipos a aplicar a cada bloque
+        progreso: Función opcional progreso(filas_leidas, filas_totales)
+    
+    Returns:
+        dict: Entrada de caché o None si la hoja no tiene encabezados
+    """
+    total = worksheet.row_count
+    encabezados = _unir_grupos(llamar_api(worksheet.batch_get, _rangos_filas(grupos, 1, 1)), grupos)
+    if not encabezados:
+        return None
+    headers = _recortar_fila(encabezados[0]) if grupos is None else encabezados[0]
+    
+    bloques = []
+    filas_leidas = 1
+    ultima = headers
+    columna = []
+    for inicio in range(2, total + 1, FILAS_POR_BLOQUE):
+        fin = min(inicio + FILAS_POR_BLOQUE - 1, total)
+        filas = _unir_grupos(llamar_api(worksheet.batch_get, _rangos_filas(grupos, inicio, fin)), grupos)
+        if filas:
+            df_bloque = _filas_a_dataframe(headers, filas, grupos)
+            if esquema is not None:
+                aplicar_esquema(df_bloque, esquema)
+            bloques.append(df_bloque)
+            # La API recorta las filas vacías del final: la última recibida es la última con datos
+            filas_leidas = inicio + len(filas) - 1
+            ultima = filas[-1]
+            # Primera columna para la huella, alineada con el número de fila de la hoja
+            columna += [''] * (inicio - 2 - len(columna)) + _primeras_celdas(filas)
+        if progreso is not None:
+            progreso(fin, total)
+    
+    if bloques:
+        df = _concatenar_bloques(bloques)
+    else:
+        df = _filas_a_dataframe(headers, [], grupos)
+        if esquema is not None:
+            aplicar_esquema(df, esquema)
+    
+    entrada = _crear_entrada(df, headers, [ultima], grupos, huella=_huella(columna))
+    entrada["filas_leidas"] = filas_leidas
+    return entrada
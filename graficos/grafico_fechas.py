@@ -3,6 +3,7 @@ import pandas as pd
 import plotly.express as px
 import numpy as np
 from datetime import datetime
+from utils.agregados import serie_diaria
 
 def crear_grafico_fechas(df):
     """
@@ -18,33 +19,27 @@ def crear_grafico_fechas(df):
     st.subheader("Conteo de registros por fecha")
     
     try:
-        # Paso 1: Crear copia del dataframe para evitar advertencias
-        df_temp = df.copy()
-        
-        # Paso 2: Agrupar y contar registros por fecha
-        fecha_grouped = df_temp.groupby('FECHA').size().reset_index(name='Cantidad')
-        
-        # Paso 3: Convertir fechas a formato datetime
-        # Primero asegurarse que la fecha es texto
-        fecha_grouped['FECHA'] = fecha_grouped['FECHA'].astype(str)
-        # Especificar formato como DD/MM/YYYY (formato europeo)
-        fecha_grouped['FECHA_DT'] = pd.to_datetime(fecha_grouped['FECHA'], format='%d/%m/%Y', errors='coerce')
-        
-        # Paso 4: Eliminar filas donde la conversión a fecha falló
-        fecha_grouped = fecha_grouped.dropna(subset=['FECHA_DT'])
+        # Paso 1: Registros por día (FECHA se convierte una sola vez al cargar la hoja
+        # y la serie diaria se calcula una vez por versión de los datos)
+        fecha_grouped = serie_diaria(df)[['Fecha', 'Registros']].rename(
+            columns={'Fecha': 'FECHA_DT', 'Registros': 'Cantidad'}
+        )
         
         if fecha_grouped.empty:
             st.error("No se pudieron convertir las fechas correctamente. Verifique el formato.")
             return
         
-        # Paso 5: Extraer información de año y mes
+        # Texto DD/MM/YYYY para las etiquetas (una fila por día)
+        fecha_grouped['FECHA'] = fecha_grouped['FECHA_DT'].dt.strftime('%d/%m/%Y')
+        
+        # Paso 2: Extraer información de año y mes
         fecha_grouped['Año'] = fecha_grouped['FECHA_DT'].dt.year
         fecha_grouped['Mes'] = fecha_grouped['FECHA_DT'].dt.month
         fecha_grouped['NombreMes'] = fecha_grouped['FECHA_DT'].dt.strftime('%B')
         fecha_grouped['AñoMes'] = fecha_grouped['FECHA_DT'].dt.strftime('%Y-%m')
         fecha_grouped['MesAño'] = fecha_grouped['FECHA_DT'].dt.strftime('%B %Y')
         
-        # Paso 6: Crear lista de meses disponibles
+        # Paso 3: Crear lista de meses disponibles
         meses_disponibles = sorted(fecha_grouped['AñoMes'].unique())
         opciones_texto = []
         
@@ -61,7 +56,7 @@ def crear_grafico_fechas(df):
                 # Si hay error, usar el valor original
                 opciones_texto.append((yearmonth, yearmonth))
         
-        # Paso 7: Crear filtros
+        # Paso 4: Crear filtros
         col_filtro1, col_filtro2 = st.columns([1, 2])
         
         with col_filtro1:
@@ -84,7 +79,7 @@ def crear_grafico_fechas(df):
             # Opciones de visualización
             mostrar_promedio = st.checkbox("Mostrar línea de promedio", value=True)
         
-        # Paso 8: Filtrar datos según selección
+        # Paso 5: Filtrar datos según selección
         if mes_seleccionado != "Todos":
             # Obtener año y mes de la selección
             año, mes = mes_seleccionado.split('-')
@@ -98,7 +93,7 @@ def crear_grafico_fechas(df):
             fecha_filtrada = fecha_grouped
             titulo_grafico = 'Conteo de registros por fecha (todos los meses)'
         
-        # Paso 9: Mostrar el gráfico y estadísticas
+        # Paso 6: Mostrar el gráfico y estadísticas
         col_grafico, col_stats = st.columns([2, 1])
         
         # Gráfico en la primera columna
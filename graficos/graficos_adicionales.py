@@ -6,6 +6,14 @@ import numpy as np
 import json
 import uuid
 from streamlit.components.v1 import html
+from google_connection import columna_por_posicion
+from utils.agregados import conteo_valores, conteo_filtrado, contar_filas, indexar_columnas, registrar_precalculo
+
+# Columnas de los filtros por selección de la matriz de gráficos (nivel educativo y
+# seguridad social) y de los gráficos que filtran: sus mapas de bits se construyen al
+# publicar cada versión de los datos
+COLUMNAS_SELECCION = ['Nivel_escolaridad', 'Estado_escolaridad', 'Seguridad_social', 'Tipo_de_discapacidad']
+registrar_precalculo(lambda df: indexar_columnas(df, COLUMNAS_SELECCION), nombre="indices_seleccion")
 
 def plotly_events(fig, click_event=True, select_event=False, hover_event=False, override_height=None):
     """
@@ -94,7 +102,7 @@ def plotly_events(fig, click_event=True, select_event=False, hover_event=False,
     
     return st.session_state[selected_points_key]
 
-def crear_grafico_pastel(df, columna, titulo=None, limite_categorias=10):
+def crear_grafico_pastel(df, columna, titulo=None, limite_categorias=10, filtros=None):
     """
     Crea un gráfico de pastel para la columna especificada.
     
@@ -103,6 +111,8 @@ def crear_grafico_pastel(df, columna, titulo=None, limite_categorias=10):
         columna: Nombre de la columna a graficar
         titulo: Título del gráfico (opcional)
         limite_categorias: Número máximo de categorías a mostrar
+        filtros: Diccionario opcional {columna: valor o lista de valores} para contar
+                 solo las filas que los cumplen (ver utils.agregados.conteo_filtrado)
     
     Returns:
         fig: Figura de Plotly con el gráfico
@@ -111,8 +121,8 @@ def crear_grafico_pastel(df, columna, titulo=None, limite_categorias=10):
         st.warning(f"No se encontró la columna '{columna}' en los datos")
         return None
     
-    # Obtener el conteo de valores
-    conteo = df[columna].value_counts()
+    # Obtener el conteo de valores (precalculado para la versión completa de los datos)
+    conteo = conteo_filtrado(df, columna, filtros)
     
     # Si hay más categorías que el límite, agrupar las menos frecuentes como "Otros"
     if len(conteo) > limite_categorias:
@@ -177,7 +187,7 @@ def crear_grafico_barras_horizontal(df, columna, titulo=None, limite_categorias=
         return None
     
     # Obtener el conteo de valores y ordenar de mayor a menor
-    conteo = df[columna].value_counts().nlargest(limite_categorias)
+    conteo = conteo_valores(df, columna).nlargest(limite_categorias)
     
     # Crear dataframe para plotly
     data_plot = pd.DataFrame({
@@ -234,9 +244,8 @@ def mostrar_graficos_pastel(df):
         columna_identidad = 'Uste_se_identifica_como'
         if columna_identidad not in df.columns:
             # Intentar por posición (AI sería la columna 34, 0-indexado)
-            columnas = list(df.columns)
-            if len(columnas) >= 35:
-                columna_ai = columnas[34]
+            columna_ai = columna_por_posicion(df, 34)
+            if columna_ai is not None:
                 df[columna_identidad] = df[columna_ai]
         
         # Crear gráfico de identidad
@@ -254,9 +263,8 @@ def mostrar_graficos_pastel(df):
         columna_orientacion = 'Orientación_sexual'
         if columna_orientacion not in df.columns:
             # Intentar por posición (AJ sería la columna 35, 0-indexado)
-            columnas = list(df.columns)
-            if len(columnas) >= 36:
-                columna_aj = columnas[35]
+            columna_aj = columna_por_posicion(df, 35)
+            if columna_aj is not None:
                 df[columna_orientacion] = df[columna_aj]
         
         # Crear gráfico de orientación sexual
@@ -270,7 +278,10 @@ def mostrar_graficos_pastel(df):
 
 def mostrar_matriz_graficos_barras(df):
     """
-    Muestra múltiples filas de gráficos de barras horizontales organizados por temática
+    Muestra múltiples filas de gráficos de barras horizontales organizados por temática.
+    
+    Los filtros de selección (nivel educativo, seguridad social) se aplican con el
+    índice de mapas de bits, sin filtrar la tabla completa.
     """
     st.markdown("### Distribuciones Demográficas")
     
@@ -290,10 +301,10 @@ def mostrar_matriz_graficos_barras(df):
     }
     
     # Verificar y asignar columnas por posición si es necesario
-    columnas = list(df.columns)
     for nombre_col, indice in posiciones.items():
-        if nombre_col not in df.columns and len(columnas) > indice:
-            df[nombre_col] = df[columnas[indice]]
+        columna_original = columna_por_posicion(df, indice)
+        if nombre_col not in df.columns and columna_original is not None:
+            df[nombre_col] = df[columna_original]
     
     # PRIMERA FILA: Nivel y Estado de Escolaridad
     st.markdown("#### Educación")
@@ -308,7 +319,7 @@ def mostrar_matriz_graficos_barras(df):
     with col1:
         # Crear gráfico interactivo de barras con selección
         if 'Nivel_escolaridad' in df.columns:
-            conteo = df['Nivel_escolaridad'].value_counts()
+            conteo = conteo_filtrado(df, 'Nivel_escolaridad')
             data_plot = pd.DataFrame({
                 'Categoría': conteo.index,
                 'Cantidad': conteo.values
@@ -373,21 +384,21 @@ def mostrar_matriz_graficos_barras(df):
         # Crear gráfico de pastel para estado de escolaridad con filtro aplicado
         if 'Estado_escolaridad' in df.columns:
             # Aplicar filtro si existe
-            df_filtrado = df
+            filtros_estado = None
             titulo = "Estado de Escolaridad"
             
             if st.session_state.nivel_educativo_seleccionado:
-                df_filtrado = df[df['Nivel_escolaridad'] == st.session_state.nivel_educativo_seleccionado]
+                filtros_estado = {'Nivel_escolaridad': st.session_state.nivel_educativo_seleccionado}
                 titulo = f"Estado para {st.session_state.nivel_educativo_seleccionado}"
             
             # Crear gráfico de pastel
-            fig_pastel = crear_grafico_pastel(df_filtrado, 'Estado_escolaridad', titulo)
+            fig_pastel = crear_grafico_pastel(df, 'Estado_escolaridad', titulo, filtros=filtros_estado)
             if fig_pastel:
                 st.plotly_chart(fig_pastel, use_container_width=True)
                 
                 # Información sobre el filtro
                 if st.session_state.nivel_educativo_seleccionado:
-                    total_filtrado = len(df_filtrado)
+                    total_filtrado = contar_filas(df, filtros_estado)
                     porcentaje = (total_filtrado / len(df) * 100)
                     st.markdown(f"Mostrando **{total_filtrado:,}** registros ({porcentaje:.2f}% del total)")
             else:
@@ -457,7 +468,9 @@ def mostrar_matriz_graficos_barras(df):
             st.subheader("Seguridad Social")
             
             # Crear tabla de frecuencias
-            conteo_seguridad = df['Seguridad_social'].value_counts().reset_index()
+            conteo_seguridad = conteo_filtrado(df, 'Seguridad_social')
+            valores_seguridad = ["Todos"] + sorted(conteo_seguridad.index.tolist())
+            conteo_seguridad = conteo_seguridad.reset_index()
             conteo_seguridad.columns = ['Tipo de Seguridad Social', 'Cantidad']
             
             # Calcular porcentajes
@@ -471,7 +484,6 @@ def mostrar_matriz_graficos_barras(df):
             st.dataframe(conteo_seguridad, use_container_width=True, height=400)
             
             # Crear selector para filtrar
-            valores_seguridad = ["Todos"] + sorted(df['Seguridad_social'].dropna().unique().tolist())
             selected_seguridad = st.selectbox(
                 "Filtrar tabla de discapacidad por tipo de seguridad social:",
                 valores_seguridad,
@@ -491,17 +503,17 @@ def mostrar_matriz_graficos_barras(df):
         # Tabla para Tipo de Discapacidad con filtro aplicado
         if 'Tipo_de_discapacidad' in df.columns:
             # Aplicar filtro si existe
-            df_filtrado = df
+            filtros_discapacidad = None
             titulo = "Tipo de Discapacidad"
             
             if st.session_state.seguridad_social_seleccionada:
-                df_filtrado = df[df['Seguridad_social'] == st.session_state.seguridad_social_seleccionada]
+                filtros_discapacidad = {'Seguridad_social': st.session_state.seguridad_social_seleccionada}
                 titulo = f"Discapacidad con {st.session_state.seguridad_social_seleccionada}"
             
             st.subheader(titulo)
             
             # Crear tabla de frecuencias
-            conteo_discapacidad = df_filtrado['Tipo_de_discapacidad'].value_counts().reset_index()
+            conteo_discapacidad = conteo_filtrado(df, 'Tipo_de_discapacidad', filtros_discapacidad).reset_index()
             conteo_discapacidad.columns = ['Tipo de Discapacidad', 'Cantidad']
             
             # Calcular porcentajes
@@ -516,7 +528,7 @@ def mostrar_matriz_graficos_barras(df):
             
             # Información sobre el filtro
             if st.session_state.seguridad_social_seleccionada:
-                total_filtrado = len(df_filtrado)
+                total_filtrado = contar_filas(df, filtros_discapacidad)
                 porcentaje = (total_filtrado / len(df) * 100)
                 st.markdown(f"Mostrando **{total_filtrado:,}** registros ({porcentaje:.2f}% del total)")
         else:
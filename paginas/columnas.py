@@ -0,0 +1,123 @@
+"""
+Columnas de la hoja DUB que usa cada pestaña.
+
+Cada página declara las columnas que lee (por rango de letras, "AB:AB" para una
+sola columna, o por nombre de encabezado) y load_data descarga solo la unión de
+todas ellas. Los nombres que no existan en el encabezado de la hoja se ignoran.
+"""
+
+import re
+
+# INFORDUB: progreso, análisis temporal y proyección
+COLUMNAS_INFORDUB = ["FECHA", "ID DUB"]
+
+# DUB: sexo (AH), identidad (AI), orientación (AJ) y matriz demográfica (AK-AW)
+COLUMNAS_PAGINA_DUB = [
+    "AH:AW",
+    "Sexo", "Uste_se_identifica_como", "Orientación_sexual",
+    "Estado_civil", "Nivel_escolaridad", "Estado_escolaridad", "Ocupacion_actual",
+    "Seguridad_social", "Cuántas_horas_al_día_dedica_a_hacer_los_oficios_del_hogar",
+    "Tipo_de_discapacidad", "Registro_Único_de_Víctimas_RUV", "Se_considera_campesino",
+    "Se_reconoce_como", "A_que_pueblo"
+]
+
+# DEMOGRAFÍA: frecuencia de consumo de alimentos (BS-BX)
+COLUMNAS_DEMOGRAFIA = [
+    "BS:BX",
+    "carnes_rojas", "Pollo", "Pescado", "Huevo", "Consumo_frutas_verduras", "Consumo_lácteos"
+]
+
+# MAPA: área (U), comuna (V), estrato (AB), reconocimiento étnico (AL),
+# comedor y ubicación (índices 100 y 105, alrededor de CX y DA)
+COLUMNAS_MAPA = [
+    "U:V", "AB:AB", "AL:AL", "CW:DB",
+    "Comuna", "Estrato", "Área_de_residencia_geográfica",
+    "UBICACION_PREDEFINIDA", "Nombre_comedor", "Se_reconoce_como"
+]
+
+# FIES: las ocho preguntas sí/no de la escala (AY-BF), en el orden de la escala
+ITEMS_FIES = [
+    "FIES_PREOCUPADO",        # Preocupación por no tener suficientes alimentos
+    "FIES_SALUDABLE",         # No pudo comer alimentos saludables y nutritivos
+    "FIES_POCA_VARIEDAD",     # Comió poca variedad de alimentos
+    "FIES_SALTO_COMIDA",      # Tuvo que saltarse una comida
+    "FIES_COMIO_MENOS",       # Comió menos de lo que pensaba que debía comer
+    "FIES_SIN_ALIMENTOS",     # El hogar se quedó sin alimentos
+    "FIES_HAMBRE",            # Sintió hambre pero no comió
+    "FIES_DIA_SIN_COMER"      # Pasó un día entero sin comer
+]
+
+# Texto de cada pregunta FIES en el encabezado de la hoja. Las posiciones AY-BF del
+# esquema solo se usan si ningún encabezado coincide con el patrón de la pregunta.
+PATRONES_FIES = {
+    "FIES_PREOCUPADO": re.compile(r"preocup", re.IGNORECASE),
+    "FIES_SALUDABLE": re.compile(r"saludable|nutritiv", re.IGNORECASE),
+    "FIES_POCA_VARIEDAD": re.compile(r"variedad", re.IGNORECASE),
+    "FIES_SALTO_COMIDA": re.compile(r"saltar(se)? una comida|salt[oó] una comida|dej(ar|[oó]) de (desayunar|almorzar|cenar)", re.IGNORECASE),
+    "FIES_COMIO_MENOS": re.compile(r"menos de lo que", re.IGNORECASE),
+    "FIES_SIN_ALIMENTOS": re.compile(r"qued[oó] sin (alimentos|comida)", re.IGNORECASE),
+    "FIES_HAMBRE": re.compile(r"hambre", re.IGNORECASE),
+    "FIES_DIA_SIN_COMER": re.compile(r"todo un d[ií]a|d[ií]a (entero|completo)|un d[ií]a sin comer", re.IGNORECASE)
+}
+COLUMNAS_FIES = ["AY:BF"] + ITEMS_FIES + list(PATRONES_FIES.values())
+
+def _union(*listas):
+    """
+    Une varias listas de columnas conservando el orden y sin duplicados.
+    """
+    resultado = []
+    for lista in listas:
+        for columna in lista:
+            if columna not in resultado:
+                resultado.append(columna)
+    return resultado
+
+# Columnas que se descargan de la hoja DUB para servir a todas las pestañas
+COLUMNAS_DUB = _union(COLUMNAS_INFORDUB, COLUMNAS_PAGINA_DUB, COLUMNAS_DEMOGRAFIA, COLUMNAS_MAPA, COLUMNAS_FIES)
+
+# Esquema de la hoja DUB: {nombre canónico: (posición en la hoja, tipo)}. La posición
+# puede ser una tupla de alternativas (patrón de encabezado, índice) que se prueban en orden.
+# Al cargar, cada columna toma su nombre canónico (aunque el encabezado de la hoja
+# sea otro) y su tipo: las respuestas de pocas categorías se guardan como
+# categóricas, FECHA como fecha y Estrato como número. Tipo None solo renombra.
+ESQUEMA_DUB = {
+    "FECHA": (None, "fecha"),
+    "Área_de_residencia_geográfica": (20, "categoria"),     # U
+    "Comuna": (21, "categoria"),                            # V
+    "Estrato": (27, "numero"),                              # AB
+    "Sexo": (33, "categoria"),                              # AH
+    "Uste_se_identifica_como": (34, "categoria"),           # AI
+    "Orientación_sexual": (35, "categoria"),                # AJ
+    "Estado_civil": (36, "categoria"),                      # AK
+    "Se_reconoce_como": (37, "categoria"),                  # AL
+    "A_que_pueblo": (39, "categoria"),                      # AN
+    "Nivel_escolaridad": (40, "categoria"),                 # AO
+    "Estado_escolaridad": (41, "categoria"),                # AP
+    "Ocupacion_actual": (42, "categoria"),                  # AQ
+    "Seguridad_social": (43, "categoria"),                  # AR
+    "Cuántas_horas_al_día_dedica_a_hacer_los_oficios_del_hogar": (44, "categoria"),  # AS
+    "Tipo_de_discapacidad": (45, "categoria"),              # AT
+    "Registro_Único_de_Víctimas_RUV": (47, "categoria"),    # AV
+    "Se_considera_campesino": (48, "categoria"),            # AW
+    "FIES_PREOCUPADO": ((PATRONES_FIES["FIES_PREOCUPADO"], 50), "categoria"),       # AY
+    "FIES_SALUDABLE": ((PATRONES_FIES["FIES_SALUDABLE"], 51), "categoria"),         # AZ
+    "FIES_POCA_VARIEDAD": ((PATRONES_FIES["FIES_POCA_VARIEDAD"], 52), "categoria"),  # BA
+    "FIES_SALTO_COMIDA": ((PATRONES_FIES["FIES_SALTO_COMIDA"], 53), "categoria"),   # BB
+    "FIES_COMIO_MENOS": ((PATRONES_FIES["FIES_COMIO_MENOS"], 54), "categoria"),     # BC
+    "FIES_SIN_ALIMENTOS": ((PATRONES_FIES["FIES_SIN_ALIMENTOS"], 55), "categoria"),  # BD
+    "FIES_HAMBRE": ((PATRONES_FIES["FIES_HAMBRE"], 56), "categoria"),               # BE
+    "FIES_DIA_SIN_COMER": ((PATRONES_FIES["FIES_DIA_SIN_COMER"], 57), "categoria"),  # BF
+    "carnes_rojas": (70, "categoria"),                      # BS
+    "Pollo": (71, "categoria"),                             # BT
+    "Pescado": (72, "categoria"),                           # BU
+    "Huevo": (73, "categoria"),                             # BV
+    "Consumo_frutas_verduras": (74, "categoria"),           # BW
+    "Consumo_lácteos": (75, "categoria"),                   # BX
+    "Nombre_comedor": (100, None),                          # CW
+    "UBICACION_PREDEFINIDA": (105, None)                    # DB
+}
+
+# Tipos de la hoja COMEDORES
+ESQUEMA_COMEDORES = {
+    "Cupos": (3, "numero")                                  # D
+}
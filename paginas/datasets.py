@@ -0,0 +1,76 @@
+"""
+Registro de los conjuntos de datos que usan las pestañas.
+
+Cada página pide sus datos por nombre en lugar de repetir el ID de la hoja. Todas
+las pestañas comparten así la misma entrada de la caché del proceso: cada conjunto
+se descarga una sola vez por versión, sin importar qué pestaña se ejecute primero.
+"""
+from google_connection import load_data, cargar_hojas, iniciar_actualizador, datos_listos
+from paginas.columnas import COLUMNAS_DUB, ESQUEMA_DUB, ESQUEMA_COMEDORES
+
+# {nombre: argumentos de load_data (sheet_id, sheet_name, columnas, esquema, ttl)}
+DATASETS = {
+    # Respuestas del formulario DUB: INFORDUB, DUB, MAPA y DEMOGRAFÍA
+    "DUB": {
+        "sheet_id": "19aYe071W4ktFUHOswLf9oB3nj2hcOvklavxdR8Ohv40",
+        "sheet_name": "DUB",
+        "columnas": COLUMNAS_DUB,
+        "esquema": ESQUEMA_DUB
+    },
+    # Cupos por comedor: MAPA
+    "COMEDORES": {
+        "sheet_id": "1haZINioOFe4WTL2G9FzsYt0p4-8uJ5WKbukexBYhx_o",
+        "sheet_name": "COMEDORES",
+        "esquema": ESQUEMA_COMEDORES
+    }
+}
+
+
+def obtener_dataset(nombre, progreso=None):
+    """
+    Devuelve la versión vigente de un conjunto de datos registrado.
+
+    Args:
+        nombre: Nombre del conjunto en DATASETS
+        progreso: Función opcional de avance para la primera descarga (ver load_data)
+
+    Returns:
+        DataFrame: Los datos o None si no se pudieron cargar
+    """
+    return load_data(**DATASETS[nombre], progreso=progreso)
+
+
+def dataset_listo(nombre):
+    """
+    Indica si el conjunto de datos ya está en la caché del proceso (sin descargarlo).
+    """
+    argumentos = DATASETS[nombre]
+    return datos_listos(
+        argumentos["sheet_id"], argumentos.get("sheet_name", 0),
+        argumentos.get("columnas"), argumentos.get("esquema")
+    ) is not None
+
+
+def cargar_datasets(nombres, progreso=None):
+    """
+    Carga varios conjuntos de datos en paralelo.
+
+    Args:
+        nombres: Lista de nombres en DATASETS
+        progreso: Diccionario opcional {nombre: función de avance}
+
+    Returns:
+        dict: {nombre: DataFrame o None}
+    """
+    progreso = progreso or {}
+    return cargar_hojas({
+        nombre: dict(DATASETS[nombre], progreso=progreso.get(nombre))
+        for nombre in nombres
+    })
+
+
+def iniciar_actualizacion_datasets():
+    """
+    Programa la actualización en segundo plano de todos los conjuntos registrados.
+    """
+    iniciar_actualizador(list(DATASETS.values()))
@@ -0,0 +1,206 @@
+"""
+Filtros globales del tablero.
+
+La barra lateral muestra un filtro por dimensión (comuna, estrato, sexo, comedor,
+área de residencia y rango de fechas). Cada combinación de filtros se resuelve una
+sola vez por versión de los datos en un subconjunto de filas que se guarda en
+memoria, y todas las pestañas trabajan sobre ese mismo subconjunto.
+"""
+import threading
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.agregados import conteo_valores, mascara_filtros
+
+# {etiqueta en la barra: columna de la hoja DUB}
+DIMENSIONES_GLOBALES = {
+    "Comuna": "Comuna",
+    "Estrato": "Estrato",
+    "Sexo": "Sexo",
+    "Comedor": "Nombre_comedor",
+    "Área de residencia": "Área_de_residencia_geográfica"
+}
+
+COLUMNA_FECHA = "FECHA"
+CLAVE_FECHAS = "filtro_global_fechas"
+# Rango de los datos para el que se dibujó el selector de fechas en la sesión
+CLAVE_RANGO_FECHAS = "filtro_global_fechas_rango"
+
+# Subconjuntos filtrados en memoria: (versión, estado de los filtros) -> DataFrame
+SELECCIONES_EN_MEMORIA = 16
+
+_selecciones = {}
+_opciones = {}
+_lock = threading.Lock()
+
+
+def _clave_widget(columna):
+    return f"filtro_global_{columna}"
+
+
+def _guardar(cache, clave, valor, limite):
+    """
+    Guarda un valor en una caché acotada, descartando las entradas más antiguas.
+    """
+    with _lock:
+        cache[clave] = valor
+        while len(cache) > limite:
+            del cache[next(iter(cache))]
+
+
+def _opciones_columna(df, columna):
+    """
+    Valores posibles de una dimensión (calculados una vez por versión de los datos).
+    """
+    clave = (df.attrs.get("version"), columna)
+    with _lock:
+        opciones = _opciones.get(clave)
+    if opciones is None:
+        opciones = sorted(conteo_valores(df, columna).index.tolist(), key=str)
+        _guardar(_opciones, clave, opciones, 4 * len(DIMENSIONES_GLOBALES))
+    return opciones
+
+
+def _rango_fechas(df):
+    """
+    Primera y última fecha con datos (calculadas una vez por versión de los datos).
+    """
+    clave = (df.attrs.get("version"), COLUMNA_FECHA)
+    with _lock:
+        rango = _opciones.get(clave)
+    if rango is None:
+        fechas = df[COLUMNA_FECHA].dropna()
+        rango = (fechas.min().date(), fechas.max().date()) if not fechas.empty else None
+        _guardar(_opciones, clave, rango, 4 * len(DIMENSIONES_GLOBALES))
+    return rango
+
+
+def _tiene_fechas(df):
+    return COLUMNA_FECHA in df.columns and pd.api.types.is_datetime64_any_dtype(df[COLUMNA_FECHA])
+
+
+def _sincronizar_fechas(df):
+    """
+    Ajusta el rango elegido en la sesión cuando llega una versión con otras fechas.
+
+    Un extremo que coincidía con el primer o el último día de los datos anteriores se
+    trata como abierto y pasa al nuevo extremo (así el rango completo sigue sin filtrar
+    y las fechas nuevas no quedan fuera); el resto se recorta a las fechas disponibles.
+    Debe llamarse antes de dibujar el selector en la ejecución.
+    """
+    rango = _rango_fechas(df)
+    anterior = st.session_state.get(CLAVE_RANGO_FECHAS)
+    if rango is None or anterior == rango:
+        return
+    st.session_state[CLAVE_RANGO_FECHAS] = rango
+
+    elegido = st.session_state.get(CLAVE_FECHAS)
+    if anterior is None or not elegido or len(elegido) != 2:
+        return
+    inicio, fin = elegido
+    inicio = rango[0] if inicio == anterior[0] else min(max(inicio, rango[0]), rango[1])
+    fin = rango[1] if fin == anterior[1] else min(max(fin, rango[0]), rango[1])
+    st.session_state[CLAVE_FECHAS] = (inicio, fin) if inicio <= fin else rango
+
+
+def _estado_filtros(df):
+    """
+    Lee de la sesión los filtros activos como una tupla que sirve de clave de caché.
+    """
+    estado = []
+    for columna in DIMENSIONES_GLOBALES.values():
+        valores = st.session_state.get(_clave_widget(columna)) or []
+        if valores and columna in df.columns:
+            estado.append((columna, tuple(sorted(valores, key=str))))
+
+    if _tiene_fechas(df):
+        _sincronizar_fechas(df)
+        rango = st.session_state.get(CLAVE_FECHAS)
+        if rango and len(rango) == 2 and tuple(rango) != _rango_fechas(df):
+            estado.append((COLUMNA_FECHA, tuple(rango)))
+    return tuple(estado)
+
+
+def aplicar_filtros_globales(df):
+    """
+    Devuelve las filas de df que cumplen los filtros globales de la sesión.
+
+    El subconjunto de cada combinación de filtros se calcula una sola vez por versión
+    de los datos (con los mapas de bits de utils.agregados) y se reutiliza en las
+    siguientes ejecuciones y en todas las pestañas.
+
+    Args:
+        df: DataFrame completo (por ejemplo obtener_dataset("DUB"))
+
+    Returns:
+        DataFrame: df sin cambios si no hay filtros activos, o el subconjunto filtrado
+    """
+    if df is None:
+        return None
+    estado = _estado_filtros(df)
+    if not estado:
+        return df
+
+    version = df.attrs.get("version")
+    clave = (version, estado)
+    if version is not None:
+        with _lock:
+            filtrado = _selecciones.get(clave)
+        if filtrado is not None:
+            return filtrado.copy(deep=False)
+
+    filtros = {columna: list(valores) for columna, valores in estado if columna != COLUMNA_FECHA}
+    mascara = mascara_filtros(df, filtros) if filtros else np.ones(len(df), dtype=bool)
+    for columna, valores in estado:
+        if columna == COLUMNA_FECHA:
+            inicio, fin = valores
+            fechas = df[COLUMNA_FECHA]
+            mascara &= ((fechas >= pd.Timestamp(inicio)) & (fechas < pd.Timestamp(fin + timedelta(days=1)))).to_numpy()
+
+    filtrado = df[mascara]
+    # El subconjunto es una versión propia: el cubo y los mapas de bits se calculan aparte
+    # (y no es una extensión de la versión anterior, así que no lleva attrs["anterior"])
+    attrs = {nombre: valor for nombre, valor in df.attrs.items() if nombre != "anterior"}
+    filtrado.attrs = dict(attrs, version=clave, filas=len(filtrado))
+    if version is not None:
+        _guardar(_selecciones, clave, filtrado, SELECCIONES_EN_MEMORIA)
+    return filtrado.copy(deep=False)
+
+
+def hay_filtros_activos(df):
+    """
+    Indica si la sesión tiene algún filtro global activo para estos datos.
+    """
+    return df is not None and bool(_estado_filtros(df))
+
+
+def mostrar_barra_filtros(df, contenedor=None):
+    """
+    Muestra los filtros globales en la barra lateral (o en el contenedor indicado).
+
+    Args:
+        df: DataFrame completo con las dimensiones a filtrar
+        contenedor: Contenedor de Streamlit donde dibujar los filtros (por defecto st.sidebar)
+    """
+    if df is None or df.empty:
+        return
+    destino = contenedor if contenedor is not None else st.sidebar
+    destino.header("Filtros globales")
+
+    for etiqueta, columna in DIMENSIONES_GLOBALES.items():
+        if columna in df.columns:
+            destino.multiselect(etiqueta, _opciones_columna(df, columna), key=_clave_widget(columna))
+
+    if _tiene_fechas(df):
+        rango = _rango_fechas(df)
+        if rango is not None:
+            _sincronizar_fechas(df)
+            destino.date_input("Rango de fechas", value=rango, min_value=rango[0], max_value=rango[1],
+                               key=CLAVE_FECHAS)
+
+    if hay_filtros_activos(df):
+        filtrado = aplicar_filtros_globales(df)
+        destino.caption(f"{len(filtrado):,} de {len(df):,} registros cumplen los filtros")
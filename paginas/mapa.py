@@ -4,7 +4,12 @@ import plotly.express as px
 import plotly.graph_objects as go
 import re
 import numpy as np
-from google_connection import load_data
+from google_connection import columna_por_posicion
+from paginas.columnas import ITEMS_FIES
+from paginas.datasets import obtener_dataset
+from paginas.filtros import aplicar_filtros_globales
+from utils.agregados import agregado_por_version, conteo_valores, sumar_conteos, tabla_cruzada, registrar_precalculo
+from utils.fies import prevalencias_por_grupo
 
 def extraer_coordenadas(ubicacion):
     """
@@ -55,6 +60,79 @@ def limpiar_nombre_comedor(nombre):
     # Si está vacío, devolver "Desconocido"
     return nombre_limpio if nombre_limpio else "Desconocido"
 
+# Columnas que identifican cada grupo del mapa de ubicaciones
+COLUMNAS_GRUPO_COMEDOR = ['Comedor', 'lat', 'lon', 'Se_reconoce_como']
+
+def _contar_por_comedor(df):
+    """
+    Cuenta los registros por comedor, coordenadas y reconocimiento étnico.
+    
+    Las coordenadas y los nombres se limpian una vez por valor distinto (hay pocos
+    comedores y ubicaciones) en lugar de una vez por fila.
+    
+    Args:
+        df: DataFrame con UBICACION_PREDEFINIDA, Nombre_comedor y Se_reconoce_como
+    
+    Returns:
+        DataFrame con las columnas de COLUMNAS_GRUPO_COMEDOR y Conteo, solo para las
+        filas con coordenadas válidas
+    """
+    codigos, ubicaciones = pd.factorize(df['UBICACION_PREDEFINIDA'].astype(object))
+    # El código -1 (valor vacío) toma la última posición: sin coordenadas
+    coordenadas = np.array([extraer_coordenadas(u) for u in ubicaciones] + [(None, None)], dtype=float)
+    coordenadas = coordenadas.reshape(-1, 2)[codigos]
+    
+    codigos, nombres = pd.factorize(df['Nombre_comedor'].astype(object))
+    limpios = np.array([limpiar_nombre_comedor(n) for n in nombres] + ["Desconocido"], dtype=object)
+    
+    tabla = pd.DataFrame({
+        'Comedor': limpios[codigos],
+        'lat': coordenadas[:, 0],
+        'lon': coordenadas[:, 1],
+        'Se_reconoce_como': df['Se_reconoce_como'].to_numpy()
+    }).dropna(subset=['lat', 'lon'])
+    conteo = tabla.groupby(COLUMNAS_GRUPO_COMEDOR, dropna=False).size()
+    return conteo.rename('Conteo').reset_index()
+
+def _conteos_comedor(df):
+    """
+    Registros por comedor, ubicación y etnia, guardados por versión de los datos y
+    actualizados solo con las filas nuevas.
+    """
+    return agregado_por_version(
+        df, "conteos_comedor", _contar_por_comedor,
+        lambda previo, nuevas: sumar_conteos([previo, _contar_por_comedor(nuevas)], COLUMNAS_GRUPO_COMEDOR, 'Conteo')
+    )
+
+# Agregados del mapa que se calculan al publicar cada versión de los datos
+registrar_precalculo(_conteos_comedor, ['UBICACION_PREDEFINIDA', 'Nombre_comedor', 'Se_reconoce_como'])
+registrar_precalculo(lambda df: tabla_cruzada(df, 'Comuna', 'Estrato'), ['Comuna', 'Estrato'], 'tabla_comuna_estrato')
+
+def _prevalencia_fies_por_comedor(df):
+    """
+    Prevalencias FIES (en %) de cada comedor, con el nombre limpio que usa el mapa.
+    
+    Args:
+        df: DataFrame con Nombre_comedor y las columnas FIES
+    
+    Returns:
+        DataFrame indexado por Comedor con Prevalencia_mod_sev y Prevalencia_sev,
+        o None si no se puede ajustar el modelo FIES
+    """
+    tablas = prevalencias_por_grupo(df, ITEMS_FIES, ['Nombre_comedor'])
+    if 'Nombre_comedor' not in tablas:
+        return None
+    tabla = tablas['Nombre_comedor']
+    
+    # Varias grafías pueden dar el mismo nombre limpio: promedio ponderado por encuestados
+    ponderado = tabla[['Prevalencia (mod+sev)', 'Prevalencia (sev)']].mul(tabla['Encuestados'], axis=0)
+    ponderado['Encuestados'] = tabla['Encuestados']
+    sumas = ponderado.groupby([limpiar_nombre_comedor(n) for n in tabla.index]).sum()
+    return pd.DataFrame({
+        'Prevalencia_mod_sev': sumas['Prevalencia (mod+sev)'] / sumas['Encuestados'] * 100,
+        'Prevalencia_sev': sumas['Prevalencia (sev)'] / sumas['Encuestados'] * 100
+    }).rename_axis('Comedor')
+
 def cargar_info_comedores():
     """
     Carga la información de la tabla COMEDORES.
@@ -63,9 +141,8 @@ def cargar_info_comedores():
         DataFrame con la información de comedores y sus cupos
     """
     try:
-        # Usar el mismo sheet_id que para la tabla DUB
-        sheet_id = "1haZINioOFe4WTL2G9FzsYt0p4-8uJ5WKbukexBYhx_o"
-        df_comedores = load_data(sheet_id, "COMEDORES")
+        # Normalmente ya está en caché: se descarga junto con DUB al iniciar la sesión
+        df_comedores = obtener_dataset("COMEDORES")
         
         if df_comedores is not None and not df_comedores.empty:
             # Verificar si tiene las columnas correctas, o buscar por posición
@@ -102,15 +179,15 @@ def crear_mapa_calor_comuna_estrato(df):
     """
     st.header("Mapa de Calor: Comuna vs Estrato")
     
-    # Crear una copia para no modificar el original
-    df_temp = df.copy()
+    # Copia superficial: las columnas nuevas o reemplazadas no modifican el original
+    df_temp = df.copy(deep=False)
     
     # Verificar si existen las columnas necesarias
     if 'Comuna' not in df_temp.columns:
         # Intentar obtener Comuna desde la posición V (índice 21)
-        columnas = list(df_temp.columns)
-        if len(columnas) > 21:
-            df_temp['Comuna'] = df_temp[columnas[21]]
+        columna_v = columna_por_posicion(df_temp, 21)
+        if columna_v is not None:
+            df_temp['Comuna'] = df_temp[columna_v]
             st.success("Columna 'Comuna' asignada desde la posición V.")
         else:
             st.error("No se pudo encontrar la columna 'Comuna'. No se puede crear el mapa de calor.")
@@ -118,9 +195,9 @@ def crear_mapa_calor_comuna_estrato(df):
     
     if 'Estrato' not in df_temp.columns:
         # Intentar obtener Estrato desde la posición AB (índice 27)
-        columnas = list(df_temp.columns)
-        if len(columnas) > 27:
-            df_temp['Estrato'] = df_temp[columnas[27]]
+        columna_ab = columna_por_posicion(df_temp, 27)
+        if columna_ab is not None:
+            df_temp['Estrato'] = df_temp[columna_ab]
             st.success("Columna 'Estrato' asignada desde la posición AB.")
         else:
             st.error("No se pudo encontrar la columna 'Estrato'. No se puede crear el mapa de calor.")
@@ -128,25 +205,17 @@ def crear_mapa_calor_comuna_estrato(df):
     
     if 'Área_de_residencia_geográfica' not in df_temp.columns:
         # Intentar obtener Área_de_residencia_geográfica desde la posición U (índice 20)
-        columnas = list(df_temp.columns)
-        if len(columnas) > 20:
-            df_temp['Área_de_residencia_geográfica'] = df_temp[columnas[20]]
+        columna_u = columna_por_posicion(df_temp, 20)
+        if columna_u is not None:
+            df_temp['Área_de_residencia_geográfica'] = df_temp[columna_u]
             st.success("Columna 'Área_de_residencia_geográfica' asignada desde la posición U.")
         else:
             st.warning("No se pudo encontrar la columna 'Área_de_residencia_geográfica'. El filtro no estará disponible.")
     
-    # Limpiar y preparar datos
-    # Convertir valores nulos o vacíos a "No especificado"
-    df_temp['Comuna'] = df_temp['Comuna'].fillna("No especificado")
-    df_temp['Estrato'] = df_temp['Estrato'].fillna("No especificado")
-    
-    # Convertir nombres de comunas a mayúsculas para estandarización
-    df_temp['Comuna'] = df_temp['Comuna'].str.upper()
-    
     # Filtrar por área de residencia si está disponible
     if 'Área_de_residencia_geográfica' in df_temp.columns:
         # Obtener valores únicos para el filtro
-        areas_unicas = sorted(df_temp['Área_de_residencia_geográfica'].dropna().unique())
+        areas_unicas = sorted(conteo_valores(df_temp, 'Área_de_residencia_geográfica').index)
         
         # Crear filtro en el sidebar
         st.sidebar.header("Filtros del Mapa de Calor")
@@ -161,12 +230,25 @@ def crear_mapa_calor_comuna_estrato(df):
             df_temp = df_temp[df_temp['Área_de_residencia_geográfica'].isin(areas_seleccionadas)]
             st.success(f"Filtrando por áreas: {', '.join(areas_seleccionadas)}")
     
+    # Conteo por combinación comuna-estrato (guardado por versión de los datos y
+    # actualizado solo con las filas nuevas; se recalcula si hay filtro de área)
+    conteos = tabla_cruzada(df_temp, 'Comuna', 'Estrato')
+    
+    # Etiquetas: valores vacíos como "No especificado", comunas en mayúsculas y
+    # estratos como texto ("1", "2", ...)
+    conteos = conteos.assign(
+        Comuna=conteos['Comuna'].map(lambda v: "No especificado" if pd.isna(v) else str(v)).str.upper(),
+        Estrato=conteos['Estrato'].map(lambda v: "No especificado" if pd.isna(v) else str(v))
+    )
+    
     # Crear tabla de conteo cruzado (comuna vs estrato)
-    crosstab = pd.crosstab(
-        index=df_temp['Comuna'], 
-        columns=df_temp['Estrato'],
-        normalize=False
-    ).fillna(0)
+    crosstab = conteos.pivot_table(
+        index='Comuna',
+        columns='Estrato',
+        values='Cantidad',
+        aggfunc='sum',
+        fill_value=0
+    )
     
     # Asegurar que todas las comunas estén en orden ascendente
     crosstab = crosstab.sort_index()
@@ -264,8 +346,8 @@ def crear_mapa(df):
     """
     st.header("Mapa de Ubicaciones")
     
-    # Crear una copia para no modificar el original
-    df_temp = df.copy()
+    # Copia superficial: las columnas nuevas o reemplazadas no modifican el original
+    df_temp = df.copy(deep=False)
     
     # Cargar información de comedores y cupos
     df_comedores = cargar_info_comedores()
@@ -280,19 +362,20 @@ def crear_mapa(df):
     if columnas_faltantes:
         st.warning(f"Columnas faltantes: {', '.join(columnas_faltantes)}. Intentando ubicar por posición...")
         
-        columnas = list(df_temp.columns)
-        
         # Asignar por posición si es posible
-        if "UBICACION_PREDEFINIDA" not in df_temp.columns and len(columnas) > 105:  # DA = posición 105
-            df_temp["UBICACION_PREDEFINIDA"] = df_temp[columnas[105]]
+        columna_ubicacion = columna_por_posicion(df_temp, 105)  # DA = posición 105
+        if "UBICACION_PREDEFINIDA" not in df_temp.columns and columna_ubicacion is not None:
+            df_temp["UBICACION_PREDEFINIDA"] = df_temp[columna_ubicacion]
             st.success("Columna 'UBICACION_PREDEFINIDA' asignada por posición.")
         
-        if "Nombre_comedor" not in df_temp.columns and len(columnas) > 100:  # CX = aproximadamente posición 100
-            df_temp["Nombre_comedor"] = df_temp[columnas[100]]
+        columna_comedor = columna_por_posicion(df_temp, 100)  # CX = aproximadamente posición 100
+        if "Nombre_comedor" not in df_temp.columns and columna_comedor is not None:
+            df_temp["Nombre_comedor"] = df_temp[columna_comedor]
             st.success("Columna 'Nombre_comedor' asignada por posición.")
         
-        if "Se_reconoce_como" not in df_temp.columns and len(columnas) > 37:  # AL = posición 37
-            df_temp["Se_reconoce_como"] = df_temp[columnas[37]]
+        columna_al = columna_por_posicion(df_temp, 37)  # AL = posición 37
+        if "Se_reconoce_como" not in df_temp.columns and columna_al is not None:
+            df_temp["Se_reconoce_como"] = df_temp[columna_al]
             st.success("Columna 'Se_reconoce_como' asignada por posición.")
     
     # Verificar nuevamente si existen las columnas necesarias
@@ -308,23 +391,10 @@ def crear_mapa(df):
         st.warning("No se pudo encontrar la columna de reconocimiento étnico. No se mostrará esta información.")
         df_temp["Se_reconoce_como"] = "No especificado"
     
-    # Crear columnas para latitud y longitud
-    df_temp['lat'] = None
-    df_temp['lon'] = None
-    
-    # Extraer coordenadas
-    for idx, row in df_temp.iterrows():
-        lat, lon = extraer_coordenadas(row['UBICACION_PREDEFINIDA'])
-        df_temp.at[idx, 'lat'] = lat
-        df_temp.at[idx, 'lon'] = lon
-    
-    # Limpiar nombres de comedores
-    df_temp['Nombre_comedor_limpio'] = df_temp['Nombre_comedor'].apply(limpiar_nombre_comedor)
+    # Registros por comedor, ubicación y etnia
+    conteos_comedor = _conteos_comedor(df_temp)
     
-    # Filtrar filas con coordenadas válidas
-    df_map = df_temp.dropna(subset=['lat', 'lon']).copy()
-    
-    if df_map.empty:
+    if conteos_comedor.empty:
         st.error("No se encontraron coordenadas válidas en los datos. Por favor verifica el formato de la columna 'UBICACION_PREDEFINIDA'.")
         
         # Mostrar ejemplos de los valores de ubicación para ayudar a depurar
@@ -338,9 +408,13 @@ def crear_mapa(df):
     # Agrupar datos por comedor - CORREGIDO PARA EVITAR ERROR DE COLUMNA DUPLICADA
     grouped_data = []
     
-    for (comedor, lat, lon), group in df_map.groupby(['Nombre_comedor_limpio', 'lat', 'lon']):
-        # Contar distribución étnica
-        etnia_counts = group['Se_reconoce_como'].value_counts().to_dict()
+    for (comedor, lat, lon), group in conteos_comedor.groupby(['Comedor', 'lat', 'lon']):
+        # Contar distribución étnica (sin las respuestas vacías)
+        registros = int(group['Conteo'].sum())
+        etnia_counts = {
+            etnia: int(conteo) for etnia, conteo in zip(group['Se_reconoce_como'], group['Conteo'])
+            if pd.notna(etnia) and conteo > 0
+        }
         
         # Buscar cupos para este comedor si la información está disponible
         cupos = None
@@ -353,14 +427,14 @@ def crear_mapa(df):
                 # Tomar el primer match si hay varios
                 cupos = comedores_match['Cupos'].iloc[0]
                 if pd.notna(cupos) and cupos > 0:
-                    porcentaje_cupos = (len(group) / cupos) * 100
+                    porcentaje_cupos = (registros / cupos) * 100
         
         # Agregar a la lista de resultados
         grouped_data.append({
             'Comedor': comedor,
             'lat': lat,
             'lon': lon,
-            'Conteo': len(group),
+            'Conteo': registros,
             'Distribución_étnica': etnia_counts,
             'Cupos': cupos,
             'Porcentaje_cupos': porcentaje_cupos
@@ -369,6 +443,11 @@ def crear_mapa(df):
     # Crear dataframe con los datos agrupados
     agrupado = pd.DataFrame(grouped_data)
     
+    # Capa FIES: prevalencias de inseguridad alimentaria de cada comedor
+    prevalencias_fies = _prevalencia_fies_por_comedor(df_temp)
+    if prevalencias_fies is not None:
+        agrupado = agrupado.join(prevalencias_fies, on='Comedor')
+    
     # Crear texto para hover con distribución étnica y porcentaje de cupos
     def crear_texto_hover(row):
         texto = f"<b>{row['Comedor']}</b><br>"
@@ -380,6 +459,11 @@ def crear_mapa(df):
             if pd.notna(row['Porcentaje_cupos']):
                 texto += f"Porcentaje ocupado: {row['Porcentaje_cupos']:.1f}%<br>"
         
+        # Agregar prevalencias FIES si están disponibles
+        if pd.notna(row.get('Prevalencia_mod_sev')):
+            texto += f"Inseguridad alimentaria mod+grave: {row['Prevalencia_mod_sev']:.1f}%<br>"
+            texto += f"Inseguridad alimentaria grave: {row['Prevalencia_sev']:.1f}%<br>"
+        
         texto += "<br><b>Distribución étnica:</b><br>"
         
         # Ordenar distribución étnica de mayor a menor
@@ -470,10 +554,36 @@ def crear_mapa(df):
             # Escalar tamaños entre 10 y 30 píxeles
             agrupado_filtrado['tamano_marcador'] = ((agrupado_filtrado['Conteo'] - min_conteo) / (max_conteo - min_conteo) * 20 + 10)
     
+    # Capa de color de los puntos
+    capas_fies = {
+        "Prevalencia FIES moderada o grave": 'Prevalencia_mod_sev',
+        "Prevalencia FIES grave": 'Prevalencia_sev'
+    }
+    opciones_capa = ["Ocupación / registros"]
+    if 'Prevalencia_mod_sev' in agrupado_filtrado.columns:
+        opciones_capa += list(capas_fies)
+    capa = st.radio("Color de los puntos:", opciones_capa, horizontal=True, key="mapa_capa_color")
+    
     # Crear el mapa con Plotly
     if not agrupado_filtrado.empty:
+        if capa in capas_fies:
+            # Colorear por la prevalencia FIES del comedor
+            columna_capa = capas_fies[capa]
+            fig_mapa = px.scatter_mapbox(
+                agrupado_filtrado,
+                lat='lat',
+                lon='lon',
+                hover_name='Comedor',
+                size='tamano_marcador',
+                color=columna_capa,
+                color_continuous_scale='Reds',
+                range_color=[0, 100],
+                labels={columna_capa: '% Prevalencia'},
+                zoom=11,
+                mapbox_style="open-street-map"
+            )
         # Definir escala de colores basada en el porcentaje de ocupación
-        if 'Porcentaje_cupos' in agrupado_filtrado.columns and not agrupado_filtrado['Porcentaje_cupos'].isna().all():
+        elif 'Porcentaje_cupos' in agrupado_filtrado.columns and not agrupado_filtrado['Porcentaje_cupos'].isna().all():
             # Usar porcentaje de ocupación para el color
             fig_mapa = px.scatter_mapbox(
                 agrupado_filtrado,
@@ -553,7 +663,7 @@ def crear_mapa(df):
         st.caption("""
         **Nota sobre el mapa:**
         - El tamaño de los puntos representa la cantidad de registros
-        - El color representa el porcentaje de ocupación (azul = alta ocupación, rojo = baja ocupación)
+        - El color representa el porcentaje de ocupación (azul = alta ocupación, rojo = baja ocupación) o, con la capa FIES, la prevalencia de inseguridad alimentaria del comedor
         - Haz clic en los puntos para ver más detalles
         """)
     else:
@@ -625,16 +735,22 @@ def mostrar_mapa():
     """
     st.title("Visualización de Mapas")
     
-    # Verificar si hay datos cargados en la sesión
-    if 'df' in st.session_state:
+    # Usar el conjunto DUB compartido por todas las pestañas
+    df = obtener_dataset("DUB")
+    if df is not None and not df.empty:
+        df = aplicar_filtros_globales(df)
+        if df.empty:
+            st.info("Ningún registro cumple los filtros globales seleccionados.")
+            return
+        
         # Crear pestañas para los diferentes tipos de visualización
         tab1, tab2 = st.tabs(["Mapa de Ubicaciones", "Mapa de Calor Comuna vs Estrato"])
         
         with tab1:
-            crear_mapa(st.session_state.df)
+            crear_mapa(df)
         
         with tab2:
-            crear_mapa_calor_comuna_estrato(st.session_state.df)
+            crear_mapa_calor_comuna_estrato(df)
             
     else:
         st.warning("No hay datos cargados. Por favor, carga los datos primero desde la pestaña DUB.")
@@ -2,6 +2,11 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import os
+from google_connection import columna_por_posicion
+from paginas.datasets import obtener_dataset
+from paginas.filtros import aplicar_filtros_globales
+from utils.agregados import agregado_por_version
+from utils.bootstrap import intervalos_proporciones
 
 def mostrar_pagina_demografia():
     """
@@ -9,29 +14,22 @@ def mostrar_pagina_demografia():
     """
     st.header("Perfil de Consumo Alimentario")
     
-    # Verificar si hay datos cargados en la sesión
-    if 'df' in st.session_state:
-        df = st.session_state.df
-        st.success(f"Usando datos cargados. Total de filas: {len(df)}")
-    else:
-        # Si no hay datos cargados, intentar cargarlos
-        from google_connection import load_data
-        with st.spinner("Cargando datos desde Google Sheets..."):
-            try:
-                # Cargar los datos desde la hoja "DUB"
-                sheet_id = "1haZINioOFe4WTL2G9FzsYt0p4-8uJ5WKbukexBYhx_o"
-                df = load_data(sheet_id, "DUB")
-                
-                if df is not None and not df.empty:
-                    # Guardar en session_state para compartirlo entre pestañas
-                    st.session_state.df = df
-                    st.success(f"Datos cargados correctamente. Total de filas: {len(df)}")
-                else:
-                    st.error("No se pudieron cargar los datos.")
-                    return
-            except Exception as e:
-                st.error(f"Error en la aplicación: {e}")
-                return
+    # Cargar el conjunto DUB (compartido por todas las pestañas en la caché del proceso)
+    with st.spinner("Cargando datos desde Google Sheets..."):
+        try:
+            df = obtener_dataset("DUB")
+        except Exception as e:
+            st.error(f"Error en la aplicación: {e}")
+            return
+    
+    if df is None or df.empty:
+        st.error("No se pudieron cargar los datos.")
+        return
+    st.success(f"Usando datos cargados. Total de filas: {len(df)}")
+    df = aplicar_filtros_globales(df)
+    if df.empty:
+        st.info("Ningún registro cumple los filtros globales seleccionados.")
+        return
     
     # Posiciones de las columnas en el dataframe (basado en los índices proporcionados)
     # BS = 70, BT = 71, BU = 72, BV = 73, BW = 74, BX = 75 (0-indexado)
@@ -85,10 +83,9 @@ def mostrar_pagina_demografia():
     for col_name, col_pos in posiciones.items():
         if col_name in df.columns:
             all_categories.update(df[col_name].dropna().unique())
-        elif len(df.columns) > col_pos:
+        elif columna_por_posicion(df, col_pos) is not None:
             # Corregir para obtener las categorías del DataFrame usando posición
-            columnas = list(df.columns)
-            all_categories.update(df[columnas[col_pos]].dropna().unique())
+            all_categories.update(df[columna_por_posicion(df, col_pos)].dropna().unique())
     
     # Filtrar categorías vacías o nulas
     all_categories = [cat for cat in all_categories if pd.notna(cat) and str(cat).strip()]
@@ -108,12 +105,14 @@ def mostrar_pagina_demografia():
             serie = df[col_name].copy()
             filtro = serie.isin([cat for cat, selected in selected_categories.items() if selected])
             conteo = serie[filtro].value_counts()
-        elif len(df.columns) > col_pos:
-            columnas = list(df.columns)
-            serie = df[columnas[col_pos]].copy()
+        elif columna_por_posicion(df, col_pos) is not None:
+            serie = df[columna_por_posicion(df, col_pos)].copy()
             filtro = serie.isin([cat for cat, selected in selected_categories.items() if selected])
             conteo = serie[filtro].value_counts()
             
+        if conteo is not None:
+            # Las columnas categóricas cuentan también las categorías ausentes (con 0)
+            conteo = conteo[conteo > 0]
         if conteo is not None and not conteo.empty:
             consumo_data[titulos[col_name]] = conteo
     
@@ -175,9 +174,8 @@ def mostrar_pagina_demografia():
             for col_name, col_pos in posiciones.items():
                 if col_name in df.columns:
                     serie = df[col_name]
-                elif len(df.columns) > col_pos:
-                    columnas = list(df.columns)
-                    serie = df[columnas[col_pos]]
+                elif columna_por_posicion(df, col_pos) is not None:
+                    serie = df[columna_por_posicion(df, col_pos)]
                 else:
                     continue
                     
@@ -223,9 +221,8 @@ def mostrar_pagina_demografia():
                     for col_name, col_pos in posiciones.items():
                         if col_name in df.columns:
                             serie = df[col_name]
-                        elif len(df.columns) > col_pos:
-                            columnas = list(df.columns)
-                            serie = df[columnas[col_pos]]
+                        elif columna_por_posicion(df, col_pos) is not None:
+                            serie = df[columna_por_posicion(df, col_pos)]
                         else:
                             continue
                             
@@ -316,6 +313,21 @@ def mostrar_pagina_demografia():
             * El total puede no sumar exactamente 100% debido a redondeo
             * Las categorías con 0% indican ausencia de respuestas en esa combinación
             """)
+            
+            # Intervalos de confianza por bootstrap (una vez por versión de los datos)
+            if st.checkbox("Mostrar intervalos de confianza al 95% (bootstrap)", key="demografia_intervalos"):
+                columnas_ic = {titulos[col]: col for col in posiciones if col in df.columns}
+                # Mismo denominador que la tabla: solo las categorías seleccionadas
+                seleccionadas = tuple(sorted(str(cat) for cat, selected in selected_categories.items() if selected))
+                with st.spinner("Remuestreando encuestados..."):
+                    intervalos = agregado_por_version(
+                        df, ("intervalos_consumo", tuple(columnas_ic.items()), seleccionadas),
+                        lambda datos: intervalos_proporciones(datos, columnas_ic, categorias=seleccionadas)
+                    )
+                intervalos = intervalos.rename(columns={'Variable': 'Alimento'})
+                for col in ['Porcentaje', 'IC inferior', 'IC superior']:
+                    intervalos[col] = intervalos[col].apply(lambda x: f"{x:.1f}%")
+                st.dataframe(intervalos, use_container_width=True)
         except Exception as e:
             st.warning(f"No se pudo generar la tabla de resumen: {e}")
     else:
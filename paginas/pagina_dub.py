@@ -2,7 +2,9 @@ import streamlit as st
 import pandas as pd
 from utils.svg_utils import mostrar_estadisticas_sexo
 from graficos.graficos_adicionales import crear_grafico_pastel, crear_grafico_barras_horizontal, mostrar_graficos_pastel, mostrar_matriz_graficos_barras
-from google_connection import load_data
+from google_connection import columna_por_posicion
+from paginas.datasets import obtener_dataset
+from paginas.filtros import aplicar_filtros_globales
 
 
 def mostrar_pagina_dub():
@@ -14,28 +16,22 @@ def mostrar_pagina_dub():
     """
     st.header("Demografía DUB")
     
-    # Verificar si hay datos cargados en la sesión
-    if 'df' in st.session_state:
-        df = st.session_state.df
-        st.success(f"Usando datos cargados. Total de filas: {len(df)}")
-    else:
-        # Si no hay datos cargados, intentar cargarlos
-        with st.spinner("Cargando datos desde Google Sheets..."):
-            try:
-                # Cargar los datos desde la hoja "DUB"
-                sheet_id = "19aYe071W4ktFUHOswLf9oB3nj2hcOvklavxdR8Ohv40"
-                df = load_data(sheet_id, "DUB")
-                
-                if df is not None and not df.empty:
-                    # Guardar en session_state para compartirlo entre pestañas
-                    st.session_state.df = df
-                    st.success(f"Datos cargados correctamente. Total de filas: {len(df)}")
-                else:
-                    st.error("No se pudieron cargar los datos.")
-                    return None
-            except Exception as e:
-                st.error(f"Error en la aplicación: {e}")
-                return None
+    # Cargar el conjunto DUB (compartido por todas las pestañas en la caché del proceso)
+    with st.spinner("Cargando datos desde Google Sheets..."):
+        try:
+            df = obtener_dataset("DUB")
+        except Exception as e:
+            st.error(f"Error en la aplicación: {e}")
+            return None
+    
+    if df is None or df.empty:
+        st.error("No se pudieron cargar los datos.")
+        return None
+    st.success(f"Usando datos cargados. Total de filas: {len(df)}")
+    df = aplicar_filtros_globales(df)
+    if df.empty:
+        st.info("Ningún registro cumple los filtros globales seleccionados.")
+        return None
     
     # 1. VISUALIZACIÓN DE ESTADÍSTICAS POR SEXO
     st.markdown("### Distribución Demográfica")
@@ -45,9 +41,9 @@ def mostrar_pagina_dub():
         # Si no existe, intentamos buscar la columna AH
         try:
             # Renombramos la columna AH a 'Sexo' si existe
-            columnas = list(df.columns)
-            if len(columnas) >= 34:  # AH sería la columna 34 (0-indexado)
-                df['Sexo'] = df[columnas[33]]  # AH sería la columna 34 (0-indexado)
+            columna_ah = columna_por_posicion(df, 33)  # AH sería la columna 34 (0-indexado)
+            if columna_ah is not None:
+                df['Sexo'] = df[columna_ah]
             else:
                 st.warning("No se encontró la columna en la posición AH. Por favor verifica la estructura de tus datos.")
         except Exception as e:
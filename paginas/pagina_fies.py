@@ -1,10 +1,73 @@
 import streamlit as st
 import pandas as pd
 import os
+from paginas.columnas import ITEMS_FIES
+from paginas.datasets import obtener_dataset
+from paginas.filtros import aplicar_filtros_globales
+from utils.fies import analizar_fies, intervalos_prevalencia_fies, prevalencias_por_grupo
+from utils.agregados import registrar_precalculo
+
+# El modelo de Rasch se ajusta al publicar cada versión de los datos
+registrar_precalculo(lambda df: analizar_fies(df, ITEMS_FIES), ITEMS_FIES, "fies_rasch")
+
+# Dimensiones para las prevalencias por grupo: {etiqueta: columna de la hoja DUB}
+DIMENSIONES_FIES = {
+    "Comuna": "Comuna",
+    "Comedor": "Nombre_comedor",
+    "Sexo": "Sexo",
+    "Estrato": "Estrato"
+}
+
+def _porcentaje(valor, decimales=1):
+    """
+    Formatea una proporción como porcentaje con coma decimal (0.2263 -> "22,6%").
+    """
+    return f"{valor * 100:.{decimales}f}%".replace(".", ",")
+
+def _primer_puntaje(puntajes, columna, umbral):
+    """
+    Primer puntaje bruto cuya probabilidad en columna supera el umbral (o None).
+    """
+    superan = puntajes.loc[puntajes[columna] > umbral, "Puntaje bruto"]
+    return int(superan.iloc[0]) if not superan.empty else None
+
+def _ajustar_modelo():
+    """
+    Carga la hoja DUB, aplica los filtros globales y ajusta el modelo de Rasch.
+
+    Returns:
+        tuple: (DataFrame filtrado, resultado de analizar_fies); resultado es None
+               (con un aviso en pantalla) si no hay datos o respuestas suficientes.
+    """
+    with st.spinner("Cargando datos desde Google Sheets..."):
+        try:
+            df = obtener_dataset("DUB")
+        except Exception as e:
+            st.error(f"Error en la aplicación: {e}")
+            return None, None
+    
+    if df is None or df.empty:
+        st.error("No se pudieron cargar los datos.")
+        return None, None
+    df = aplicar_filtros_globales(df)
+    if df.empty:
+        st.info("Ningún registro cumple los filtros globales seleccionados.")
+        return df, None
+    
+    resultado = analizar_fies(df, ITEMS_FIES)
+    if resultado is None:
+        st.warning("No hay respuestas FIES suficientes para ajustar el modelo de Rasch: no se "
+                   "encontraron las ocho preguntas de la escala con respuestas Sí/No. Las tablas "
+                   "calculadas se omiten.")
+    return df, resultado
 
 def mostrar_pagina_fies():
     """
-    Muestra el contenido de la pestaña FIES
+    Muestra el contenido de la pestaña FIES.
+
+    Los puntajes brutos, las probabilidades y las prevalencias se calculan con el
+    modelo de Rasch ajustado a las respuestas de la hoja DUB (utils.fies). Si el
+    ajuste no es posible, se muestran solo las secciones explicativas.
     """
     # Verificar si existen las carpetas de imágenes
     ruta_imagenes = "imagenes"
@@ -27,6 +90,15 @@ def mostrar_pagina_fies():
     </div>
     """, unsafe_allow_html=True)
     
+    # Ajustar el modelo de Rasch con las respuestas de la hoja DUB; las secciones
+    # calculadas solo se agregan si el ajuste fue posible
+    df, resultado = _ajustar_modelo()
+    if resultado is not None:
+        puntajes = resultado["puntajes"]
+        proporcion = puntajes["Proporción"]
+        prevalencia_mod = resultado["prevalencia_moderada_grave"]
+        prevalencia_sev = resultado["prevalencia_grave"]
+    
     # Segunda fila - Parámetros del encuestado (dividida en dos columnas)
     st.markdown("---")
     
@@ -39,14 +111,15 @@ def mostrar_pagina_fies():
         </h3>
         """, unsafe_allow_html=True)
         
-        st.markdown("""
+        detalle_rs = (f"""En la ilustración 1 
+        se observa que el <span style="font-weight: bold; color: #d32f2f;">{_porcentaje(proporcion.iloc[0], 0)}</span> respondieron "No" a las ocho preguntas del módulo FIES, en contraparte, el 
+        <span style="font-weight: bold; color: #d32f2f;">{_porcentaje(proporcion.iloc[-1], 0)}</span> respondieron afirmativamente todas las preguntas.""" if resultado is not None else "")
+        st.markdown(f"""
         <div style="background-color: #f9f9f9; padding: 15px; border-radius: 5px; border-left: 3px solid #757575;">
         El puntaje bruto de un encuestado es la cantidad de respuestas afirmativas dadas a las ocho preguntas de la FIES, 
         constituyendo un número entero con un valor entre 0 y 8, representando en sí misma, una medida ordinal e intuitiva 
         de la situación de inseguridad alimentaria. Por lo cual, aquellos encuestados con puntajes brutos más altos serán 
-        los que estén experimentando situaciones relacionadas con dificultades en el acceso a los alimentos. En la ilustración 1 
-        se observa que el <span style="font-weight: bold; color: #d32f2f;">23%</span> respondieron "No" a las ocho preguntas del módulo FIES, en contraparte, el 
-        <span style="font-weight: bold; color: #d32f2f;">19%</span> respondieron afirmativamente todas las preguntas.
+        los que estén experimentando situaciones relacionadas con dificultades en el acceso a los alimentos. {detalle_rs}
         </div>
         """, unsafe_allow_html=True)
     
@@ -57,15 +130,25 @@ def mostrar_pagina_fies():
         </h4>
         """, unsafe_allow_html=True)
         
-        # Crear datos para la tabla de respuestas afirmativas
-        respuestas_data = {
-            "RS": [0, 1, 2, 3, 4, 5, 6, 7, 8],
-            "%": ["23%", "14%", "7%", "9%", "7%", "7%", "7%", "9%", "19%"]
-        }
-        
-        # Usar DataFrame de pandas para mostrar la tabla con estilo
-        resp_df = pd.DataFrame(respuestas_data)
-        st.dataframe(resp_df, use_container_width=True)
+        # Porcentaje de encuestados por puntaje bruto (RS)
+        if resultado is not None:
+            resp_df = pd.DataFrame({
+                "RS": puntajes["Puntaje bruto"],
+                "%": proporcion.apply(lambda x: _porcentaje(x, 0))
+            })
+            st.dataframe(resp_df, use_container_width=True)
+            st.caption(f"Encuestados con las ocho preguntas respondidas: {resultado['encuestados']:,}")
+        else:
+            st.info("Sin datos para calcular la distribución de puntajes brutos.")
+    
+    # Severidad de los ítems estimada por máxima verosimilitud condicional
+    if resultado is not None:
+        with st.expander("Parámetros de los ítems (modelo de Rasch)"):
+            items_df = resultado["items"].reset_index()
+            items_df["Severidad"] = items_df["Severidad"].apply(lambda x: f"{x:.3f}")
+            items_df["Error estándar"] = items_df["Error estándar"].apply(lambda x: f"{x:.3f}")
+            st.dataframe(items_df, use_container_width=True)
+            st.caption(f"Severidades centradas en cero; el ajuste convergió en {resultado['iteraciones']} iteraciones.")
     
     # Tercera fila - Equating (2 columnas)
     st.markdown("---")
@@ -117,7 +200,34 @@ def mostrar_pagina_fies():
     col1, col2 = st.columns(2)
     
     with col1:
-        st.markdown("""
+        if resultado is not None:
+            bajos, medios, altos = proporcion.iloc[1:4], proporcion.iloc[4:6], proporcion.iloc[6:]
+            detalle = lambda grupo: " + ".join(_porcentaje(x) for x in grupo)
+            puntaje_mod = _primer_puntaje(puntajes, "Probabilidad (mod+sev)", 0.8)
+            puntaje_sev = _primer_puntaje(puntajes, "Probabilidad (sev)", 0.1)
+            prob_sev_maximo = puntajes["Probabilidad (sev)"].iloc[-1]
+            texto_mod = (f"A partir de la puntuación {puntaje_mod}, la probabilidad de inseguridad alimentaria moderada+severa supera el 80%."
+                         if puntaje_mod is not None else "Ningún puntaje alcanza una probabilidad de inseguridad alimentaria moderada+severa del 80%.")
+            texto_sev = (f"La probabilidad de inseguridad alimentaria severa supera el 10% a partir de la puntuación {puntaje_sev}."
+                         if puntaje_sev is not None else "La probabilidad de inseguridad alimentaria severa no supera el 10% en ningún puntaje.")
+            detalle_probabilidad = f"""
+        <ul style="margin-top: 15px; line-height: 1.6; text-align: justify;">
+            <li><span style="font-weight: bold; color: #673ab7;">{_porcentaje(proporcion.iloc[0])} de la población</span> no respondió afirmativamente a ninguna pregunta (puntuación 0), lo que indica seguridad alimentaria.</li>
+            <li><span style="font-weight: bold; color: #673ab7;">{_porcentaje(bajos.sum())} de la población</span> ({detalle(bajos)}) tiene puntuaciones bajas (1-3), indicando vulnerabilidad pero con baja probabilidad de inseguridad alimentaria moderada o severa.</li>
+            <li><span style="font-weight: bold; color: #673ab7;">{_porcentaje(medios.sum())} de la población</span> ({detalle(medios)}) tiene puntuaciones medias (4-5) con probabilidades intermedias de inseguridad alimentaria moderada.</li>
+            <li><span style="font-weight: bold; color: #673ab7;">{_porcentaje(altos.sum())} de la población</span> ({detalle(altos)}) tiene puntuaciones altas (6-8), con alta probabilidad de inseguridad alimentaria moderada o severa.</li>
+        </ul>
+        <p style="margin-top: 15px; line-height: 1.6; text-align: justify;">
+        <span style="font-weight: bold;">Especialmente notable:</span>
+        </p>
+        <ul style="line-height: 1.6; text-align: justify;">
+            <li><span style="font-weight: bold; color: #673ab7;">{_porcentaje(proporcion.iloc[-1])} de la población</span> respondió afirmativamente a las 8 preguntas, con un {_porcentaje(prob_sev_maximo)} de probabilidad de inseguridad alimentaria severa.</li>
+            <li>{texto_mod}</li>
+            <li>{texto_sev}</li>
+        </ul>"""
+        else:
+            detalle_probabilidad = ""
+        st.markdown(f"""
         <div style="background-color: #ede7f6; padding: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
         <p style="line-height: 1.6; text-align: justify;">
         En la ilustración 3, tanto los parámetros de severidad de la respuesta y los errores estándar se utilizan para 
@@ -126,42 +236,31 @@ def mostrar_pagina_fies():
         respectivamente). Se evidencia que la probabilidad aumenta con puntajes brutos más altos, lo que induce que a medida 
         que una persona responde más preguntas afirmativamente, tiene una mayor probabilidad de ser categorizado como 
         inseguro moderado o grave.
-        </p>
-        <ul style="margin-top: 15px; line-height: 1.6; text-align: justify;">
-            <li><span style="font-weight: bold; color: #673ab7;">22.6% de la población</span> no respondió afirmativamente a ninguna pregunta (puntuación 0), lo que indica seguridad alimentaria.</li>
-            <li><span style="font-weight: bold; color: #673ab7;">29.1% de la población</span> (13.6% + 6.7% + 8.8%) tiene puntuaciones bajas (1-3), indicando vulnerabilidad pero con baja probabilidad de inseguridad alimentaria moderada o severa.</li>
-            <li><span style="font-weight: bold; color: #673ab7;">13.9% de la población</span> (6.8% + 7.1%) tiene puntuaciones medias (4-5) con probabilidades intermedias de inseguridad alimentaria moderada.</li>
-            <li><span style="font-weight: bold; color: #673ab7;">34.5% de la población</span> (7.1% + 8.9% + 18.5%) tiene puntuaciones altas (6-8), con alta probabilidad de inseguridad alimentaria moderada o severa.</li>
-        </ul>
-        <p style="margin-top: 15px; line-height: 1.6; text-align: justify;">
-        <span style="font-weight: bold;">Especialmente notable:</span>
-        </p>
-        <ul style="line-height: 1.6; text-align: justify;">
-            <li><span style="font-weight: bold; color: #673ab7;">18.5% de la población</span> respondió afirmativamente a las 8 preguntas, con un 85.9% de probabilidad de inseguridad alimentaria severa.</li>
-            <li>A partir de la puntuación 5, la probabilidad de inseguridad alimentaria moderada+severa supera el 80%.</li>
-            <li>La probabilidad de inseguridad alimentaria severa aumenta drásticamente a partir de la puntuación 6.</li>
-        </ul>
+        </p>{detalle_probabilidad}
         </div>
         """, unsafe_allow_html=True)
     
     with col2:
-        # Datos para la tabla de probabilidades
-        prob_data = {
-            "Puntaje bruto": [0, 1, 2, 3, 4, 5, 6, 7, 8],
-            "Porcentaje de Individuos": ["22,6%", "13,6%", "6,7%", "8,8%", "6,8%", "7,1%", "7,1%", "8,9%", "18,5%"],
-            "Probabilidad (mod+sev)": [0.0, 0.018060, 0.072649, 0.230484, 0.544816, 0.828988, 0.952523, 0.987277, 0.995779],
-            "Probabilidad (sev)": [0.0, 0.000020, 0.000026, 0.000144, 0.001937, 0.025274, 0.171284, 0.561874, 0.858971]
-        }
-        
-        # Crear DataFrame y mostrar tabla
-        prob_df = pd.DataFrame(prob_data)
-        
-        # Formatear las probabilidades para mostrar 6 decimales
-        prob_df["Probabilidad (mod+sev)"] = prob_df["Probabilidad (mod+sev)"].apply(lambda x: f"{x:.6f}")
-        prob_df["Probabilidad (sev)"] = prob_df["Probabilidad (sev)"].apply(lambda x: f"{x:.6f}")
-        
-        # Mostrar tabla usando st.dataframe en lugar de HTML personalizado
-        st.dataframe(prob_df, use_container_width=True)
+        if resultado is not None:
+            # Tabla de probabilidades por puntaje bruto, con la severidad y el error estándar
+            # estimados para cada puntaje
+            prob_df = pd.DataFrame({
+                "Puntaje bruto": puntajes["Puntaje bruto"],
+                "Porcentaje de Individuos": proporcion.apply(_porcentaje),
+                "Severidad": puntajes["Severidad"].apply(lambda x: f"{x:.3f}"),
+                "Error estándar": puntajes["Error estándar"].apply(lambda x: f"{x:.3f}"),
+                "Probabilidad (mod+sev)": puntajes["Probabilidad (mod+sev)"],
+                "Probabilidad (sev)": puntajes["Probabilidad (sev)"]
+            })
+            
+            # Formatear las probabilidades para mostrar 6 decimales
+            prob_df["Probabilidad (mod+sev)"] = prob_df["Probabilidad (mod+sev)"].apply(lambda x: f"{x:.6f}")
+            prob_df["Probabilidad (sev)"] = prob_df["Probabilidad (sev)"].apply(lambda x: f"{x:.6f}")
+            
+            # Mostrar tabla usando st.dataframe en lugar de HTML personalizado
+            st.dataframe(prob_df, use_container_width=True)
+        else:
+            st.info("Sin datos para calcular las probabilidades por puntaje bruto.")
         
         # Pie de página para la tabla
         st.caption("""
@@ -202,23 +301,52 @@ def mostrar_pagina_fies():
     </div>
     """, unsafe_allow_html=True)
     
-    # Datos para la tabla de prevalencias
-    prevalencias_data = {
-        "Tasa de prevalencia (Mod+Sev)": ["46,28%"],
-        "Tasa de prevalencia (Sev)": ["22,308%"]
-    }
+    if resultado is None:
+        st.info("Las prevalencias se mostrarán cuando haya respuestas FIES suficientes para ajustar el modelo.")
+        return
+    
+    # Prevalencias: suma de las probabilidades de cada puntaje ponderadas por su proporción
+    prevalencias_df = pd.DataFrame({
+        "Tasa de prevalencia (Mod+Sev)": [_porcentaje(prevalencia_mod, 2)],
+        "Tasa de prevalencia (Sev)": [_porcentaje(prevalencia_sev, 2)]
+    })
     
-    # Crear DataFrame y mostrar tabla
-    prevalencias_df = pd.DataFrame(prevalencias_data)
+    # Intervalos de confianza por bootstrap (se calculan una vez por versión de los datos)
+    if st.checkbox("Calcular intervalos de confianza al 95% (bootstrap)", key="fies_intervalos"):
+        with st.spinner("Remuestreando encuestados y reajustando el modelo..."):
+            intervalos = intervalos_prevalencia_fies(df, ITEMS_FIES)
+        if intervalos is not None:
+            for nombre, columna in (("Mod+Sev", "IC 95% (Mod+Sev)"), ("Sev", "IC 95% (Sev)")):
+                fila = intervalos.loc[nombre]
+                prevalencias_df[columna] = [f"{_porcentaje(fila['IC inferior'], 2)} – {_porcentaje(fila['IC superior'], 2)}"]
     st.dataframe(prevalencias_df, use_container_width=True)
     
     # Párrafo final con diseño mejorado
-    st.markdown("""
+    st.markdown(f"""
     <div style="background-color: #fff8e1; padding: 20px; border-radius: 8px; border-left: 5px solid #ffc107; margin-top: 20px; box-shadow: 0 2px 4px rgba(0,0,0,0.05);">
     <p style="line-height: 1.7; text-align: justify;">
-    Los resultados muestran que el <span style="font-weight: bold; color: #d32f2f;">46,28%</span> o 46 de cada 100 personas se vieron afectados por inseguridad alimentaria 
-    moderada o grave durante los últimos 12 meses. Por su parte el <span style="font-weight: bold; color: #d32f2f;">22,3%</span> de los individuos se vieron afectados por 
+    Los resultados muestran que el <span style="font-weight: bold; color: #d32f2f;">{_porcentaje(prevalencia_mod, 2)}</span> o {round(prevalencia_mod * 100)} de cada 100 personas se vieron afectados por inseguridad alimentaria 
+    moderada o grave durante los últimos 12 meses. Por su parte el <span style="font-weight: bold; color: #d32f2f;">{_porcentaje(prevalencia_sev)}</span> de los individuos se vieron afectados por 
     inseguridad alimentaria grave durante los últimos 12 meses.
     </p>
     </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+    
+    # Séptima fila - Prevalencias por grupo (todas las dimensiones en una pasada agrupada)
+    st.markdown("---")
+    st.subheader("Prevalencias por grupo")
+    
+    tablas = prevalencias_por_grupo(df, ITEMS_FIES, list(DIMENSIONES_FIES.values()), resultado)
+    disponibles = [etiqueta for etiqueta, columna in DIMENSIONES_FIES.items() if columna in tablas]
+    if not disponibles:
+        st.info("No se encontraron las columnas de comuna, comedor, sexo o estrato en los datos.")
+        return
+    
+    etiqueta = st.selectbox("Agrupar por:", disponibles, key="fies_dimension_grupo")
+    por_grupo = tablas[DIMENSIONES_FIES[etiqueta]].sort_values("Prevalencia (mod+sev)", ascending=False)
+    por_grupo = por_grupo.rename_axis(etiqueta).reset_index()
+    por_grupo["Prevalencia (mod+sev)"] = por_grupo["Prevalencia (mod+sev)"].apply(lambda x: _porcentaje(x, 2))
+    por_grupo["Prevalencia (sev)"] = por_grupo["Prevalencia (sev)"].apply(lambda x: _porcentaje(x, 2))
+    st.dataframe(por_grupo, use_container_width=True)
+    st.caption("Cada prevalencia aplica las probabilidades por puntaje bruto del modelo general a la "
+               "distribución de puntajes del grupo. Los grupos con pocos encuestados son poco precisos.")
@@ -1,19 +1,141 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
+import numpy as np
+from datetime import date, timedelta
 import plotly.express as px
-from google_connection import load_data
+import plotly.graph_objects as go
+from paginas.datasets import cargar_datasets, dataset_listo
+from paginas.filtros import aplicar_filtros_globales
 from graficos.grafico_dub import crear_grafico_dub
 from graficos.grafico_fechas import crear_grafico_fechas
+from utils.agregados import serie_diaria, ids_unicos, agregado_por_version, registrar_precalculo
+from utils.proyeccion import (proyectar_meta, simular_finalizacion, fecha_tras_dias_habiles, fechas_habiles,
+                               planificar_escenarios, PERCENTILES, TRAYECTORIAS)
 
+# Meta de ID DUB únicos y fecha antes de la cual se quiere cumplir
+META_ID_DUB = 15157
+FECHA_LIMITE = date(2025, 4, 25)
 
-def crear_analisis_proyeccion(df):
+# Días sin jornada de registro además de fines de semana y festivos nacionales
+# (lunes a miércoles de Semana Santa de 2025)
+DIAS_NO_LABORABLES = (date(2025, 4, 14), date(2025, 4, 15), date(2025, 4, 16))
+
+MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+         "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
+
+
+def _fecha_en_texto(fecha):
+    return f"{fecha.day} de {MESES[fecha.month - 1]} de {fecha.year}"
+
+
+def pronostico_montecarlo(df, meta=META_ID_DUB):
+    """
+    Simulación de la fecha de finalización remuestreando los ID DUB únicos de cada día
+    (ver utils.proyeccion.simular_finalizacion), calculada una vez por versión de los datos.
+    
+    Returns:
+        dict: Resultado de simular_finalizacion
+    """
+    def calcular(datos):
+        faltantes = meta - ids_unicos(datos)
+        return simular_finalizacion(serie_diaria(datos)['ID DUB únicos'], faltantes)
+    
+    return agregado_por_version(df, ("pronostico_montecarlo", meta), calcular)
+
+# El pronóstico de la meta se calcula al publicar cada versión de los datos
+registrar_precalculo(pronostico_montecarlo, ["FECHA", "ID DUB"])
+
+def _texto_fecha_percentil(dias, hoy):
+    if dias == float("inf"):
+        return "Más de 10 años"
+    return fecha_tras_dias_habiles(hoy, int(dias), DIAS_NO_LABORABLES).strftime("%d de %B, %Y")
+
+def crear_grafico_abanico(pronostico, total_registros, meta, hoy):
+    """
+    Muestra el acumulado proyectado de ID DUB únicos con las bandas P10-P90 y la mediana.
     """
-    Crea un análisis de proyección para estimar cuándo se alcanzará la meta de 24,000 registros DUB.
-    Excluye fines de semana y días feriados específicos.
+    bandas = pronostico["bandas"]
+    if bandas.empty:
+        return
+    p_bajo, p_medio, p_alto = PERCENTILES
+    
+    # Hasta el día en que incluso el percentil bajo alcanza la meta
+    faltantes = meta - total_registros
+    alcanzada = (bandas[p_bajo] >= faltantes).to_numpy()
+    if alcanzada.any():
+        bandas = bandas.iloc[:alcanzada.argmax() + 1]
+    fechas = fechas_habiles(hoy, len(bandas), DIAS_NO_LABORABLES)
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=fechas, y=total_registros + bandas[p_alto], mode='lines',
+                             line=dict(width=0), showlegend=False, hoverinfo='skip'))
+    fig.add_trace(go.Scatter(x=fechas, y=total_registros + bandas[p_bajo], mode='lines',
+                             line=dict(width=0), fill='tonexty', fillcolor='rgba(31, 119, 180, 0.25)',
+                             name=f'P{p_bajo}-P{p_alto}'))
+    fig.add_trace(go.Scatter(x=fechas, y=total_registros + bandas[p_medio], mode='lines',
+                             line=dict(color='#1f77b4', dash='dash'), name=f'P{p_medio}'))
+    fig.add_hline(y=meta, line_dash="dot", line_color="red", annotation_text=f"Meta: {meta:,}")
+    fig.update_layout(
+        title='Acumulado proyectado de ID DUB únicos',
+        xaxis_title='Fecha',
+        yaxis_title='ID DUB únicos',
+        legend_title='',
+        hovermode='x unified'
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+def mostrar_planificador(total_registros, promedio_diario, meta=META_ID_DUB):
+    """
+    Muestra el ritmo diario necesario para una cuadrícula de metas y fechas límite.
+    
+    Args:
+        total_registros: ID DUB únicos registrados
+        promedio_diario: Promedio actual de registros por día
+        meta: Meta de referencia para la cuadrícula
+    """
+    with st.expander("Planificador de escenarios (metas y fechas límite)"):
+        hoy = date.today()
+        col_metas, col_fechas = st.columns(2)
+        with col_metas:
+            meta_minima = st.number_input("Meta mínima", min_value=1, value=int(meta), step=500,
+                                          key="planificador_meta_minima")
+            meta_maxima = st.number_input("Meta máxima", min_value=1, value=int(meta * 1.5), step=500,
+                                          key="planificador_meta_maxima")
+            cantidad_metas = st.slider("Número de metas", 2, 20, 6, key="planificador_cantidad_metas")
+        with col_fechas:
+            primera_fecha = st.date_input("Primera fecha límite", value=hoy + timedelta(days=30),
+                                          key="planificador_primera_fecha")
+            ultima_fecha = st.date_input("Última fecha límite", value=hoy + timedelta(days=365),
+                                         key="planificador_ultima_fecha")
+            cantidad_fechas = st.slider("Número de fechas límite", 2, 24, 12, key="planificador_cantidad_fechas")
+        
+        metas = np.unique(np.linspace(min(meta_minima, meta_maxima), max(meta_minima, meta_maxima),
+                                      cantidad_metas).round())
+        fechas = sorted({d.date() for d in pd.date_range(min(primera_fecha, ultima_fecha),
+                                                         max(primera_fecha, ultima_fecha),
+                                                         periods=cantidad_fechas)})
+        
+        # Todas las combinaciones se calculan en una sola pasada vectorizada
+        tabla, dias = planificar_escenarios(total_registros, metas, fechas, hoy, DIAS_NO_LABORABLES)
+        tabla.columns = [f.strftime("%d/%m/%Y") for f in tabla.columns]
+        
+        st.caption(f"Registros diarios necesarios por día laborable. Ritmo actual: {promedio_diario:.1f} registros/día.")
+        st.dataframe(
+            tabla.style.background_gradient(cmap='RdYlGn_r', axis=None).format("{:.1f}", na_rep="—"),
+            use_container_width=True
+        )
+        st.caption("Días laborables hasta cada fecha: " +
+                   ", ".join(f"{f.strftime('%d/%m/%Y')}: {d}" for f, d in dias.items()))
+
+def crear_analisis_proyeccion(df, meta=META_ID_DUB, fecha_limite=FECHA_LIMITE):
+    """
+    Crea un análisis de proyección para estimar cuándo se alcanzará la meta de ID DUB únicos.
+    Cuenta solo días hábiles: excluye fines de semana, festivos de Colombia y DIAS_NO_LABORABLES.
     
     Args:
         df: DataFrame con los datos
+        meta: Número de ID DUB únicos a alcanzar
+        fecha_limite: Fecha antes de la cual se quiere cumplir la meta
     """
     st.markdown("### Análisis de Proyección")
     
@@ -23,44 +145,31 @@ def crear_analisis_proyeccion(df):
         return
     
     try:
-        # Convertir fechas a datetime
-        df['FECHA_DT'] = pd.to_datetime(df['FECHA'], errors='coerce')
-        
-        # Contar registros únicos por fecha
-        registros_por_dia = df.groupby('FECHA_DT')['ID DUB'].nunique().reset_index()
+        # ID DUB únicos por fecha (serie diaria calculada una vez por versión de los datos)
+        registros_por_dia = serie_diaria(df)[['Fecha', 'ID DUB únicos']]
         registros_por_dia.columns = ['Fecha', 'Registros']
         
         # Calcular estadísticas
-        total_registros = df['ID DUB'].nunique()
-        meta = 15157  # Meta de ID DUB únicos
-        registros_faltantes = meta - total_registros
+        total_registros = ids_unicos(df)
         promedio_diario = registros_por_dia['Registros'].mean()
         
-        # Calcular días necesarios (sin contar fines de semana y feriados)
-        dias_laborables_necesarios = int(registros_faltantes / promedio_diario) + 1
+        # Proyección en días hábiles (sin fines de semana, festivos ni días no laborables)
+        proyeccion = proyectar_meta(total_registros, meta, promedio_diario, date.today(),
+                                    fecha_limite, DIAS_NO_LABORABLES)
+        registros_faltantes = proyeccion["faltantes"]
+        if proyeccion["fecha_estimada"] is None:
+            st.warning("No hay registros diarios suficientes para proyectar la fecha de finalización")
+            return
         
-        # Definir días feriados específicos
-        feriados = [
-            pd.Timestamp('2025-03-24'),  # 24 de marzo
-            pd.Timestamp('2025-04-14'),  # Lunes Santo
-            pd.Timestamp('2025-04-15'),  # Martes Santo
-            pd.Timestamp('2025-04-16'),  # Miércoles Santo
-            pd.Timestamp('2025-04-17'),  # Jueves Santo
-            pd.Timestamp('2025-04-18'),  # Viernes Santo
-        ]
-        
-        # Calcular fecha de finalización excluyendo fines de semana y feriados
-        fecha_actual = datetime.now()
-        dias_agregados = 0
-        dias_calendario = 0
-        
-        while dias_agregados < dias_laborables_necesarios:
-            fecha_actual += timedelta(days=1)
-            dias_calendario += 1
-            
-            # Verificar si es día hábil (no fin de semana ni feriado)
-            if fecha_actual.weekday() < 5 and fecha_actual.date() not in [f.date() for f in feriados]:
-                dias_agregados += 1
+        # Método de proyección: promedio diario o simulación Monte Carlo con bandas de confianza
+        modo = st.radio(
+            "Método de proyección",
+            ["Promedio diario", "Monte Carlo (P10/P50/P90)"],
+            horizontal=True,
+            key="modo_proyeccion"
+        )
+        montecarlo = modo != "Promedio diario"
+        pronostico = pronostico_montecarlo(df, meta) if montecarlo else None
         
         # Mostrar resultados
         col1, col2 = st.columns(2)
@@ -99,50 +208,51 @@ def crear_analisis_proyeccion(df):
             
             # Mostrar el gráfico
             st.plotly_chart(fig, use_container_width=True)
+            
+            if montecarlo:
+                crear_grafico_abanico(pronostico, total_registros, meta, date.today())
         
         with col2:
             st.subheader("Proyección")
-            st.metric(
-                "Días laborables necesarios", 
-                f"{dias_laborables_necesarios}", 
-                f"{dias_calendario} días calendario"
-            )
-            
-            # Formatear fecha
-            fecha_estimada = fecha_actual.strftime("%d de %B, %Y")
-            st.metric("Fecha estimada de finalización", fecha_estimada)
-            
-            # Reemplazar la sección "Para terminar un mes antes" con "Para terminar antes del 25 de abril"
-            # Corregido: Convertir ambos a datetime para la resta
-            fecha_limite = pd.Timestamp('2025-04-25')
-            fecha_actual_timestamp = pd.Timestamp(datetime.now())
-            dias_hasta_limite = (fecha_limite - fecha_actual_timestamp).days
-            
-            dias_laborables_hasta_limite = 0
-            fecha_contador = fecha_actual_timestamp
-            
-            # Contar días laborables hasta la fecha límite
-            for _ in range(dias_hasta_limite):
-                fecha_contador += pd.Timedelta(days=1)
-                # Verificar si es día hábil (no fin de semana ni feriado)
-                if fecha_contador.weekday() < 5 and fecha_contador.date() not in [f.date() for f in feriados]:
-                    dias_laborables_hasta_limite += 1
+            if montecarlo:
+                # Fechas en que termina el 10%, el 50% y el 90% de las trayectorias simuladas
+                for percentil, dias in pronostico["dias"].items():
+                    st.metric(
+                        f"Fecha de finalización P{percentil}",
+                        _texto_fecha_percentil(dias, date.today()),
+                        f"{dias:.0f} días laborables" if dias != float("inf") else None
+                    )
+            else:
+                st.metric(
+                    "Días laborables necesarios", 
+                    f"{proyeccion['dias_habiles_necesarios']}", 
+                    f"{proyeccion['dias_calendario']} días calendario"
+                )
+                
+                # Formatear fecha
+                fecha_estimada = proyeccion["fecha_estimada"].strftime("%d de %B, %Y")
+                st.metric("Fecha estimada de finalización", fecha_estimada)
             
-            # Calcular registros diarios necesarios para cumplir la meta antes de la fecha límite
-            registros_diarios_meta = registros_faltantes / dias_laborables_hasta_limite if dias_laborables_hasta_limite > 0 else 0
+            # Registros diarios necesarios para cumplir la meta antes de la fecha límite
+            registros_diarios_meta = proyeccion["registros_diarios_meta"]
             
             # Recomendación
-            st.subheader("Para terminar antes del 25 de abril")
+            st.subheader(f"Para terminar antes del {fecha_limite.day} de {MESES[fecha_limite.month - 1]}")
             st.metric(
                 "Registros diarios necesarios", 
                 f"{registros_diarios_meta:.1f}", 
                 f"{registros_diarios_meta - promedio_diario:.1f} más que el promedio actual"
             )
-            st.info(f"Para completar la meta antes del 25 de abril de 2025 (fecha límite), necesitas registrar aproximadamente {int(registros_diarios_meta)} IDs DUB por día laborable.")
+            st.info(f"Para completar la meta antes del {_fecha_en_texto(fecha_limite)} (fecha límite), necesitas registrar aproximadamente {int(registros_diarios_meta)} IDs DUB por día laborable.")
+        
+        # Comparar varias metas y fechas límite a la vez
+        mostrar_planificador(total_registros, promedio_diario, meta)
         
         # Agregar información adicional
         st.markdown("---")
-        st.caption("Nota: Esta proyección excluye fines de semana y días feriados específicos (24 de marzo y Semana Santa del 14 al 18 de abril).")
+        st.caption("Nota: Esta proyección excluye fines de semana, festivos nacionales de Colombia y los días sin jornada de registro (Semana Santa del 14 al 16 de abril de 2025).")
+        if montecarlo:
+            st.caption(f"La simulación Monte Carlo repite {TRAYECTORIAS:,} veces el avance hacia la meta tomando al azar los ID DUB únicos de días ya registrados.")
         
     except Exception as e:
         st.error(f"Error al generar la proyección: {e}")
@@ -157,28 +267,36 @@ def mostrar_pagina_infordub():
     """
     st.header("Información DUB")
     
-    # Verificar si hay datos cargados en la sesión
-    if 'df' in st.session_state:
-        df = st.session_state.df
-        st.success(f"Usando datos cargados. Total de filas: {len(df)}")
-    else:
-        # Si no hay datos cargados, intentar cargarlos
-        with st.spinner("Cargando datos desde Google Sheets..."):
-            try:
-                # Cargar los datos desde la hoja "DUB"
-                sheet_id = "19aYe071W4ktFUHOswLf9oB3nj2hcOvklavxdR8Ohv40"
-                df = load_data(sheet_id, "DUB")
+    # Cargar el conjunto DUB y, en paralelo, COMEDORES para la pestaña del mapa
+    with st.spinner("Cargando datos desde Google Sheets..."):
+        try:
+            barra = None
+            progreso = {}
+            if not dataset_listo("DUB"):
+                # Barra de avance para la primera descarga (las hojas grandes se leen por bloques)
+                barra = st.progress(0.0)
+                
+                def mostrar_avance(filas_leidas, filas_totales):
+                    barra.progress(min(filas_leidas / filas_totales, 1.0),
+                                   text=f"Descargando DUB: {filas_leidas:,} de {filas_totales:,} filas")
                 
-                if df is not None and not df.empty:
-                    # Guardar en session_state para compartirlo entre pestañas
-                    st.session_state.df = df
-                    st.success(f"Datos cargados correctamente. Total de filas: {len(df)}")
-                else:
-                    st.error("No se pudieron cargar los datos.")
-                    return None
-            except Exception as e:
-                st.error(f"Error en la aplicación: {e}")
-                return None
+                progreso["DUB"] = mostrar_avance
+            
+            df = cargar_datasets(["DUB", "COMEDORES"], progreso)["DUB"]
+            if barra is not None:
+                barra.empty()
+        except Exception as e:
+            st.error(f"Error en la aplicación: {e}")
+            return None
+    
+    if df is None or df.empty:
+        st.error("No se pudieron cargar los datos.")
+        return None
+    st.success(f"Datos cargados correctamente. Total de filas: {len(df)}")
+    df = aplicar_filtros_globales(df)
+    if df.empty:
+        st.info("Ningún registro cumple los filtros globales seleccionados.")
+        return None
     
     # 1. PROGRESO GENERAL DUB
     st.markdown("### Progreso General")
@@ -0,0 +1,620 @@
+"""
+Conteos precalculados de las columnas categóricas de cada versión de los datos.
+
+El cubo de una versión guarda el conteo de valores de todas sus columnas
+categóricas, calculado con np.bincount sobre los códigos de categoría. Los
+gráficos piden sus conteos con conteo_valores(), que lee el cubo cuando recibe
+la versión publicada completa y solo cuenta directamente si los datos están
+filtrados o la columna fue modificada.
+
+Para los filtros cruzados entre gráficos, cada columna categórica tiene además un
+índice de mapas de bits (un bit por fila para cada categoría). Filtrar es un AND
+entre mapas de bits y contar es sumar los bits encendidos, sin recorrer la tabla
+(ver conteo_filtrado y contar_filas).
+
+Los agregados que no son conteos de una columna (la serie diaria de registros,
+los ID DUB únicos, las tablas cruzadas) también se calculan una vez por versión con
+agregado_por_version.
+
+Cuando una versión solo agrega filas al final de la anterior (la descarga incremental
+deja en df.attrs["anterior"] la versión y el número de filas previos), el cubo y los
+agregados que lo admiten se actualizan sumando únicamente las filas nuevas.
+
+Los agregados registrados con registrar_precalculo se calculan para cada versión nueva
+antes de publicarla (ver precalcular), así que la primera sesión que la recibe ya los
+encuentra guardados.
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Versiones publicadas de los datos cuyos agregados se mantienen en memoria
+VERSIONES_EN_MEMORIA = 8
+
+# Subconjuntos de los filtros globales cuyos agregados se mantienen en memoria (su
+# versión es una tupla (versión publicada, estado de los filtros))
+SUBCONJUNTOS_EN_MEMORIA = 16
+
+_cubos = {}
+_cubos_lock = threading.Lock()
+
+# Índices de mapas de bits por versión: {versión: {columna: (códigos, mapas de bits)}}
+_indices = {}
+
+# Otros agregados por versión: {versión: {nombre: resultado}}
+_derivados = {}
+
+logger = logging.getLogger(__name__)
+
+# Agregados que se calculan al publicar cada versión: [(nombre, columnas requeridas, función)]
+_precalculos = []
+
+# Última falla de cada agregado precalculado: {nombre: {"momento": hora local, "mensaje": texto}}.
+# Se borra cuando el agregado vuelve a calcularse sin error.
+_errores_precalculo = {}
+
+# Formato de FECHA en la hoja (si llega sin convertir)
+FORMATO_FECHA = "%d/%m/%Y"
+
+
+def _codigos(serie):
+    """
+    Devuelve los códigos de categoría de una serie categórica (vista, sin copiar).
+    """
+    return serie.array.codes
+
+
+def _mismos_datos(a, b):
+    """
+    Indica si dos arreglos de códigos son el mismo bloque de memoria.
+    """
+    return (a.shape == b.shape
+            and a.__array_interface__["data"][0] == b.__array_interface__["data"][0])
+
+
+def _ordenar(conteos, categorias, columna):
+    """
+    Construye la serie de conteo como value_counts: de mayor a menor y sin ceros.
+    """
+    serie = pd.Series(conteos, index=categorias.rename(columna), name="count")
+    serie = serie[serie > 0]
+    return serie.iloc[np.argsort(-serie.to_numpy(), kind="stable")]
+
+
+def _contar_codigos(codigos, categorias):
+    """
+    Cuenta cada código de categoría con np.bincount; el código -1 (vacío) se descarta.
+    """
+    return np.bincount(codigos.astype(np.intp) + 1, minlength=len(categorias) + 1)[1:]
+
+
+def construir_cubo(df, previo=None, filas_anteriores=0):
+    """
+    Cuenta los valores de todas las columnas categóricas.
+
+    Cada columna se recorre una sola vez, sobre sus códigos enteros de categoría
+    en lugar de sus textos. Con el cubo de la versión anterior solo se cuentan las
+    filas desde filas_anteriores y se suman a los conteos previos (por valor, porque
+    al agregar filas las categorías pueden cambiar de código).
+
+    Args:
+        df: DataFrame tipado (ver aplicar_esquema)
+        previo: Cubo opcional de las primeras filas_anteriores filas de df
+        filas_anteriores: Número de filas ya contadas en previo
+
+    Returns:
+        dict: {columna: (códigos de la columna, serie de conteo)}
+    """
+    nombres = list(df.columns)
+    cubo = {}
+    for i, columna in enumerate(nombres):
+        serie = df.iloc[:, i]
+        if not isinstance(serie.dtype, pd.CategoricalDtype) or nombres.count(columna) > 1:
+            continue
+        codigos = _codigos(serie)
+        categorias = serie.cat.categories
+        if previo is not None and columna in previo:
+            conteos = (_contar_codigos(codigos[filas_anteriores:], categorias)
+                       + previo[columna][1].reindex(categorias, fill_value=0).to_numpy())
+        else:
+            conteos = _contar_codigos(codigos, categorias)
+        cubo[columna] = (codigos, _ordenar(conteos, categorias, columna))
+    return cubo
+
+
+def _cubo_de(df):
+    """
+    Devuelve el cubo de la versión de df, construyéndolo la primera vez.
+
+    Solo se construye a partir de la versión completa (no de un subconjunto filtrado).
+    """
+    version = df.attrs.get("version")
+    if version is None:
+        return None
+
+    with _cubos_lock:
+        cubo = _cubos.get(version)
+    if cubo is not None:
+        return cubo
+
+    if len(df) != df.attrs.get("filas"):
+        return None
+    previo, filas_anteriores = _version_anterior(df, _cubos)
+    cubo = construir_cubo(df, previo, filas_anteriores)
+    with _cubos_lock:
+        cubo = _cubos.setdefault(version, cubo)
+        _descartar_versiones_antiguas(_cubos)
+    return cubo
+
+
+def _version_anterior(df, por_version):
+    """
+    Busca el resultado guardado de la versión de la que df solo agrega filas al final.
+
+    Returns:
+        tuple: (resultado anterior o None, número de filas que ya incluye)
+    """
+    anterior = df.attrs.get("anterior")
+    if anterior is None:
+        return None, 0
+    version_anterior, filas_anteriores = anterior
+    with _cubos_lock:
+        previo = por_version.get(version_anterior)
+    if previo is None or filas_anteriores > len(df):
+        return None, 0
+    return previo, filas_anteriores
+
+
+def _descartar_versiones_antiguas(por_version):
+    """
+    Descarta los agregados más antiguos (llamar con el lock tomado).
+
+    Las versiones publicadas y los subconjuntos filtrados se acotan por separado, para
+    que muchas selecciones de filtros no desplacen a la versión publicada vigente (ni
+    corten la cadena de actualizaciones incrementales): se conservan las
+    VERSIONES_EN_MEMORIA versiones publicadas más nuevas y los SUBCONJUNTOS_EN_MEMORIA
+    subconjuntos guardados más recientemente.
+    """
+    subconjuntos = [version for version in por_version if isinstance(version, tuple)]
+    for version in subconjuntos[:max(0, len(subconjuntos) - SUBCONJUNTOS_EN_MEMORIA)]:
+        del por_version[version]
+    publicadas = sorted(version for version in por_version if not isinstance(version, tuple))
+    for version in publicadas[:max(0, len(publicadas) - VERSIONES_EN_MEMORIA)]:
+        del por_version[version]
+
+
+def conteo_valores(df, columna):
+    """
+    Cuenta los valores de una columna, de mayor a menor y sin categorías vacías.
+
+    Equivale a df[columna].value_counts() sin las categorías con conteo cero, pero
+    sobre la versión publicada de los datos lee el resultado del cubo sin recorrer
+    la tabla.
+
+    Args:
+        df: DataFrame con los datos (completo o filtrado)
+        columna: Nombre de la columna
+
+    Returns:
+        Serie con el conteo por valor
+    """
+    serie = df[columna]
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        conteo = serie.value_counts()
+        return conteo[conteo > 0]
+
+    codigos = _codigos(serie)
+    cubo = _cubo_de(df)
+    if cubo is not None and columna in cubo and _mismos_datos(cubo[columna][0], codigos):
+        return cubo[columna][1]
+
+    # Datos filtrados o columna reemplazada: contar solo esta columna
+    categorias = serie.cat.categories
+    return _ordenar(_contar_codigos(codigos, categorias), categorias, columna)
+
+
+def _mapas_de_bits(df, columna):
+    """
+    Devuelve los mapas de bits de una columna categórica de la versión completa.
+
+    El resultado es una matriz de categorías x (filas / 64) palabras de 64 bits: el bit i
+    de la fila k indica si la fila i tiene la categoría k. Se construye una vez por
+    versión y columna.
+
+    Returns:
+        numpy.ndarray o None si df no es una versión completa o la columna no es categórica
+    """
+    version = df.attrs.get("version")
+    if version is None or len(df) != df.attrs.get("filas"):
+        return None
+    serie = df[columna]
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return None
+
+    codigos = _codigos(serie)
+    with _cubos_lock:
+        guardado = _indices.get(version, {}).get(columna)
+    if guardado is not None and _mismos_datos(guardado[0], codigos):
+        return guardado[1]
+
+    categorias = np.arange(len(serie.cat.categories))
+    bits = codigos[np.newaxis, :] == categorias[:, np.newaxis]
+    # Completar con ceros hasta un múltiplo de 64 filas para verlo como palabras de 64 bits
+    relleno = -len(codigos) % 64
+    if relleno:
+        bits = np.pad(bits, ((0, 0), (0, relleno)))
+    mapas = np.packbits(bits, axis=1).view(np.uint64)
+    with _cubos_lock:
+        _indices.setdefault(version, {})[columna] = (codigos, mapas)
+        _descartar_versiones_antiguas(_indices)
+    return mapas
+
+
+def indexar_columnas(df, columnas):
+    """
+    Construye los mapas de bits de varias columnas de la versión completa (las que no
+    existen o no son categóricas se omiten), para tenerlos listos antes del primer filtro.
+    """
+    for columna in columnas:
+        if columna in df.columns:
+            _mapas_de_bits(df, columna)
+
+
+def _lista_valores(valores):
+    if isinstance(valores, (list, tuple, set)):
+        return list(valores)
+    return [valores]
+
+
+def _mascara_bits(df, filtros):
+    """
+    Combina los filtros {columna: valor o lista de valores} en un solo mapa de bits.
+
+    Dentro de una columna los valores se unen (OR) y entre columnas se intersecan (AND).
+
+    Returns:
+        numpy.ndarray de palabras de 64 bits o None si algún filtro no tiene índice
+    """
+    mascara = None
+    for columna, valores in filtros.items():
+        mapas = _mapas_de_bits(df, columna)
+        if mapas is None:
+            return None
+        posiciones = df[columna].cat.categories.get_indexer(_lista_valores(valores))
+        posiciones = posiciones[posiciones >= 0]
+        if len(posiciones):
+            union = np.bitwise_or.reduce(mapas[posiciones], axis=0)
+        else:
+            union = np.zeros(mapas.shape[1], dtype=np.uint64)
+        mascara = union if mascara is None else mascara & union
+    return mascara
+
+
+def _contar_bits(palabras):
+    """
+    Cuenta los bits encendidos de cada fila de una matriz de palabras de 64 bits
+    (suma de bits en paralelo dentro de cada palabra, sin recorrer bit a bit).
+    """
+    x = palabras - ((palabras >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    x = (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+    return x.sum(axis=-1, dtype=np.int64)
+
+
+def _mascara_filas(df, filtros):
+    """
+    Máscara booleana de filas equivalente a los filtros (para datos sin índice).
+    """
+    mascara = np.ones(len(df), dtype=bool)
+    for columna, valores in filtros.items():
+        mascara &= df[columna].isin(_lista_valores(valores)).to_numpy()
+    return mascara
+
+
+def conteo_filtrado(df, columna, filtros=None):
+    """
+    Cuenta los valores de una columna entre las filas que cumplen los filtros.
+
+    Sobre la versión completa de los datos se usan los mapas de bits: un AND con la
+    máscara de los filtros y una suma de bits por categoría, sin recorrer la tabla.
+
+    Args:
+        df: DataFrame con los datos
+        columna: Nombre de la columna a contar
+        filtros: Diccionario opcional {columna: valor o lista de valores}
+
+    Returns:
+        Serie con el conteo por valor, de mayor a menor y sin ceros
+    """
+    if not filtros:
+        return conteo_valores(df, columna)
+
+    mascara = _mascara_bits(df, filtros)
+    mapas = _mapas_de_bits(df, columna) if mascara is not None else None
+    if mapas is None:
+        return conteo_valores(df[_mascara_filas(df, filtros)], columna)
+
+    categorias = df[columna].cat.categories
+    conteos = _contar_bits(mapas & mascara)
+    return _ordenar(conteos, categorias, columna)
+
+
+def contar_filas(df, filtros=None):
+    """
+    Cuenta las filas que cumplen los filtros {columna: valor o lista de valores}.
+    """
+    if not filtros:
+        return len(df)
+    mascara = _mascara_bits(df, filtros)
+    if mascara is None:
+        return int(_mascara_filas(df, filtros).sum())
+    return int(_contar_bits(mascara))
+
+
+def mascara_filtros(df, filtros):
+    """
+    Máscara booleana de las filas que cumplen los filtros {columna: valor o lista de valores}.
+
+    Las columnas categóricas se resuelven con los mapas de bits; las demás con isin.
+
+    Returns:
+        numpy.ndarray de booleanos con una posición por fila
+    """
+    categoricos = {c: v for c, v in filtros.items() if isinstance(df[c].dtype, pd.CategoricalDtype)}
+    otros = {c: v for c, v in filtros.items() if c not in categoricos}
+
+    mascara = np.ones(len(df), dtype=bool)
+    if categoricos:
+        bits = _mascara_bits(df, categoricos)
+        if bits is None:
+            otros = filtros
+        else:
+            mascara = np.unpackbits(bits.view(np.uint8))[:len(df)].astype(bool)
+    if otros:
+        mascara &= _mascara_filas(df, otros)
+    return mascara
+
+
+def agregado_por_version(df, nombre, calcular, actualizar=None):
+    """
+    Devuelve calcular(df), calculado una sola vez por versión de los datos.
+
+    Si df no tiene versión (o no es la versión completa que indica attrs["filas"])
+    el resultado se calcula sin guardarlo. Si df solo agrega filas a una versión
+    cuyo agregado ya está guardado, se usa actualizar con las filas nuevas.
+
+    Args:
+        df: DataFrame con los datos
+        nombre: Nombre del agregado dentro de la versión
+        calcular: Función que recibe df y devuelve el agregado
+        actualizar: Función opcional (agregado anterior, filas nuevas) -> agregado.
+                    No debe modificar el agregado anterior, que sigue en uso.
+
+    Returns:
+        El agregado calculado o guardado
+    """
+    version = df.attrs.get("version")
+    if version is None or len(df) != df.attrs.get("filas"):
+        return calcular(df)
+
+    with _cubos_lock:
+        guardados = _derivados.get(version, {})
+        if nombre in guardados:
+            return guardados[nombre]
+
+    resultado = None
+    if actualizar is not None:
+        previos, filas_anteriores = _version_anterior(df, _derivados)
+        if previos is not None and nombre in previos:
+            resultado = actualizar(previos[nombre], df.iloc[filas_anteriores:])
+    if resultado is None:
+        resultado = calcular(df)
+    with _cubos_lock:
+        resultado = _derivados.setdefault(version, {}).setdefault(nombre, resultado)
+        _descartar_versiones_antiguas(_derivados)
+    return resultado
+
+
+def registrar_precalculo(funcion, columnas=(), nombre=None):
+    """
+    Registra un agregado por versión para calcularlo antes de publicar cada versión nueva.
+
+    Args:
+        funcion: Función que recibe el DataFrame de la versión y guarda su resultado
+                 (con agregado_por_version o las cachés por versión de este módulo)
+        columnas: Columnas que necesita; se omite en los datos que no las tienen
+        nombre: Nombre con que se informan sus fallas (por defecto el de la función)
+
+    Returns:
+        La misma función
+    """
+    with _cubos_lock:
+        _precalculos.append((nombre or funcion.__qualname__, tuple(columnas), funcion))
+    return funcion
+
+
+def precalcular(df):
+    """
+    Calcula los agregados registrados para una versión nueva de los datos.
+
+    Se llama antes de publicar la versión. Si la versión solo agrega filas a la
+    anterior, cada agregado se actualiza con las filas nuevas. Un agregado que falla se
+    registra con logging y en errores_precalculo y se omite: se calculará cuando una
+    página lo pida.
+
+    Args:
+        df: DataFrame de la versión completa (con attrs["version"])
+    """
+    with _cubos_lock:
+        precalculos = list(_precalculos)
+    for nombre, columnas, funcion in precalculos:
+        if not all(columna in df.columns for columna in columnas):
+            continue
+        try:
+            funcion(df)
+        except Exception as e:
+            logger.exception("Falló el precálculo del agregado %s", nombre)
+            with _cubos_lock:
+                _errores_precalculo[nombre] = {"momento": time.strftime("%Y-%m-%d %H:%M:%S"),
+                                               "mensaje": f"{type(e).__name__}: {e}"}
+        else:
+            with _cubos_lock:
+                _errores_precalculo.pop(nombre, None)
+
+
+def errores_precalculo():
+    """
+    Devuelve las últimas fallas vigentes del precálculo: {nombre: {"momento", "mensaje"}}.
+    """
+    with _cubos_lock:
+        return dict(_errores_precalculo)
+
+
+def _fechas(df):
+    """
+    Columna FECHA como fecha (ya viene convertida por el esquema de la hoja DUB).
+    """
+    fechas = df["FECHA"]
+    if not pd.api.types.is_datetime64_any_dtype(fechas):
+        fechas = pd.to_datetime(fechas.astype(str), format=FORMATO_FECHA, errors="coerce")
+    return fechas
+
+
+def _dias_e_ids(df):
+    """
+    Días (como enteros desde 1970) de las filas con FECHA válida y pares (día, ID DUB)
+    de las que además tienen ID DUB.
+    """
+    fechas = _fechas(df)
+    validas = fechas.notna().to_numpy()
+    dias = fechas.to_numpy()[validas].astype("datetime64[D]").astype(np.int64)
+    if "ID DUB" in df.columns:
+        ids = df["ID DUB"].to_numpy()[validas]
+    else:
+        ids = np.arange(len(df))[validas]
+    pares = pd.DataFrame({"dia": dias, "id": ids}).dropna().drop_duplicates()
+    return dias, pares
+
+
+def _serie_desde_estado(ids_por_dia, registros_por_dia):
+    dias = sorted(registros_por_dia)
+    return pd.DataFrame({
+        "Fecha": pd.to_datetime(np.array(dias, dtype="datetime64[D]")),
+        "Registros": np.array([registros_por_dia[dia] for dia in dias], dtype=np.int64),
+        "ID DUB únicos": np.array([len(ids_por_dia.get(dia, ())) for dia in dias], dtype=np.int64)
+    })
+
+
+def _contar_dias(dias):
+    registros = pd.Series(dias).value_counts()
+    return dict(zip(registros.index.tolist(), registros.tolist()))
+
+
+def _calcular_estado_diario(df):
+    dias, pares = _dias_e_ids(df)
+    ids_por_dia = {dia: set(ids) for dia, ids in pares.groupby("dia")["id"]}
+    registros_por_dia = _contar_dias(dias)
+    return {
+        "ids_por_dia": ids_por_dia,
+        "registros_por_dia": registros_por_dia,
+        "serie": _serie_desde_estado(ids_por_dia, registros_por_dia)
+    }
+
+
+def _actualizar_estado_diario(previo, nuevas):
+    dias, pares = _dias_e_ids(nuevas)
+    ids_por_dia = dict(previo["ids_por_dia"])
+    # Solo se copian los conjuntos de los días que reciben filas nuevas
+    for dia, ids in pares.groupby("dia")["id"]:
+        ids_por_dia[dia] = ids_por_dia.get(dia, set()) | set(ids)
+    registros_por_dia = dict(previo["registros_por_dia"])
+    for dia, cantidad in _contar_dias(dias).items():
+        registros_por_dia[dia] = registros_por_dia.get(dia, 0) + cantidad
+    return {
+        "ids_por_dia": ids_por_dia,
+        "registros_por_dia": registros_por_dia,
+        "serie": _serie_desde_estado(ids_por_dia, registros_por_dia)
+    }
+
+
+def serie_diaria(df):
+    """
+    Serie diaria de registros de la versión de los datos.
+
+    Args:
+        df: DataFrame con la columna FECHA (y opcionalmente ID DUB)
+
+    Returns:
+        DataFrame ordenado por fecha con las columnas Fecha, Registros (filas del día)
+        e "ID DUB únicos" (ID DUB distintos del día); las fechas vacías se descartan
+    """
+    estado = agregado_por_version(df, "serie_diaria", _calcular_estado_diario, _actualizar_estado_diario)
+    return estado["serie"]
+
+
+def _valores_distintos(serie):
+    return frozenset(serie.dropna().tolist())
+
+
+def ids_unicos(df):
+    """
+    Número de ID DUB distintos de la versión de los datos.
+    """
+    ids = agregado_por_version(
+        df, "ids_unicos",
+        lambda datos: _valores_distintos(datos["ID DUB"]),
+        lambda previo, nuevas: previo | _valores_distintos(nuevas["ID DUB"])
+    )
+    return len(ids)
+
+
+def _contar_pares(df, fila, columna):
+    conteo = df.groupby([fila, columna], dropna=False, observed=True).size()
+    return conteo.rename("Cantidad").reset_index()
+
+
+def tabla_cruzada(df, fila, columna):
+    """
+    Cuenta las filas de cada combinación de valores de dos columnas.
+
+    Args:
+        df: DataFrame con los datos
+        fila: Columna de la primera dimensión
+        columna: Columna de la segunda dimensión
+
+    Returns:
+        DataFrame en formato largo (fila, columna, Cantidad), incluidas las
+        combinaciones con valores vacíos y sin combinaciones de conteo cero
+    """
+    return agregado_por_version(
+        df, ("tabla_cruzada", fila, columna),
+        lambda datos: _contar_pares(datos, fila, columna),
+        lambda previo, nuevas: sumar_conteos([previo, _contar_pares(nuevas, fila, columna)],
+                                             [fila, columna], "Cantidad")
+    )
+
+
+def sumar_conteos(tablas, claves, valor):
+    """
+    Suma tablas de conteo en formato largo por sus columnas clave (sin descartar vacíos).
+
+    Args:
+        tablas: Lista de DataFrames con las columnas claves y valor
+        claves: Columnas que identifican cada grupo
+        valor: Columna con el conteo
+
+    Returns:
+        DataFrame con una fila por grupo y el conteo sumado
+    """
+    unidas = pd.concat(tablas, ignore_index=True)
+    return unidas.groupby(claves, dropna=False, observed=True, sort=True)[valor].sum().reset_index()
+
+
+# Agregados de este módulo que se calculan al publicar cada versión
+registrar_precalculo(_cubo_de)
+registrar_precalculo(serie_diaria, ["FECHA"])
+registrar_precalculo(ids_unicos, ["ID DUB"])
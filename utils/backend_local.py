@@ -0,0 +1,225 @@
+"""
+Backend local que imita a gspread a partir de archivos CSV o Parquet.
+
+Permite desarrollar y medir la carga de datos sin credenciales ni red. Se activa con
+DUB_BACKEND=local y lee los archivos de DUB_FIXTURES_DIR con esta estructura:
+
+    <DUB_FIXTURES_DIR>/<sheet_id>/<nombre de la pestaña>.csv   (o .parquet)
+
+Los CSV se leen sin encabezado especial: la primera fila es la fila 1 de la hoja.
+En los Parquet los nombres de columna se usan como fila de encabezados.
+
+Para simular condiciones reales:
+    DUB_LATENCIA_LOCAL: segundos de espera por cada petición (por defecto 0)
+    DUB_ERRORES_CUOTA: probabilidad de que una petición falle con error 429 (por defecto 0)
+"""
+import os
+import random
+import re
+import threading
+import time
+
+import pandas as pd
+from gspread.exceptions import APIError, SpreadsheetNotFound, WorksheetNotFound
+
+EXTENSIONES = (".csv", ".parquet")
+
+
+def backend_local_activo():
+    """
+    Indica si load_data debe usar los archivos locales en lugar de Google Sheets.
+    """
+    return os.getenv("DUB_BACKEND", "").lower() == "local"
+
+
+def crear_cliente_local():
+    """
+    Construye un cliente local con la configuración de las variables de entorno.
+    """
+    return ClienteLocal(
+        os.getenv("DUB_FIXTURES_DIR", "fixtures"),
+        latencia=float(os.getenv("DUB_LATENCIA_LOCAL", "0")),
+        prob_error_cuota=float(os.getenv("DUB_ERRORES_CUOTA", "0"))
+    )
+
+
+def guardar_fixture(directorio, sheet_id, sheet_name, filas):
+    """
+    Guarda las filas de una pestaña (encabezado incluido) como CSV del backend local.
+
+    Args:
+        directorio: Directorio raíz de los archivos locales
+        sheet_id: ID de la hoja de cálculo que se simula
+        sheet_name: Nombre de la pestaña
+        filas: Lista de listas de texto, como las devuelve worksheet.get_values()
+
+    Returns:
+        str: Ruta del archivo escrito
+    """
+    carpeta = os.path.join(directorio, sheet_id)
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = os.path.join(carpeta, f"{sheet_name}.csv")
+    pd.DataFrame(filas).to_csv(ruta, header=False, index=False)
+    return ruta
+
+
+def _letra_a_indice(letra):
+    indice = 0
+    for caracter in letra:
+        indice = indice * 26 + (ord(caracter) - ord('A') + 1)
+    return indice - 1
+
+
+class _RespuestaCuota:
+    """
+    Respuesta HTTP mínima para construir un APIError como el de la API real.
+    """
+    status_code = 429
+    text = "Quota exceeded for quota metric 'Read requests'"
+
+    def json(self):
+        return {"error": {"code": 429, "message": self.text, "status": "RESOURCE_EXHAUSTED"}}
+
+
+class ClienteLocal:
+    """
+    Sustituto de gspread.Client que abre hojas desde archivos locales.
+    """
+
+    def __init__(self, directorio, latencia=0.0, prob_error_cuota=0.0, semilla=None):
+        self.directorio = directorio
+        self.latencia = latencia
+        self.prob_error_cuota = prob_error_cuota
+        self.peticiones = 0
+        self._aleatorio = random.Random(semilla)
+        self._lock = threading.Lock()
+
+    def _peticion(self):
+        """
+        Simula el costo de una petición a la API: espera y, a veces, error de cuota.
+        """
+        with self._lock:
+            self.peticiones += 1
+            fallar = self._aleatorio.random() < self.prob_error_cuota
+        if self.latencia > 0:
+            time.sleep(self.latencia)
+        if fallar:
+            raise APIError(_RespuestaCuota())
+
+    def open_by_key(self, key):
+        self._peticion()
+        carpeta = os.path.join(self.directorio, key)
+        if not os.path.isdir(carpeta):
+            raise SpreadsheetNotFound(key)
+        return HojaLocal(self, key, carpeta)
+
+
+class HojaLocal:
+    """
+    Sustituto de gspread.Spreadsheet: cada archivo de la carpeta es una pestaña.
+    """
+
+    def __init__(self, cliente, sheet_id, carpeta):
+        self.cliente = cliente
+        self.id = sheet_id
+        self.carpeta = carpeta
+
+    def _archivos(self):
+        return sorted(f for f in os.listdir(self.carpeta) if f.endswith(EXTENSIONES))
+
+    def worksheets(self):
+        return [PestanaLocal(self.cliente, os.path.join(self.carpeta, f)) for f in self._archivos()]
+
+    def worksheet(self, title):
+        self.cliente._peticion()
+        for archivo in self._archivos():
+            if os.path.splitext(archivo)[0] == title:
+                return PestanaLocal(self.cliente, os.path.join(self.carpeta, archivo))
+        raise WorksheetNotFound(title)
+
+    def get_worksheet(self, index):
+        self.cliente._peticion()
+        archivos = self._archivos()
+        if not 0 <= index < len(archivos):
+            raise WorksheetNotFound(index)
+        return PestanaLocal(self.cliente, os.path.join(self.carpeta, archivos[index]))
+
+
+class PestanaLocal:
+    """
+    Sustituto de gspread.Worksheet con las lecturas que usa load_data.
+
+    Como la API, recorta las celdas vacías al final de cada fila y las filas vacías
+    al final de cada rango. El archivo se vuelve a leer si cambia en disco, así que
+    agregar filas al CSV simula respuestas nuevas del formulario.
+    """
+
+    # Filas vacías extra de la cuadrícula, como las que deja Google Forms
+    FILAS_EXTRA = 50
+
+    def __init__(self, cliente, ruta):
+        self.cliente = cliente
+        self.ruta = ruta
+        self.title = os.path.splitext(os.path.basename(ruta))[0]
+        self._filas = None
+        self._modificado = None
+
+    def _leer(self):
+        modificado = os.path.getmtime(self.ruta)
+        if self._filas is None or modificado != self._modificado:
+            if self.ruta.endswith(".parquet"):
+                df = pd.read_parquet(self.ruta)
+                encabezados = [str(c) for c in df.columns]
+                cuerpo = df.astype(object).where(df.notna(), "").astype(str).values.tolist()
+                self._filas = [encabezados] + cuerpo
+            else:
+                df = pd.read_csv(self.ruta, header=None, dtype=str, keep_default_na=False)
+                self._filas = df.values.tolist()
+            self._modificado = modificado
+        return self._filas
+
+    @staticmethod
+    def _recortar(filas):
+        resultado = []
+        for fila in filas:
+            fila = list(fila)
+            while fila and fila[-1] == '':
+                fila.pop()
+            resultado.append(fila)
+        while resultado and not resultado[-1]:
+            resultado.pop()
+        return resultado
+
+    @property
+    def row_count(self):
+        return len(self._leer()) + self.FILAS_EXTRA
+
+    @property
+    def col_count(self):
+        return max((len(f) for f in self._leer()), default=0)
+
+    def row_values(self, row):
+        self.cliente._peticion()
+        filas = self._leer()
+        return self._recortar([filas[row - 1]])[0] if row <= len(filas) else []
+
+    def get_values(self):
+        self.cliente._peticion()
+        filas = self._recortar(self._leer())
+        ancho = max((len(f) for f in filas), default=0)
+        return [f + [''] * (ancho - len(f)) for f in filas]
+
+    def batch_get(self, ranges):
+        self.cliente._peticion()
+        filas = self._leer()
+        resultado = []
+        for rango in ranges:
+            coincidencia = re.fullmatch(r"([A-Z]*)(\d+):([A-Z]*)(\d+)", rango)
+            if coincidencia is None:
+                raise ValueError(f"Rango no soportado por el backend local: {rango}")
+            col_inicio, fila_inicio, col_fin, fila_fin = coincidencia.groups()
+            bloque = filas[int(fila_inicio) - 1:int(fila_fin)]
+            if col_inicio:
+                bloque = [f[_letra_a_indice(col_inicio):_letra_a_indice(col_fin) + 1] for f in bloque]
+            resultado.append(self._recortar(bloque))
+        return resultado
@@ -0,0 +1,213 @@
+"""
+Intervalos de confianza por bootstrap para estimaciones de la encuesta.
+
+Cada encuestado se representa con un código entero por variable (su categoría de
+respuesta o, en la FIES, su patrón de respuestas). Una réplica remuestrea n
+encuestados con reemplazo y solo necesita cuántos encuestados remuestreados caen en
+cada código, así que:
+
+- Los índices de varias réplicas se sortean juntos en una matriz (réplicas x n) con
+  un solo llamado al generador, y los conteos de todas ellas salen de un np.bincount
+  con desplazamiento por réplica.
+- El estadístico de cada réplica recibe esos conteos (por ejemplo, las proporciones
+  de cada categoría o las prevalencias FIES reajustando el modelo de Rasch).
+- Las réplicas se reparten en un número fijo de tareas con semillas independientes
+  (np.random.SeedSequence.spawn) que se ejecutan en un grupo de procesos. El
+  resultado es el mismo con cualquier número de procesos.
+- El grupo de procesos solo se usa si hay más de un núcleo y trabajo suficiente para
+  compensar el envío de los códigos a cada proceso (ver procesos_a_usar).
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+REPLICAS = 1000
+NIVEL_CONFIANZA = 0.95
+
+# Tareas en que se dividen las réplicas (fijo para que el resultado no dependa de los procesos)
+TAREAS = 16
+
+# Índices sorteados por bloque (réplicas x encuestados), para acotar la memoria
+INDICES_POR_BLOQUE = 4_000_000
+
+# Procesos del grupo; con uno solo las réplicas se calculan en el proceso actual
+PROCESOS = os.cpu_count() or 1
+
+# Índices sorteados en total (réplicas x encuestados) desde los que conviene usar el
+# grupo de procesos: por debajo, el envío de las tareas cuesta más de lo que se reparte
+# (con 1000 réplicas, desde unos 20.000 encuestados)
+INDICES_MINIMOS_PROCESOS = 20_000_000
+
+_grupo = None
+_grupo_procesos = 0
+_grupo_lock = threading.Lock()
+
+
+def _obtener_grupo(procesos):
+    """
+    Devuelve el grupo de procesos compartido, creándolo (o recreándolo) si hace falta.
+
+    Los procesos se inician con "spawn": el servidor de Streamlit tiene varios hilos
+    y copiar el proceso con fork podría heredar bloqueos tomados.
+    """
+    global _grupo, _grupo_procesos
+    with _grupo_lock:
+        if _grupo is None or _grupo_procesos != procesos:
+            if _grupo is not None:
+                _grupo.shutdown(wait=False)
+            _grupo = ProcessPoolExecutor(max_workers=procesos,
+                                         mp_context=multiprocessing.get_context("spawn"))
+            _grupo_procesos = procesos
+        return _grupo
+
+
+def procesos_a_usar(procesos, replicas, filas):
+    """
+    Número de procesos con que se calculan las réplicas.
+
+    Nunca más que los núcleos disponibles, y uno solo (sin grupo de procesos) si el
+    trabajo total no llega a INDICES_MINIMOS_PROCESOS.
+
+    Args:
+        procesos: Procesos pedidos (None para PROCESOS)
+        replicas: Número de réplicas
+        filas: Número de encuestados
+    """
+    procesos = min(procesos or PROCESOS, os.cpu_count() or 1)
+    if replicas * filas < INDICES_MINIMOS_PROCESOS:
+        return 1
+    return max(procesos, 1)
+
+
+def codigos_categoria(serie):
+    """
+    Códigos enteros de una columna para el remuestreo.
+
+    Returns:
+        tuple: (códigos con el vacío en la última posición, etiquetas de las categorías)
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, etiquetas = serie.array.codes, serie.cat.categories
+    else:
+        codigos, etiquetas = pd.factorize(serie)
+    codigos = np.where(codigos < 0, len(etiquetas), codigos).astype(np.int32)
+    return codigos, list(etiquetas)
+
+
+def _replicas_tarea(codigos, tamanos, estadistico, replicas, semilla):
+    """
+    Calcula el estadístico en replicas remuestreos (se ejecuta en un proceso del grupo).
+    """
+    generador = np.random.default_rng(semilla)
+    n = len(codigos[0])
+    bloque = max(1, INDICES_POR_BLOQUE // n)
+    resultados = []
+    for inicio in range(0, replicas, bloque):
+        cantidad = min(bloque, replicas - inicio)
+        indices = generador.integers(0, n, size=(cantidad, n))
+        desplazamiento = np.arange(cantidad)[:, np.newaxis]
+        conteos = [
+            np.bincount((desplazamiento * k + c[indices]).ravel(), minlength=cantidad * k).reshape(cantidad, k)
+            for c, k in zip(codigos, tamanos)
+        ]
+        resultados.extend(estadistico([c[r] for c in conteos]) for r in range(cantidad))
+    return np.array(resultados, dtype=float)
+
+
+def bootstrap(codigos, tamanos, estadistico, replicas=REPLICAS, nivel=NIVEL_CONFIANZA,
+              semilla=0, procesos=None):
+    """
+    Intervalos de confianza percentil por bootstrap de remuestreo de encuestados.
+
+    Args:
+        codigos: Lista de arreglos de códigos enteros (uno por variable, misma longitud)
+        tamanos: Número de códigos posibles de cada variable
+        estadistico: Función de nivel de módulo (o functools.partial de una) que recibe
+                     la lista de conteos por código y devuelve un arreglo de estimaciones
+        replicas: Número de réplicas bootstrap
+        nivel: Nivel de confianza de los intervalos
+        semilla: Semilla del generador
+        procesos: Procesos del grupo (por defecto PROCESOS; ver procesos_a_usar)
+
+    Returns:
+        dict: "estimacion", "inferior" y "superior" (arreglos) y "replicas" (matriz
+              réplicas x estimaciones)
+    """
+    codigos = [np.asarray(c) for c in codigos]
+    procesos = procesos_a_usar(procesos, replicas, len(codigos[0]))
+    completos = [np.bincount(c, minlength=k) for c, k in zip(codigos, tamanos)]
+    estimacion = np.asarray(estadistico(completos), dtype=float)
+
+    tareas = min(TAREAS, replicas)
+    por_tarea = np.full(tareas, replicas // tareas)
+    por_tarea[:replicas % tareas] += 1
+    semillas = np.random.SeedSequence(semilla).spawn(tareas)
+    argumentos = [(codigos, tamanos, estadistico, int(r), s) for r, s in zip(por_tarea, semillas)]
+
+    if procesos == 1:
+        partes = [_replicas_tarea(*a) for a in argumentos]
+    else:
+        grupo = _obtener_grupo(procesos)
+        partes = list(grupo.map(_replicas_tarea, *zip(*argumentos)))
+    muestras = np.concatenate(partes).reshape(replicas, -1)
+
+    alfa = (1 - nivel) / 2
+    inferior, superior = np.nanpercentile(muestras, [100 * alfa, 100 * (1 - alfa)], axis=0)
+    return {"estimacion": estimacion, "inferior": inferior, "superior": superior, "replicas": muestras}
+
+
+def _proporciones(conteos, validas):
+    """
+    Proporción de cada categoría válida entre las respuestas válidas de su variable.
+    """
+    partes = []
+    for conteo, mascara in zip(conteos, validas):
+        seleccion = conteo[mascara]
+        total = seleccion.sum()
+        partes.append(seleccion / total if total else np.full(len(seleccion), np.nan))
+    return np.concatenate(partes)
+
+
+def intervalos_proporciones(df, columnas, replicas=REPLICAS, nivel=NIVEL_CONFIANZA, semilla=0, procesos=None,
+                            categorias=None):
+    """
+    Porcentaje de cada categoría de varias columnas con su intervalo de confianza.
+
+    Todas las columnas se remuestrean con los mismos encuestados en cada réplica. Los
+    porcentajes se calculan sobre las respuestas no vacías de cada columna o, si se
+    indican categorías, solo sobre las respuestas en esas categorías (el mismo
+    denominador que una tabla que muestra solo las categorías seleccionadas).
+
+    Args:
+        df: DataFrame con las columnas
+        columnas: {etiqueta: columna de df}
+        categorias: Conjunto opcional de categorías a incluir
+
+    Returns:
+        DataFrame con Variable, Categoría, Porcentaje, "IC inferior" e "IC superior" (en %)
+    """
+    incluidas = None if categorias is None else set(categorias)
+    codigos, tamanos, validas, filas = [], [], [], []
+    for etiqueta, columna in columnas.items():
+        c, categorias = codigos_categoria(df[columna])
+        mascara = np.array([bool(str(cat).strip()) and (incluidas is None or cat in incluidas)
+                            for cat in categorias] + [False])
+        codigos.append(c)
+        tamanos.append(len(categorias) + 1)
+        validas.append(mascara)
+        filas.extend((etiqueta, cat) for cat, valida in zip(categorias, mascara) if valida)
+    if not filas or len(df) == 0:
+        return pd.DataFrame(columns=["Variable", "Categoría", "Porcentaje", "IC inferior", "IC superior"])
+
+    resultado = bootstrap(codigos, tamanos, partial(_proporciones, validas=validas),
+                          replicas=replicas, nivel=nivel, semilla=semilla, procesos=procesos)
+    tabla = pd.DataFrame(filas, columns=["Variable", "Categoría"])
+    tabla["Porcentaje"] = resultado["estimacion"] * 100
+    tabla["IC inferior"] = resultado["inferior"] * 100
+    tabla["IC superior"] = resultado["superior"] * 100
+    return tabla
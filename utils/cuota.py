@@ -0,0 +1,115 @@
+"""
+Control de cuota para las lecturas de la API de Google Sheets.
+
+La API limita las lecturas por minuto (60 por usuario y 300 por proyecto por
+defecto). Un cubo de tokens compartido por el proceso reparte las peticiones de
+todas las sesiones dentro de ese límite, y los errores 429/5xx se reintentan con
+espera exponencial truncada y variación aleatoria, como recomienda Google.
+"""
+import os
+import random
+import threading
+import time
+
+from gspread.exceptions import APIError
+
+# Lecturas por minuto permitidas al proceso y ráfaga máxima sin esperar
+LECTURAS_POR_MINUTO = float(os.getenv("DUB_LECTURAS_POR_MINUTO", "60"))
+RAFAGA_LECTURAS = int(os.getenv("DUB_RAFAGA_LECTURAS", "10"))
+
+# Reintentos ante errores de cuota o del servidor y espera máxima entre ellos
+REINTENTOS_API = int(os.getenv("DUB_REINTENTOS_API", "5"))
+ESPERA_MAXIMA_SEGUNDOS = float(os.getenv("DUB_ESPERA_MAXIMA", "32"))
+
+# Códigos HTTP que se pueden reintentar
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class CuboDeTokens:
+    """
+    Limitador de tasa: cada petición consume un token y los tokens se reponen a
+    ritmo constante hasta la capacidad del cubo.
+    """
+
+    def __init__(self, por_minuto, capacidad):
+        self.tasa = por_minuto / 60.0
+        self.capacidad = max(1, capacidad)
+        self._tokens = float(self.capacidad)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reponer(self):
+        ahora = time.monotonic()
+        self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    def tomar(self):
+        """
+        Consume un token, esperando lo necesario si el cubo está vacío.
+
+        Returns:
+            float: Segundos que se esperó
+        """
+        if self.tasa <= 0:
+            return 0.0
+        esperado = 0.0
+        while True:
+            with self._lock:
+                self._reponer()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return esperado
+                espera = (1 - self._tokens) / self.tasa
+            time.sleep(espera)
+            esperado += espera
+
+
+_limitador = CuboDeTokens(LECTURAS_POR_MINUTO, RAFAGA_LECTURAS)
+_estadisticas = {"peticiones": 0, "reintentos": 0, "espera_cuota": 0.0}
+_estadisticas_lock = threading.Lock()
+
+
+def _codigo_http(error):
+    respuesta = getattr(error, "response", None)
+    return getattr(respuesta, "status_code", None)
+
+
+def llamar_api(funcion, *args, **kwargs):
+    """
+    Ejecuta una llamada a la API respetando la cuota y reintentando los errores transitorios.
+
+    Args:
+        funcion: Método de gspread a ejecutar (por ejemplo worksheet.batch_get)
+        *args, **kwargs: Argumentos de la llamada
+
+    Returns:
+        El resultado de la llamada
+
+    Raises:
+        APIError: Si el error no es reintentable o se agotaron los reintentos
+    """
+    intento = 0
+    while True:
+        esperado = _limitador.tomar()
+        with _estadisticas_lock:
+            _estadisticas["peticiones"] += 1
+            _estadisticas["espera_cuota"] += esperado
+        try:
+            return funcion(*args, **kwargs)
+        except APIError as e:
+            if _codigo_http(e) not in CODIGOS_REINTENTABLES or intento >= REINTENTOS_API:
+                raise
+            # Espera exponencial truncada con variación aleatoria de hasta 1 segundo
+            espera = min(ESPERA_MAXIMA_SEGUNDOS, 2 ** intento + random.random())
+            intento += 1
+            with _estadisticas_lock:
+                _estadisticas["reintentos"] += 1
+            time.sleep(espera)
+
+
+def estadisticas_api():
+    """
+    Devuelve el número de peticiones, reintentos y segundos de espera por cuota del proceso.
+    """
+    with _estadisticas_lock:
+        return dict(_estadisticas)
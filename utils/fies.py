@@ -0,0 +1,474 @@
+"""
+Modelo de Rasch de la Escala de Experiencia de Inseguridad Alimentaria (FIES).
+
+Las ocho preguntas sí/no se ajustan con el modelo de Rasch de un parámetro por
+máxima verosimilitud condicional (CML), como en el protocolo de la FAO:
+
+- Los parámetros de los ítems solo dependen de dos estadísticas suficientes que se
+  acumulan sobre las respuestas: cuántas personas tienen cada puntaje bruto y cuántas
+  de ellas respondieron "sí" a cada ítem. Reunirlas es una pasada vectorizada sobre
+  las respuestas y son aditivas, así que con filas nuevas solo se suman las de esas
+  filas (ver utils.agregados.agregado_por_version).
+- El ajuste trabaja sobre esas tablas de (ítems + 1) x ítems, así que su costo no
+  depende del número de encuestados.
+
+Con las severidades de los ítems se estiman la severidad de cada puntaje bruto, su
+error estándar, la probabilidad de inseguridad moderada o grave y grave de cada
+puntaje (umbrales: severidad de los ítems "comió menos" y "un día sin comer") y las
+prevalencias de la población. Las prevalencias por grupo (comuna, comedor, sexo,
+estrato) se obtienen en una sola pasada agrupada: se cuentan los encuestados de cada
+grupo por puntaje bruto y esas cuentas se multiplican por las probabilidades de cada
+puntaje. Los intervalos de confianza de las prevalencias se estiman por bootstrap
+(utils.bootstrap), reajustando el modelo en cada réplica.
+"""
+import math
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from functools import partial
+
+from utils.agregados import agregado_por_version
+from utils.bootstrap import NIVEL_CONFIANZA, REPLICAS, bootstrap
+
+# Posición (en la lista de ítems) de los ítems cuya severidad marca los umbrales
+# de inseguridad moderada o grave y de inseguridad grave
+UMBRAL_MODERADO = 4
+UMBRAL_GRAVE = 7
+
+# Puntajes asignados a los puntajes extremos (0 y todos "sí") para estimar su severidad
+AJUSTE_EXTREMOS = 0.5
+
+TOLERANCIA = 1e-10
+MAXIMO_ITERACIONES = 100
+
+# Grupo de los encuestados sin valor en la dimensión (celda vacía o solo espacios)
+SIN_DATO = "No especificado"
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+    return texto.strip().upper()
+
+
+def _a_binario(valor):
+    """
+    Convierte una respuesta a 1 (sí), 0 (no) o NaN (vacía u otra respuesta).
+    """
+    texto = _normalizar(valor)
+    if texto in ("SI", "S", "1", "TRUE", "VERDADERO"):
+        return 1.0
+    if texto in ("NO", "N", "0", "FALSE", "FALSO"):
+        return 0.0
+    return np.nan
+
+
+def matriz_respuestas(df, items):
+    """
+    Convierte las respuestas de los ítems en una matriz de 1/0/NaN.
+
+    Cada valor distinto se interpreta una sola vez (sobre las categorías de la columna)
+    y la matriz se arma indexando con los códigos de categoría.
+
+    Args:
+        df: DataFrame con las columnas de los ítems
+        items: Lista de columnas de los ítems, en el orden de la escala
+
+    Returns:
+        numpy.ndarray de float con una fila por encuestado y una columna por ítem
+    """
+    respuestas = np.empty((len(df), len(items)))
+    for j, item in enumerate(items):
+        serie = df[item]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos, valores = serie.array.codes, serie.cat.categories
+        else:
+            codigos, valores = pd.factorize(serie)
+        # El código -1 (vacío) toma la última posición: NaN
+        binarios = np.array([_a_binario(v) for v in valores] + [np.nan])
+        respuestas[:, j] = binarios[codigos]
+    return respuestas
+
+
+def puntajes_brutos(df, items):
+    """
+    Puntaje bruto (número de respuestas "sí") de cada encuestado.
+
+    Returns:
+        numpy.ndarray de enteros con -1 para quienes no respondieron todos los ítems
+    """
+    respuestas = matriz_respuestas(df, items)
+    completos = ~np.isnan(respuestas).any(axis=1)
+    puntajes = np.full(len(df), -1, dtype=np.int8)
+    puntajes[completos] = respuestas[completos].sum(axis=1)
+    return puntajes
+
+
+def estadisticas_suficientes(df, items):
+    """
+    Reúne las estadísticas suficientes del modelo de Rasch.
+
+    Returns:
+        dict: "personas" (encuestados por puntaje bruto 0..k) y "si" (matriz de
+              puntajes x ítems con las respuestas "sí" de cada grupo de puntaje)
+    """
+    respuestas = matriz_respuestas(df, items)
+    completos = ~np.isnan(respuestas).any(axis=1)
+    respuestas = respuestas[completos]
+    puntajes = respuestas.sum(axis=1).astype(np.int64)
+
+    k = len(items)
+    personas = np.bincount(puntajes, minlength=k + 1)
+    si = np.column_stack([
+        np.bincount(puntajes, weights=respuestas[:, j], minlength=k + 1) for j in range(k)
+    ])
+    return {"personas": personas, "si": si}
+
+
+def _sumar_estadisticas(previo, nuevas):
+    return {"personas": previo["personas"] + nuevas["personas"], "si": previo["si"] + nuevas["si"]}
+
+
+def _funciones_simetricas(epsilon):
+    """
+    Funciones simétricas elementales de epsilon completo y sin cada ítem.
+
+    Las k + 1 recurrencias se llevan juntas como filas de una matriz: la fila i omite
+    el ítem i (su epsilon vale 0 en esa fila) y la última usa todos los ítems.
+
+    Returns:
+        tuple: (gamma_0..gamma_k de todos los ítems, matriz k x k cuya fila i es
+               gamma_0..gamma_(k-1) sin el ítem i)
+    """
+    k = len(epsilon)
+    factores = np.tile(epsilon, (k + 1, 1))
+    factores[np.arange(k), np.arange(k)] = 0.0
+    gamma = np.zeros((k + 1, k + 1))
+    gamma[:, 0] = 1.0
+    for j in range(k):
+        gamma[:, 1:] = gamma[:, 1:] + factores[:, j, np.newaxis] * gamma[:, :-1]
+    return gamma[k], gamma[:k, :k]
+
+
+def _funciones_sin_dos(epsilon, sin_item):
+    """
+    Funciones simétricas sin dos ítems: [i, j, r] = gamma_r sin los ítems i y j.
+
+    Sale de la recurrencia gamma_r sin i = gamma_r sin (i, j) + epsilon_j gamma_(r-1) sin (i, j);
+    la diagonal (i = j) no se usa.
+    """
+    k = len(epsilon)
+    sin_dos = np.zeros((k, k, k - 1))
+    sin_dos[:, :, 0] = 1.0
+    for r in range(1, k - 1):
+        sin_dos[:, :, r] = sin_item[:, np.newaxis, r] - epsilon[np.newaxis, :] * sin_dos[:, :, r - 1]
+    return sin_dos
+
+
+def _severidades_cml(personas, si, inicio=None):
+    """
+    Severidades de los ítems por máxima verosimilitud condicional.
+
+    Se maximiza la verosimilitud condicional a los puntajes brutos por Newton-Raphson
+    sobre log(epsilon) = -severidad: el gradiente es la diferencia entre las respuestas
+    "sí" observadas y esperadas de cada ítem y el hessiano, menos la covarianza
+    condicional de las respuestas. Las severidades se centran en cero (el hessiano es
+    singular en esa dirección y se usa su pseudoinversa). inicio (severidades de
+    un ajuste previo) acorta las iteraciones de las réplicas bootstrap.
+
+    Returns:
+        tuple: (severidades, errores estándar, iteraciones) o None si no hay encuestados
+               con puntaje no extremo o algún ítem no tiene variación
+    """
+    k = si.shape[1]
+    puntajes = np.arange(1, k)
+    n = personas[1:k].astype(float)
+    observados = si[1:k].sum(axis=0)
+    if n.sum() == 0 or (observados <= 0).any() or (observados >= n.sum()).any():
+        return None
+
+    log_epsilon = np.zeros(k) if inicio is None else -np.asarray(inicio, dtype=float)
+    for iteracion in range(1, MAXIMO_ITERACIONES + 1):
+        epsilon = np.exp(log_epsilon)
+        gamma, sin_item = _funciones_simetricas(epsilon)
+        sin_dos = _funciones_sin_dos(epsilon, sin_item)
+
+        # P(sí a i | r) y P(sí a i y a j | r), para los puntajes no extremos
+        p = epsilon * sin_item[:, puntajes - 1].T / gamma[puntajes, np.newaxis]
+        ambos = np.zeros((k - 1, k, k))
+        ambos[1:] = (np.outer(epsilon, epsilon)[np.newaxis] * np.moveaxis(sin_dos[:, :, puntajes[1:] - 2], 2, 0)
+                     / gamma[puntajes[1:], np.newaxis, np.newaxis])
+        covarianza = np.einsum("r,rij->ij", n, ambos - p[:, :, np.newaxis] * p[:, np.newaxis, :])
+        covarianza[np.diag_indices(k)] = (n[:, np.newaxis] * p * (1 - p)).sum(axis=0)
+
+        # Pseudoinversa exacta: la covarianza tiene al vector de unos en su núcleo
+        # (las respuestas suman r), así que se invierte con ese núcleo rellenado
+        inversa = np.linalg.inv(covarianza + 1 / k) - 1 / k
+        paso = np.clip(inversa @ (observados - (n[:, np.newaxis] * p).sum(axis=0)), -1, 1)
+        log_epsilon += paso
+        log_epsilon -= log_epsilon.mean()
+        if np.abs(paso).max() < TOLERANCIA:
+            break
+
+    return -log_epsilon, np.sqrt(np.diag(inversa)), iteracion
+
+
+def _severidad_por_puntaje(severidades, objetivos):
+    """
+    Severidad de la persona (theta) que espera objetivos respuestas "sí", por Newton.
+
+    Returns:
+        tuple: (theta, error estándar) para cada objetivo
+    """
+    theta = np.zeros(len(objetivos))
+    for _ in range(100):
+        p = 1 / (1 + np.exp(-(theta[:, np.newaxis] - severidades[np.newaxis, :])))
+        informacion = (p * (1 - p)).sum(axis=1)
+        paso = np.clip((p.sum(axis=1) - objetivos) / informacion, -1, 1)
+        theta -= paso
+        if np.abs(paso).max() < TOLERANCIA:
+            break
+    p = 1 / (1 + np.exp(-(theta[:, np.newaxis] - severidades[np.newaxis, :])))
+    return theta, 1 / np.sqrt((p * (1 - p)).sum(axis=1))
+
+
+def _prob_sobre_umbral(theta, error, umbral):
+    """
+    P(severidad > umbral) con la severidad de la persona distribuida N(theta, error).
+    """
+    return np.array([0.5 * math.erfc((umbral - t) / (e * math.sqrt(2))) for t, e in zip(theta, error)])
+
+
+def _modelo(personas, si, umbral_moderado, umbral_grave, inicio=None):
+    """
+    Severidades de ítems y puntajes y probabilidades de inseguridad de cada puntaje.
+
+    Returns:
+        tuple: (severidades, errores de los ítems, iteraciones, theta, error de theta,
+               probabilidad moderada o grave, probabilidad grave) o None
+    """
+    ajuste = _severidades_cml(personas, si, inicio)
+    if ajuste is None:
+        return None
+    severidades, errores_items, iteraciones = ajuste
+
+    k = si.shape[1]
+    objetivos = np.arange(k + 1, dtype=float)
+    objetivos[0], objetivos[k] = AJUSTE_EXTREMOS, k - AJUSTE_EXTREMOS
+    theta, error = _severidad_por_puntaje(severidades, objetivos)
+
+    prob_moderada = _prob_sobre_umbral(theta, error, severidades[umbral_moderado])
+    prob_grave = _prob_sobre_umbral(theta, error, severidades[umbral_grave])
+    # Quien responde "no" a todo se considera con seguridad alimentaria
+    prob_moderada[0] = prob_grave[0] = 0.0
+    return severidades, errores_items, iteraciones, theta, error, prob_moderada, prob_grave
+
+
+def ajustar_rasch(estadisticas, items, umbral_moderado=UMBRAL_MODERADO, umbral_grave=UMBRAL_GRAVE):
+    """
+    Ajusta el modelo de Rasch a partir de las estadísticas suficientes.
+
+    Args:
+        estadisticas: Resultado de estadisticas_suficientes
+        items: Nombres de los ítems, en el orden de la escala
+        umbral_moderado: Posición del ítem que marca la inseguridad moderada o grave
+        umbral_grave: Posición del ítem que marca la inseguridad grave
+
+    Returns:
+        dict con "items" (DataFrame de severidad y error de cada ítem), "puntajes"
+        (DataFrame por puntaje bruto: personas, proporción, severidad, error y
+        probabilidades), "prevalencia_moderada_grave", "prevalencia_grave",
+        "encuestados" e "iteraciones"; o None si los datos no permiten el ajuste
+    """
+    personas = estadisticas["personas"]
+    modelo = _modelo(personas, estadisticas["si"], umbral_moderado, umbral_grave)
+    if modelo is None:
+        return None
+    severidades, errores_items, iteraciones, theta, error, prob_moderada, prob_grave = modelo
+
+    k = len(items)
+    encuestados = int(personas.sum())
+    proporcion = personas / encuestados
+    return {
+        "items": pd.DataFrame({"Severidad": severidades, "Error estándar": errores_items},
+                              index=pd.Index(items, name="Ítem")),
+        "puntajes": pd.DataFrame({
+            "Puntaje bruto": np.arange(k + 1),
+            "Personas": personas,
+            "Proporción": proporcion,
+            "Severidad": theta,
+            "Error estándar": error,
+            "Probabilidad (mod+sev)": prob_moderada,
+            "Probabilidad (sev)": prob_grave
+        }),
+        "prevalencia_moderada_grave": float((proporcion * prob_moderada).sum()),
+        "prevalencia_grave": float((proporcion * prob_grave).sum()),
+        "encuestados": encuestados,
+        "iteraciones": iteraciones
+    }
+
+
+def analizar_fies(df, items):
+    """
+    Ajusta el modelo de Rasch a las respuestas FIES de df.
+
+    Las estadísticas suficientes y el ajuste se calculan una vez por versión de los
+    datos; con filas nuevas las estadísticas se actualizan solo con esas filas.
+
+    Args:
+        df: DataFrame con las columnas de los ítems
+        items: Lista de columnas de los ítems, en el orden de la escala
+
+    Returns:
+        dict: Resultado de ajustar_rasch o None si faltan columnas o datos
+    """
+    if any(item not in df.columns for item in items):
+        return None
+    items = tuple(items)
+
+    def ajustar(datos):
+        estadisticas = agregado_por_version(
+            datos, ("fies_estadisticas", items),
+            lambda d: estadisticas_suficientes(d, items),
+            lambda previo, nuevas: _sumar_estadisticas(previo, estadisticas_suficientes(nuevas, items))
+        )
+        return ajustar_rasch(estadisticas, items)
+
+    return agregado_por_version(df, ("fies_rasch", items), ajustar)
+
+
+def _puntajes_por_version(df, items):
+    """
+    Puntajes brutos de df, calculados una vez por versión (las filas nuevas se agregan al final).
+    """
+    return agregado_por_version(
+        df, ("fies_puntajes", items),
+        lambda d: puntajes_brutos(d, items),
+        lambda previo, nuevas: np.concatenate([previo, puntajes_brutos(nuevas, items)])
+    )
+
+
+def prevalencias_por_grupo(df, items, columnas, resultado=None):
+    """
+    Prevalencias de inseguridad alimentaria de cada grupo de varias dimensiones.
+
+    Para cada dimensión se cuentan, en una sola pasada (np.bincount sobre el código del
+    grupo y el puntaje bruto), los encuestados de cada grupo por puntaje; la prevalencia
+    del grupo es esa distribución multiplicada por las probabilidades de cada puntaje
+    del modelo ajustado a df.
+
+    Args:
+        df: DataFrame con las columnas de los ítems y de las dimensiones
+        items: Lista de columnas de los ítems, en el orden de la escala
+        columnas: Columnas de df por las que se agrupa
+        resultado: Ajuste de analizar_fies(df, items), si ya se calculó
+
+    Returns:
+        dict: {columna: DataFrame indexado por grupo con Encuestados,
+               "Prevalencia (mod+sev)" y "Prevalencia (sev)"}; vacío si no hay ajuste.
+              Los encuestados sin valor en la dimensión forman el último grupo, SIN_DATO.
+    """
+    if resultado is None:
+        resultado = analizar_fies(df, items)
+    if resultado is None:
+        return {}
+
+    items = tuple(items)
+    k = len(items)
+    puntajes = _puntajes_por_version(df, items).astype(np.int64)
+    probabilidades = resultado["puntajes"][["Probabilidad (mod+sev)", "Probabilidad (sev)"]].to_numpy()
+    completos = puntajes >= 0
+
+    tablas = {}
+    for columna in columnas:
+        if columna not in df.columns:
+            continue
+        serie = df[columna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos, etiquetas = serie.array.codes.astype(np.int64), serie.cat.categories
+        else:
+            codigos, etiquetas = pd.factorize(serie)
+        # Los vacíos (código -1 y categorías en blanco) se cuentan en una posición extra al final
+        vacias = np.array([not str(etiqueta).strip() for etiqueta in etiquetas] + [True])
+        destino = np.arange(len(etiquetas) + 1)
+        destino[vacias] = len(etiquetas)
+        codigos = destino[codigos]
+        etiquetas = np.array(list(etiquetas) + [SIN_DATO], dtype=object)
+        conteos = np.bincount(
+            codigos[completos] * (k + 1) + puntajes[completos], minlength=len(etiquetas) * (k + 1)
+        ).reshape(len(etiquetas), k + 1)
+
+        encuestados = conteos.sum(axis=1)
+        con_datos = encuestados > 0
+        prevalencias = conteos[con_datos] @ probabilidades / encuestados[con_datos, np.newaxis]
+        tablas[columna] = pd.DataFrame({
+            "Encuestados": encuestados[con_datos],
+            "Prevalencia (mod+sev)": prevalencias[:, 0],
+            "Prevalencia (sev)": prevalencias[:, 1]
+        }, index=pd.Index(etiquetas[con_datos], name=columna))
+    return tablas
+
+
+def _patrones(df, items):
+    """
+    Patrón de respuestas de cada encuestado como entero (bit j = "sí" al ítem j).
+
+    Returns:
+        numpy.ndarray con 2**k para quienes no respondieron todos los ítems
+    """
+    respuestas = matriz_respuestas(df, items)
+    completos = ~np.isnan(respuestas).any(axis=1)
+    patrones = np.full(len(df), 2 ** len(items), dtype=np.int32)
+    pesos = 2 ** np.arange(len(items))
+    patrones[completos] = respuestas[completos] @ pesos
+    return patrones
+
+
+def _prevalencias_patrones(conteos, k, umbral_moderado, umbral_grave, inicio):
+    """
+    Estadístico bootstrap: prevalencias a partir de los conteos de cada patrón de respuestas.
+    """
+    patrones = conteos[0][:2 ** k]
+    bits = (np.arange(2 ** k)[:, np.newaxis] >> np.arange(k)) & 1
+    puntajes = bits.sum(axis=1)
+    personas = np.bincount(puntajes, weights=patrones, minlength=k + 1)
+    si = np.zeros((k + 1, k))
+    np.add.at(si, puntajes, patrones[:, np.newaxis] * bits)
+
+    modelo = _modelo(personas, si, umbral_moderado, umbral_grave, inicio)
+    if modelo is None or personas.sum() == 0:
+        return np.array([np.nan, np.nan])
+    proporcion = personas / personas.sum()
+    return np.array([proporcion @ modelo[5], proporcion @ modelo[6]])
+
+
+def intervalos_prevalencia_fies(df, items, replicas=REPLICAS, nivel=NIVEL_CONFIANZA, semilla=0, procesos=None):
+    """
+    Intervalos de confianza bootstrap de las prevalencias FIES.
+
+    Cada réplica remuestrea encuestados (incluidos los que no respondieron todos los
+    ítems) y reajusta el modelo de Rasch partiendo de las severidades del ajuste
+    completo. El resultado se guarda por versión de los datos.
+
+    Returns:
+        DataFrame indexado por prevalencia ("Mod+Sev", "Sev") con Estimación,
+        "IC inferior" e "IC superior" (proporciones), o None si no hay ajuste
+    """
+    resultado = analizar_fies(df, items)
+    if resultado is None:
+        return None
+    items = tuple(items)
+
+    def calcular(datos):
+        estadistico = partial(_prevalencias_patrones, k=len(items), umbral_moderado=UMBRAL_MODERADO,
+                              umbral_grave=UMBRAL_GRAVE, inicio=resultado["items"]["Severidad"].to_numpy())
+        intervalos = bootstrap([_patrones(datos, items)], [2 ** len(items) + 1], estadistico,
+                               replicas=replicas, nivel=nivel, semilla=semilla, procesos=procesos)
+        return pd.DataFrame({
+            "Estimación": intervalos["estimacion"],
+            "IC inferior": intervalos["inferior"],
+            "IC superior": intervalos["superior"]
+        }, index=pd.Index(["Mod+Sev", "Sev"], name="Prevalencia"))
+
+    return agregado_por_version(df, ("fies_bootstrap", items, replicas, nivel, semilla), calcular)
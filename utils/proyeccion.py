@@ -0,0 +1,288 @@
+"""
+Proyección de fechas en días hábiles con el calendario de festivos de Colombia.
+
+Los días hábiles se cuentan con numpy.busday_count / numpy.busday_offset sobre un
+calendario (lunes a viernes, sin festivos) generado para los años que haga falta,
+así que cada proyección toma tiempo constante en lugar de recorrer día por día.
+
+Festivos (Ley 51 de 1983): los de fecha fija, los que se trasladan al lunes
+siguiente y los que dependen de la Pascua.
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Festivos que se celebran siempre en su fecha: (mes, día)
+FESTIVOS_FIJOS = [(1, 1), (5, 1), (7, 20), (8, 7), (12, 8), (12, 25)]
+
+# Festivos que se trasladan al lunes siguiente si no caen en lunes: (mes, día)
+FESTIVOS_TRASLADABLES = [(1, 6), (3, 19), (6, 29), (8, 15), (10, 12), (11, 1), (11, 11)]
+
+# Festivos relativos al domingo de Pascua, en días: (desplazamiento, se traslada al lunes)
+FESTIVOS_PASCUA = [
+    (-3, False),   # Jueves Santo
+    (-2, False),   # Viernes Santo
+    (39, True),    # Ascensión del Señor
+    (60, True),    # Corpus Christi
+    (68, True)     # Sagrado Corazón de Jesús
+]
+
+# Lunes a viernes
+SEMANA_LABORAL = "1111100"
+
+
+def fecha_pascua(anio):
+    """
+    Domingo de Pascua del año (algoritmo de Meeus para el calendario gregoriano).
+    """
+    a = anio % 19
+    b, c = divmod(anio, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(anio, mes, dia + 1)
+
+
+def _trasladar_a_lunes(fecha):
+    return fecha + timedelta(days=(7 - fecha.weekday()) % 7)
+
+
+def festivos_colombia(anio):
+    """
+    Festivos nacionales de Colombia en un año.
+
+    Args:
+        anio: Año
+
+    Returns:
+        list: Fechas (datetime.date) ordenadas
+    """
+    festivos = {date(anio, mes, dia) for mes, dia in FESTIVOS_FIJOS}
+    festivos.update(_trasladar_a_lunes(date(anio, mes, dia)) for mes, dia in FESTIVOS_TRASLADABLES)
+    pascua = fecha_pascua(anio)
+    for desplazamiento, trasladable in FESTIVOS_PASCUA:
+        fecha = pascua + timedelta(days=desplazamiento)
+        festivos.add(_trasladar_a_lunes(fecha) if trasladable else fecha)
+    return sorted(festivos)
+
+
+@lru_cache(maxsize=32)
+def calendario_habil(anio_inicio, anio_fin, adicionales=()):
+    """
+    Calendario de días hábiles de numpy para un rango de años.
+
+    Args:
+        anio_inicio: Primer año del calendario
+        anio_fin: Último año del calendario (incluido)
+        adicionales: Tupla de fechas no laborables además de los festivos
+
+    Returns:
+        numpy.busdaycalendar
+    """
+    festivos = [fecha for anio in range(anio_inicio, anio_fin + 1) for fecha in festivos_colombia(anio)]
+    festivos.extend(adicionales)
+    return np.busdaycalendar(weekmask=SEMANA_LABORAL, holidays=np.array(festivos, dtype="datetime64[D]"))
+
+
+def _calendario_para(desde, hasta, adicionales):
+    """
+    Calendario que cubre desde el año de desde hasta el año de hasta.
+    """
+    return calendario_habil(desde.year, max(desde.year, hasta.year), tuple(sorted(adicionales)))
+
+
+def dias_habiles_entre(desde, limite, adicionales=()):
+    """
+    Cuenta los días hábiles posteriores a desde y anteriores a limite.
+
+    Args:
+        desde: Fecha de referencia (no se cuenta)
+        limite: Fecha límite (no se cuenta)
+        adicionales: Fechas no laborables además de festivos y fines de semana
+
+    Returns:
+        int: Número de días hábiles (0 si limite no es posterior a desde)
+    """
+    if limite <= desde:
+        return 0
+    calendario = _calendario_para(desde, limite, adicionales)
+    return int(np.busday_count(desde + timedelta(days=1), limite, busdaycal=calendario))
+
+
+def fecha_tras_dias_habiles(desde, dias_habiles, adicionales=()):
+    """
+    Fecha en que se completan dias_habiles días hábiles contados a partir del día siguiente a desde.
+
+    Args:
+        desde: Fecha de referencia
+        dias_habiles: Número de días hábiles a avanzar
+        adicionales: Fechas no laborables además de festivos y fines de semana
+
+    Returns:
+        datetime.date: El día hábil número dias_habiles después de desde (desde si es 0 o menos)
+    """
+    if dias_habiles <= 0:
+        return desde
+    # Margen de años para el calendario: unos 240 días hábiles por año
+    hasta = date(desde.year + dias_habiles // 240 + 1, 12, 31)
+    calendario = _calendario_para(desde, hasta, adicionales)
+    # Si desde no es hábil se parte del hábil anterior: el primer paso cae en el siguiente hábil
+    fecha = np.busday_offset(desde, dias_habiles, roll="backward", busdaycal=calendario)
+    return fecha.item()
+
+
+def proyectar_meta(total_actual, meta, promedio_diario, desde, fecha_limite, adicionales=()):
+    """
+    Proyecta cuándo se alcanza la meta y qué ritmo hace falta para cumplirla a tiempo.
+
+    Args:
+        total_actual: Registros acumulados
+        meta: Registros a alcanzar
+        promedio_diario: Registros por día hábil al ritmo actual
+        desde: Fecha de referencia (normalmente hoy)
+        fecha_limite: Fecha antes de la cual se quiere cumplir la meta
+        adicionales: Fechas no laborables además de festivos y fines de semana
+
+    Returns:
+        dict: faltantes, dias_habiles_necesarios, fecha_estimada (None si el promedio
+              no es positivo), dias_calendario, dias_habiles_hasta_limite y
+              registros_diarios_meta
+    """
+    faltantes = meta - total_actual
+    dias_necesarios = None
+    fecha_estimada = None
+    dias_calendario = None
+    if promedio_diario > 0:
+        dias_necesarios = int(faltantes / promedio_diario) + 1
+        fecha_estimada = fecha_tras_dias_habiles(desde, dias_necesarios, adicionales)
+        dias_calendario = (fecha_estimada - desde).days
+
+    dias_hasta_limite = dias_habiles_entre(desde, fecha_limite, adicionales)
+    return {
+        "faltantes": faltantes,
+        "dias_habiles_necesarios": dias_necesarios,
+        "fecha_estimada": fecha_estimada,
+        "dias_calendario": dias_calendario,
+        "dias_habiles_hasta_limite": dias_hasta_limite,
+        "registros_diarios_meta": faltantes / dias_hasta_limite if dias_hasta_limite > 0 else 0
+    }
+
+
+def fechas_habiles(desde, cantidad, adicionales=()):
+    """
+    Los siguientes cantidad días hábiles después de desde.
+
+    Returns:
+        numpy.ndarray de datetime64[D]
+    """
+    if cantidad <= 0:
+        return np.array([], dtype="datetime64[D]")
+    hasta = date(desde.year + cantidad // 240 + 1, 12, 31)
+    calendario = _calendario_para(desde, hasta, adicionales)
+    pasos = np.arange(1, cantidad + 1)
+    return np.busday_offset(desde, pasos, roll="backward", busdaycal=calendario)
+
+
+# Trayectorias simuladas y percentiles que se reportan
+TRAYECTORIAS = 20000
+PERCENTILES = (10, 50, 90)
+
+# Días hábiles que se simulan por bloque y como máximo (unos 10 años)
+DIAS_POR_BLOQUE = 64
+MAXIMO_DIAS_SIMULADOS = 2400
+
+# Trayectorias con las que se calculan las bandas del acumulado (ordenar todas en
+# cada día cuesta más que el resto de la simulación)
+TRAYECTORIAS_BANDAS = 2000
+
+
+def simular_finalizacion(conteos_diarios, faltantes, trayectorias=TRAYECTORIAS, semilla=0):
+    """
+    Simula cuántos días hábiles faltan para completar la meta remuestreando los días observados.
+
+    Cada trayectoria avanza día hábil a día hábil tomando al azar (con reemplazo) el
+    conteo de uno de los días históricos. Todas las trayectorias se simulan a la vez
+    con NumPy, en bloques de DIAS_POR_BLOQUE días, hasta que todas completan la meta
+    o se llega a MAXIMO_DIAS_SIMULADOS.
+
+    Args:
+        conteos_diarios: Registros de cada día con registros (por ejemplo ID DUB únicos por día)
+        faltantes: Registros que faltan para la meta
+        trayectorias: Número de trayectorias simuladas
+        semilla: Semilla del generador aleatorio (la simulación es reproducible)
+
+    Returns:
+        dict: "dias" {percentil: días hábiles hasta la meta, inf si no se alcanza en el
+              horizonte simulado} y "bandas" DataFrame con el día hábil y los percentiles
+              del acumulado simulado en cada día (sobre TRAYECTORIAS_BANDAS trayectorias)
+    """
+    conteos = np.asarray(conteos_diarios, dtype=np.int64)
+    if faltantes <= 0 or len(conteos) == 0 or conteos.max() <= 0:
+        dias = 0 if faltantes <= 0 else np.inf
+        return {"dias": {p: dias for p in PERCENTILES}, "bandas": pd.DataFrame(columns=["Día"] + list(PERCENTILES))}
+
+    generador = np.random.default_rng(semilla)
+    acumulado = np.zeros(trayectorias, dtype=np.int64)
+    dias_meta = np.full(trayectorias, np.inf)
+    bandas = []
+    simulados = 0
+    while simulados < MAXIMO_DIAS_SIMULADOS and np.isinf(dias_meta).any():
+        bloque = conteos[generador.integers(0, len(conteos), size=(trayectorias, DIAS_POR_BLOQUE))]
+        trayectoria = acumulado[:, np.newaxis] + np.cumsum(bloque, axis=1)
+
+        # Primer día del bloque en que cada trayectoria pendiente alcanza la meta
+        alcanzada = trayectoria >= faltantes
+        nuevas = np.isinf(dias_meta) & alcanzada[:, -1]
+        dias_meta[nuevas] = simulados + 1 + np.argmax(alcanzada[nuevas], axis=1)
+
+        bandas.append(np.percentile(trayectoria[:TRAYECTORIAS_BANDAS], PERCENTILES, axis=0).T)
+        acumulado = trayectoria[:, -1]
+        simulados += DIAS_POR_BLOQUE
+
+    dias = np.percentile(dias_meta, PERCENTILES, method="inverted_cdf")
+    bandas = pd.DataFrame(np.vstack(bandas), columns=list(PERCENTILES))
+    bandas.insert(0, "Día", np.arange(1, len(bandas) + 1))
+    return {"dias": dict(zip(PERCENTILES, dias.tolist())), "bandas": bandas}
+
+
+def planificar_escenarios(total_actual, metas, fechas_limite, desde, adicionales=()):
+    """
+    Calcula los días hábiles y el ritmo diario necesario para cada combinación de meta y fecha límite.
+
+    Los días hábiles de todas las fechas se cuentan en una sola llamada a
+    numpy.busday_count y las tasas salen de una división meta x fecha.
+
+    Args:
+        total_actual: Registros acumulados
+        metas: Lista de metas a evaluar
+        fechas_limite: Lista de fechas límite (datetime.date) a evaluar
+        desde: Fecha de referencia (normalmente hoy; no se cuenta)
+        adicionales: Fechas no laborables además de festivos y fines de semana
+
+    Returns:
+        tuple: (DataFrame de registros diarios necesarios con una fila por meta y una
+                columna por fecha límite, NaN si la fecha no deja días hábiles;
+                Serie con los días hábiles disponibles por fecha límite)
+    """
+    metas = np.asarray(metas, dtype=float)
+    limites = np.asarray(fechas_limite, dtype="datetime64[D]")
+    ultima = max(fechas_limite) if len(fechas_limite) else desde
+    calendario = _calendario_para(desde, ultima, adicionales)
+
+    inicio = np.datetime64(desde + timedelta(days=1), "D")
+    dias = np.busday_count(inicio, np.maximum(limites, inicio), busdaycal=calendario)
+
+    faltantes = np.maximum(metas - total_actual, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tasas = np.where(dias[np.newaxis, :] > 0, faltantes[:, np.newaxis] / dias[np.newaxis, :], np.nan)
+
+    columnas = pd.Index(list(fechas_limite), name="Fecha límite")
+    tabla = pd.DataFrame(tasas, index=pd.Index(metas.astype(np.int64), name="Meta"), columns=columnas)
+    return tabla, pd.Series(dias, index=columnas, name="Días hábiles")
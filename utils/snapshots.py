@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow es opcional: sin él no se guardan copias en disco
+    pa = None
+    feather = None
+
+# Directorio donde se guarda la última copia válida de cada hoja
+SNAPSHOT_DIR = os.getenv("DUB_SNAPSHOT_DIR", ".snapshots")
+
+# Clave de los metadatos propios dentro de los metadatos del esquema Arrow
+CLAVE_METADATOS = b"dub_snapshot"
+
+
+def snapshots_disponibles():
+    """
+    Indica si se pueden guardar y leer copias en disco (requiere pyarrow).
+    """
+    return feather is not None
+
+
+def _ruta_base(clave):
+    """
+    Construye la ruta (sin extensión) del snapshot correspondiente a una clave de caché.
+    """
+    nombre = hashlib.sha1(repr(clave).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(SNAPSHOT_DIR, nombre)
+
+
+def guardar_snapshot(clave, entrada):
+    """
+    Guarda el DataFrame de una entrada de caché en formato Feather (Arrow IPC)
+    junto con los metadatos necesarios para continuar la carga incremental.
+
+    Los metadatos van dentro del esquema del propio archivo, de modo que un único
+    reemplazo atómico (archivo temporal y os.replace) publica datos y metadatos a la
+    vez: una interrupción no puede dejarlos de versiones distintas.
+
+    Args:
+        clave: Clave de la caché (sheet_id, hoja, columnas)
+        entrada: Entrada de caché con el DataFrame y su información de lectura
+
+    Returns:
+        bool: True si se guardó correctamente
+    """
+    if not snapshots_disponibles():
+        return False
+
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        base = _ruta_base(clave)
+        df = entrada["df"]
+
+        # Feather exige nombres de columna únicos y de texto: se guardan por posición
+        tabla = df.copy(deep=False)
+        tabla.columns = [f"c{i}" for i in range(len(df.columns))]
+        tabla = pa.Table.from_pandas(tabla.reset_index(drop=True), preserve_index=False)
+
+        metadatos = {
+            "clave": repr(clave),
+            "columnas": [str(c) for c in df.columns],
+            "encabezados": entrada["encabezados"],
+            "grupos": entrada["grupos"],
+            "filas_leidas": entrada["filas_leidas"],
+            "ultima_fila": entrada["ultima_fila"],
+            "huella": entrada.get("huella"),
+            # Hora (de reloj) de la última descarga completa, para programar la siguiente
+            "descarga_completa": time.time() - (time.monotonic() - entrada["momento_completo"]),
+            "guardado": time.time()
+        }
+
+        # Se conservan los metadatos de pandas (tipos categóricos) y se agregan los propios
+        esquema = dict(tabla.schema.metadata or {})
+        esquema[CLAVE_METADATOS] = json.dumps(metadatos, ensure_ascii=False).encode("utf-8")
+        tabla = tabla.replace_schema_metadata(esquema)
+
+        feather.write_feather(tabla, base + ".feather.tmp", compression="uncompressed")
+        os.replace(base + ".feather.tmp", base + ".feather")
+        return True
+    except Exception:
+        return False
+
+
+def leer_snapshot(clave):
+    """
+    Lee la última copia guardada en disco de una hoja, usando memory-map.
+
+    Args:
+        clave: Clave de la caché (sheet_id, hoja, columnas)
+
+    Returns:
+        tuple: (DataFrame, metadatos) o None si no hay copia válida
+    """
+    if not snapshots_disponibles():
+        return None
+
+    base = _ruta_base(clave)
+    if not os.path.exists(base + ".feather"):
+        return None
+
+    try:
+        # El archivo sin comprimir se mapea en memoria en lugar de leerse completo
+        tabla = feather.read_table(base + ".feather", memory_map=True)
+        esquema = tabla.schema.metadata or {}
+        if CLAVE_METADATOS not in esquema:
+            return None
+        metadatos = json.loads(esquema[CLAVE_METADATOS].decode("utf-8"))
+        if metadatos.get("clave") != repr(clave):
+            return None
+
+        df = tabla.to_pandas()
+        df.columns = metadatos["columnas"]
+
+        if metadatos["grupos"] is not None:
+            metadatos["grupos"] = [tuple(grupo) for grupo in metadatos["grupos"]]
+        return df, metadatos
+    except Exception:
+        return None
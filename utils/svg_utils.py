@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import os
+from utils.agregados import conteo_valores
 
 def mostrar_estadisticas_sexo(df):
     """
@@ -15,7 +16,7 @@ def mostrar_estadisticas_sexo(df):
         return
     
     # Contar valores de sexo
-    conteo_sexo = df['Sexo'].value_counts()
+    conteo_sexo = conteo_valores(df, 'Sexo')
     total = len(df)
     
     # Crear título de la sección